@@ -0,0 +1,78 @@
+"""Cached user loading for the low-query session modes.
+
+With ``SESSION_MODE`` set to ``cache`` or ``signed_cookies`` (see settings),
+``CachedModelBackend`` loads the logged-in user from the cache instead of the
+``auth_user`` table, so together with the session engine an authenticated
+request costs no queries before the view runs.
+
+Cached users are dropped whenever the user is saved or deleted (password
+change, deactivation, ``last_login``) and on logout; the receivers live in
+``main/signals.py``. Django still compares the session's auth hash with the
+user's password hash on every request, so changing a password ends other
+sessions as usual.
+
+Signed-cookie sessions cannot be deleted server side, so logging out also
+bumps the user's *session epoch*; ``SessionEpochMiddleware`` discards any
+session cookie stamped with another epoch. In that mode, logging out ends
+every session of the user. An epoch missing from the cache (evicted, cleared,
+or a restarted locmem cache) is replaced by a fresh one, so it ends every
+session instead of accepting the old cookies again.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+EPOCH_SESSION_KEY = '_auth_epoch'
+
+
+def _user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def _epoch_key(user_id):
+    return f'auth-epoch:{user_id}'
+
+
+def forget_user(user_id):
+    cache.delete(_user_key(user_id))
+
+
+def session_epoch(user_id):
+    # A fresh epoch never equals one stamped in a session before
+    return cache.get_or_set(_epoch_key(user_id), time.time_ns(), None)
+
+
+def bump_session_epoch(user_id):
+    cache.set(_epoch_key(user_id), time.time_ns(), None)
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` whose ``get_user`` is served from the cache"""
+
+    def get_user(self, user_id):
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+
+class SessionEpochMiddleware:
+    """Drop signed-cookie sessions not stamped with the user's current epoch.
+
+    Goes right after ``SessionMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user_id = request.session.get(SESSION_KEY)
+        if user_id is not None and request.session.get(EPOCH_SESSION_KEY) != session_epoch(user_id):
+            request.session.flush()
+        return self.get_response(request)
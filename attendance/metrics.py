@@ -0,0 +1,258 @@
+"""Attendance throughput metrics in Prometheus text format.
+
+Counters and histograms are kept in per-thread shards, so recording a value
+takes no lock. Every ``METRICS_FLUSH_INTERVAL`` seconds a worker writes the
+sum of its shards to ``METRICS_DIR/<pid>-<start>.json`` (atomically, via
+rename). ``render()`` merges the files of every worker, so whichever gunicorn
+worker answers ``/metrics`` reports totals for the whole server.
+``gunicorn.conf.py`` clears the directory when the master starts.
+
+Views are instrumented with the ``track_scan`` and ``observe_latency``
+decorators. Session openings are counted by a signal in
+``professor/signals.py`` and cancellations in ``cancel_class``.
+"""
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from django.conf import settings
+
+METRICS = {
+    'attendance_scans_total': ('counter', 'QR scans processed, by endpoint and outcome'),
+    'attendance_scan_duration_seconds': ('histogram', 'End-to-end latency of QR scan requests, by endpoint'),
+    'attendance_sessions_opened_total': ('counter', 'Attendance sessions opened'),
+    'attendance_session_cancellations_total': ('counter', 'Class sessions canceled or restored, by action'),
+    'attendance_dashboard_duration_seconds': ('histogram', 'Dashboard response time, by role'),
+}
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+_started = time.time_ns()
+_last_flush = time.monotonic()
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = ({}, {})
+        # Taken once per thread, never on the recording path
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Increment counter ``name`` for the given label values"""
+    counters = _shard()[0]
+    key = _key(name, labels)
+    counters[key] = counters.get(key, 0) + value
+    _maybe_flush()
+
+
+def observe(name, seconds, **labels):
+    """Record ``seconds`` in histogram ``name``"""
+    histograms = _shard()[1]
+    key = _key(name, labels)
+    values = histograms.get(key)
+    if values is None:
+        # One slot per bucket, then +Inf, sum and count
+        values = histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0, 0]
+    values[bisect_left(BUCKETS, seconds)] += 1
+    values[-2] += seconds
+    values[-1] += 1
+    _maybe_flush()
+
+
+def _copy(mapping):
+    # Another thread may add a key while we read its shard; just try again
+    while True:
+        try:
+            return list(mapping.items())
+        except RuntimeError:
+            continue
+
+
+def snapshot():
+    """Sum of every shard in this process"""
+    counters, histograms = {}, {}
+    for shard_counters, shard_histograms in list(_shards):
+        for key, value in _copy(shard_counters):
+            counters[key] = counters.get(key, 0) + value
+        for key, values in _copy(shard_histograms):
+            total = histograms.setdefault(key, [0] * len(values))
+            for i, v in enumerate(values):
+                total[i] += v
+    return counters, histograms
+
+
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def flush():
+    """Write this process's totals to its file in ``METRICS_DIR``"""
+    global _last_flush
+    _last_flush = time.monotonic()
+    directory = _metrics_dir()
+    if not directory:
+        return
+    counters, histograms = snapshot()
+    data = {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), values] for (name, labels), values in histograms.items()],
+    }
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}-{_started}.json')
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _maybe_flush():
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+atexit.register(lambda: _metrics_dir() and flush())
+
+
+def collect():
+    """Totals across every worker that has written to ``METRICS_DIR``"""
+    directory = _metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return snapshot()
+
+    flush()
+    counters, histograms = {}, {}
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in data['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            total = histograms.setdefault(key, [0] * len(values))
+            for i, v in enumerate(values):
+                total[i] += v
+    return counters, histograms
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        else:
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), values[:-2]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {values[-2]}')
+                lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def scan_outcome(response):
+    """Classify a ``process_qr_scan`` / ``verify_qr_code`` JSON response"""
+    try:
+        data = json.loads(response.content)
+    except ValueError:
+        return 'error'
+    if data.get('success'):
+        return 'marked'
+    if data.get('already_marked') or response.status_code == 400 and 'already marked' in data.get('error', ''):
+        return 'duplicate'
+    if response.status_code == 404:
+        # process_qr_scan answers 404 with the scanned name when nobody matches;
+        # verify_qr_code answers 404 when the QR session does not exist
+        return 'unknown_name' if 'student_name' in data else 'no_active_session'
+    if 'No active class schedule' in data.get('error', ''):
+        return 'no_active_session'
+    if response.status_code >= 500:
+        return 'error'
+    return 'invalid'
+
+
+def track_scan(view_func):
+    """Count scan outcomes and time scan requests (sync or async views)"""
+    endpoint = view_func.__name__
+
+    def record(response, started):
+        observe('attendance_scan_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+        if response.status_code != 302:
+            inc('attendance_scans_total', endpoint=endpoint, outcome=scan_outcome(response))
+        return response
+
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_view(request, *args, **kwargs):
+            started = time.perf_counter()
+            return record(await view_func(request, *args, **kwargs), started)
+        return _async_view
+
+    @wraps(view_func)
+    def _view(request, *args, **kwargs):
+        started = time.perf_counter()
+        return record(view_func(request, *args, **kwargs), started)
+    return _view
+
+
+def observe_latency(name, **labels):
+    """Decorator recording a view's response time in histogram ``name`` (sync or async views)"""
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _async_view(request, *args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await view_func(request, *args, **kwargs)
+                finally:
+                    observe(name, time.perf_counter() - started, **labels)
+            return _async_view
+
+        @wraps(view_func)
+        def _view(request, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - started, **labels)
+        return _view
+    return decorator
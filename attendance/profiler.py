@@ -0,0 +1,121 @@
+"""Per-request query and timing profiler.
+
+``QueryProfilerMiddleware`` records, for every request, the view name, total
+time, number of SQL queries, time spent in the database, the slowest
+statements and the statements that ran more than once (the N+1 shape). The
+last ``QUERY_PROFILER_HISTORY`` requests and per-view aggregates are kept in
+memory per worker and shown on the staff-only page at ``/profiler/``.
+
+Per-view budgets are declared in ``settings.QUERY_BUDGETS`` as
+``{'app:view_name': max_queries}``. When a request goes over budget it is
+logged on the ``attendance.profiler`` logger, or ``QueryBudgetExceeded`` is
+raised when ``QUERY_BUDGET_ACTION = 'raise'`` (useful in development).
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .querylog import QueryLog
+
+logger = logging.getLogger('attendance.profiler')
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more queries than its declared budget"""
+
+
+class ProfileSummary:
+    """Rolling in-memory summary of profiled requests for this worker"""
+
+    def __init__(self, history=200):
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=history)
+        self.views = {}
+
+    def record(self, entry):
+        with self._lock:
+            self.recent.appendleft(entry)
+            stats = self.views.setdefault(entry['view'], {
+                'view': entry['view'],
+                'requests': 0,
+                'total_ms': 0.0,
+                'db_ms': 0.0,
+                'queries': 0,
+                'max_queries': 0,
+                'max_ms': 0.0,
+                'over_budget': 0,
+            })
+            stats['requests'] += 1
+            stats['total_ms'] += entry['total_ms']
+            stats['db_ms'] += entry['db_ms']
+            stats['queries'] += entry['queries']
+            stats['max_queries'] = max(stats['max_queries'], entry['queries'])
+            stats['max_ms'] = max(stats['max_ms'], entry['total_ms'])
+            if entry['over_budget']:
+                stats['over_budget'] += 1
+
+    def snapshot(self):
+        """Copies of the recent requests and the per-view averages, slowest first"""
+        with self._lock:
+            recent = list(self.recent)
+            views = []
+            for stats in self.views.values():
+                n = stats['requests']
+                views.append(dict(
+                    stats,
+                    avg_ms=round(stats['total_ms'] / n, 2),
+                    avg_db_ms=round(stats['db_ms'] / n, 2),
+                    avg_queries=round(stats['queries'] / n, 1),
+                    budget=settings.QUERY_BUDGETS.get(stats['view']),
+                ))
+        views.sort(key=lambda stats: stats['avg_ms'], reverse=True)
+        return recent, views
+
+    def clear(self):
+        with self._lock:
+            self.recent.clear()
+            self.views.clear()
+
+
+summary = ProfileSummary(getattr(settings, 'QUERY_PROFILER_HISTORY', 200))
+
+
+class QueryProfilerMiddleware:
+    """Profile each request's queries and enforce ``settings.QUERY_BUDGETS``"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryLog() as log:
+            started = time.perf_counter()
+            response = self.get_response(request)
+            total = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        over_budget = budget is not None and log.count > budget
+
+        summary.record({
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(log.total_time * 1000, 2),
+            'queries': log.count,
+            'over_budget': over_budget,
+            'slowest': [(sql, round(duration * 1000, 2)) for sql, duration in log.slowest(3)],
+            'duplicates': sorted(log.duplicates().items(), key=lambda item: item[1], reverse=True)[:5],
+        })
+
+        if over_budget:
+            message = f'{view_name} ran {log.count} queries (budget {budget}) for {request.method} {request.path}'
+            if settings.QUERY_BUDGET_ACTION == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
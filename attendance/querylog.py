@@ -0,0 +1,65 @@
+"""Record the SQL statements executed on a connection and how long they took.
+
+Uses ``connection.execute_wrapper`` so it works with ``DEBUG = False`` and
+adds no overhead outside the ``with`` block. By default every configured
+database is wrapped, so reads sent to the replica (``attendance/routers.py``)
+are counted along with the primary's.
+"""
+import contextlib
+import time
+
+from django.db import connections
+
+
+class QueryLog:
+    """Context manager collecting ``(sql, seconds)`` for every query run inside it.
+
+        with QueryLog() as log:
+            client.get('/professor/dashboard/')
+        log.count, log.total_time, log.duplicates()
+    """
+
+    def __init__(self, using=None):
+        """Log the queries of the ``using`` aliases (a list), or of every database when ``None``"""
+        self.using = using
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __enter__(self):
+        self._stack = contextlib.ExitStack()
+        for alias in self.using or connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.__exit__(*exc_info)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def slowest(self, limit=5):
+        """The ``limit`` slowest statements as ``(sql, seconds)``"""
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+
+    def duplicates(self, min_count=2):
+        """SQL text that ran at least ``min_count`` times, as ``{sql: count}``.
+
+        Statements are compared with their placeholders, so the same query run
+        for different rows (the usual N+1 shape) counts as a duplicate.
+        """
+        counts = {}
+        for sql, _ in self.queries:
+            counts[sql] = counts.get(sql, 0) + 1
+        return {sql: count for sql, count in counts.items() if count >= min_count}
@@ -0,0 +1,113 @@
+"""Send read-only views to an optional read replica.
+
+Only views decorated with ``replica_reads`` read from the ``replica``
+database; everything else, including the session and user lookups done by
+middleware and every write, uses ``default``.
+
+A replica lags behind the primary, so a client that has just written must not
+read from it. ``ReplicaPinMiddleware`` notes when a request writes to the
+database and sets a short-lived cookie (``settings.REPLICA_PIN_SECONDS``);
+while it is present that client's reads stay on the primary. A view that
+writes also switches itself back to the primary for the rest of the request.
+
+The router and middleware are only installed when a replica is configured
+(see settings).
+"""
+import asyncio
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+REPLICA = 'replica'
+PIN_COOKIE = 'primary_pin'
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+class _RequestState:
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+def reading_from_replica():
+    """Whether ORM reads in the current request go to the replica"""
+    state = _request_state.get()
+    return state is not None and state.use_replica and not state.wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # The database cache backend's table must be read where it is written
+        if reading_from_replica() and model._meta.app_label != 'django_cache':
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and model._meta.app_label != 'django_cache':
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return db == 'default'
+
+
+def replica_reads(view_func):
+    """Let the view read from the replica unless the client is pinned to the primary"""
+    def enter(request):
+        state = _request_state.get()
+        if state is not None and PIN_COOKIE not in request.COOKIES:
+            state.use_replica = True
+        return state
+
+    def leave(state):
+        if state is not None:
+            state.use_replica = False
+
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_async_view(request, *args, **kwargs):
+            state = enter(request)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                leave(state)
+        return _wrapped_async_view
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        state = enter(request)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            leave(state)
+    return _wrapped_view
+
+
+class ReplicaPinMiddleware:
+    """Track writes per request and pin the client to the primary after one"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RequestState()
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
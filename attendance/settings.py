@@ -1,9 +1,15 @@
 """
 Django settings for attendance project.
 """
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
+import django
+
 # Try to import production packages (only needed for Railway)
 try:
     import dj_database_url
@@ -51,6 +57,7 @@ INSTALLED_APPS = [
     'main',
     'student',
     'professor',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -61,15 +68,93 @@ MIDDLEWARE = [
 if HAS_WHITENOISE:
     MIDDLEWARE.append('whitenoise.middleware.WhiteNoiseMiddleware')
 
+# Per-request query/timing profiler with per-view budgets (attendance/profiler.py).
+# Placed before sessions and auth so their queries are counted too.
+QUERY_PROFILER = os.environ.get('QUERY_PROFILER', 'False').lower() == 'true'
+if QUERY_PROFILER:
+    MIDDLEWARE.append('attendance.profiler.QueryProfilerMiddleware')
+
 MIDDLEWARE += [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.roles.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Sessions and user loading. 'db' (the default) reads the session row and the
+# user on every authenticated request. 'cache' keeps sessions in the cache and
+# 'signed_cookies' in a signed cookie; both also load the user through the
+# cache (attendance/auth.py), so authentication costs no queries per request.
+SESSION_MODE = os.environ.get('SESSION_MODE', 'db').lower()
+if SESSION_MODE == 'cache':
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+elif SESSION_MODE == 'signed_cookies':
+    SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware') + 1,
+        'attendance.auth.SessionEpochMiddleware',
+    )
+if SESSION_MODE != 'db':
+    AUTHENTICATION_BACKENDS = ['attendance.auth.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = 300
+
+# Cache (see professor/cache.py). Cached data, sessions, users and role
+# versions must be visible to every worker: 'file' (the default) is shared by
+# the workers of one host, 'db' by every host using the database (run
+# `manage.py createcachetable` once), 'locmem' is per process and only suits a
+# single worker. `manage.py test` gets a file cache in a directory of its own,
+# so the tests never read what the dev server cached for the same ids nor bump
+# its versions.
+TESTING = sys.argv[1:2] == ['test']
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file').lower()
+CACHE_OPTIONS = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '20000'))}
+if CACHE_BACKEND == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'attendance_cache',
+            'OPTIONS': CACHE_OPTIONS,
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': CACHE_OPTIONS,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'attendance-cache')),
+            'OPTIONS': CACHE_OPTIONS,
+        }
+    }
+if TESTING:
+    # Shared by the processes the concurrency tests fork, removed when the run ends
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.mkdtemp(prefix='attendance-test-cache-'),
+            'OPTIONS': CACHE_OPTIONS,
+        }
+    }
+    atexit.register(shutil.rmtree, CACHES['default']['LOCATION'], ignore_errors=True)
+DATA_CACHE_TIMEOUT = 600
+
+# Background jobs (jobs/queue.py), run by `manage.py run_workers`. With
+# JOBS_EAGER (the default when DEBUG is on) they run in the web process right
+# after the request's transaction commits, so no worker is needed.
+JOBS_EAGER = os.environ.get('JOBS_EAGER', str(DEBUG)).lower() == 'true'
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', '1.0'))
+JOBS_RETRY_DELAY = 30  # seconds before the first retry, doubled for each further attempt
+JOBS_LOCK_TIMEOUT = 600  # seconds without a heartbeat after which a running job's worker is presumed dead
+JOBS_KEEP_DAYS = 7  # succeeded jobs are deleted after this many days
+
 ROOT_URLCONF = 'attendance.urls'
 
 TEMPLATES = [
@@ -88,21 +173,82 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'attendance.wsgi.application'
+ASGI_APPLICATION = 'attendance.asgi.application'
+
+# Serve the scan/verify/calendar endpoints with async views (ASGI deployments,
+# see gunicorn.conf.py). Leave off under WSGI.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() == 'true'
 
 # Database
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL and HAS_DJ_DATABASE_URL:
     DATABASES = {
-        'default': dj_database_url.config(default=DATABASE_URL, conn_max_age=600)
+        # Persistent connections are per-thread; under ASGI every sync_to_async
+        # call may land on a different thread, so let Django close them instead
+        'default': dj_database_url.config(default=DATABASE_URL, conn_max_age=0 if ASYNC_VIEWS else 600)
     }
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # A file rather than memory, so the concurrency tests' processes share it
+            'TEST': {'NAME': BASE_DIR / 'test-db.sqlite3'},
         }
     }
 
+# Production SQLite profile, for deployments running several workers on the
+# SQLite fallback. WAL lets reads continue during a write, the busy timeout
+# makes writers queue for the lock instead of failing with "database is
+# locked", and the write paths (attendance/sqlite.py) use IMMEDIATE
+# transactions (Django 5.1+), which take the write lock when the transaction
+# starts rather than upgrading a read lock half way through. Other
+# transactions, read-only ones included, stay deferred.
+SQLITE_PRODUCTION = os.environ.get('SQLITE_PRODUCTION', 'False').lower() == 'true'
+SQLITE_PRODUCTION_PRAGMAS = {
+    # First, so that switching to WAL already waits for the lock
+    'busy_timeout': 20000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -32000,
+    'mmap_size': 134217728,
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRAGMAS = {}
+SQLITE_IMMEDIATE_WRITES = False
+if SQLITE_PRODUCTION and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    DATABASES['default']['OPTIONS'] = {'timeout': 20}
+    SQLITE_IMMEDIATE_WRITES = django.VERSION >= (5, 1)
+
+# Optional read replica (attendance/routers.py). Dashboards, class detail and
+# calendar views read from it, except for REPLICA_PIN_SECONDS after the same
+# client wrote something. Give DATABASE_REPLICA_URL alongside DATABASE_URL, or
+# SQLITE_REPLICA_PATH (a copy kept up to date by e.g. Litestream) with the
+# SQLite fallback. `manage.py test` on the SQLite fallback always runs with a
+# replica in its own file, which the tests fill from the primary themselves.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+SQLITE_REPLICA_PATH = os.environ.get('SQLITE_REPLICA_PATH')
+if DATABASE_URL and HAS_DJ_DATABASE_URL:
+    if DATABASE_REPLICA_URL:
+        DATABASES['replica'] = dj_database_url.parse(DATABASE_REPLICA_URL, conn_max_age=0 if ASYNC_VIEWS else 600)
+        # Only SQLite replicas can be filled by the tests; elsewhere they read the primary
+        DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+elif SQLITE_REPLICA_PATH or TESTING:
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=SQLITE_REPLICA_PATH or BASE_DIR / 'db-replica.sqlite3',
+        TEST={'NAME': BASE_DIR / 'test-db-replica.sqlite3'},
+    )
+if 'replica' in DATABASES:
+    DATABASE_ROUTERS = ['attendance.routers.ReplicaRouter']
+    # Outside SessionMiddleware so that session writes also pin the client
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware'),
+        'attendance.routers.ReplicaPinMiddleware',
+    )
+REPLICA_PIN_SECONDS = 5
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -135,8 +281,45 @@ STATICFILES_DIRS = [
     BASE_DIR / 'professor' / 'static',
 ]
 
-# Use WhiteNoise storage only if available
-if HAS_WHITENOISE:
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Use WhiteNoise storage only if available (STORAGES replaced STATICFILES_STORAGE,
+# which Django 5.1 no longer reads)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage' if HAS_WHITENOISE
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# A scan more than this many minutes after the scheduled start is late, and
+# very late past the second (professor/lateness.py)
+LATE_AFTER_MINUTES = int(os.environ.get('LATE_AFTER_MINUTES', '10'))
+VERY_LATE_AFTER_MINUTES = int(os.environ.get('VERY_LATE_AFTER_MINUTES', '30'))
+
+# Prometheus metrics (attendance/metrics.py). Each worker writes its totals to
+# METRICS_DIR, which must be shared by all workers of one server. /metrics is
+# served to staff users or to requests bearing METRICS_TOKEN.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'attendance-metrics'))
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Seconds each gunicorn worker may spend filling the caches in the background
+# once it has started (attendance/warmup.py); /healthz answers 503 meanwhile.
+WARMUP_SECONDS = float(os.environ.get('WARMUP_SECONDS', '10'))
+
+# Query budgets per view name, checked by the profiler middleware. Requests
+# over budget are logged, or raise QueryBudgetExceeded when the action is 'raise'.
+QUERY_BUDGET_ACTION = os.environ.get('QUERY_BUDGET_ACTION', 'log')
+QUERY_PROFILER_HISTORY = 200
+QUERY_BUDGETS = {
+    'professor:dashboard': 25,
+    'professor:class_detail': 10,
+    'professor:process_qr_scan': 10,
+    'professor:verify_qr': 8,
+    'professor:cancel_class': 10,
+    'professor:add_schedule': 8,
+    'student:dashboard': 20,
+    'student:class_detail': 12,
+}
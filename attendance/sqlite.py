@@ -0,0 +1,54 @@
+"""Per-connection PRAGMAs and write transactions for the production SQLite profile.
+
+``apply_pragmas`` is connected to ``connection_created`` in
+``main/apps.py`` and runs ``settings.SQLITE_PRAGMAS`` on every new SQLite
+connection. Most of these (``synchronous``, ``busy_timeout``, ``cache_size``,
+``mmap_size``) only last for the connection; ``journal_mode = WAL`` is stored
+in the database file but is cheap to repeat.
+
+``write_atomic`` is ``transaction.atomic`` for the write paths (scans, the
+attendance grid, archiving). With ``settings.SQLITE_IMMEDIATE_WRITES`` its
+outermost transaction starts with ``BEGIN IMMEDIATE``, taking the write lock
+up front: a deferred transaction that reads first and then writes has to
+upgrade its lock half way, and fails with "database is locked" at once if
+another writer got there first, without waiting for the busy timeout. Other
+transactions stay deferred, so read-only ``atomic()`` blocks never queue for
+the write lock.
+"""
+from django.conf import settings
+from django.db import transaction
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class ImmediateAtomic(transaction.Atomic):
+    """``Atomic`` whose outermost transaction begins with ``BEGIN IMMEDIATE`` on SQLite"""
+
+    def __enter__(self):
+        connection = transaction.get_connection(self.using)
+        if connection.vendor != 'sqlite' or connection.in_atomic_block:
+            return super().__enter__()
+        # The mode is read from the connection when the transaction begins (Django 5.1+)
+        connection.ensure_connection()
+        previous = connection.transaction_mode
+        connection.transaction_mode = 'IMMEDIATE'
+        try:
+            return super().__enter__()
+        finally:
+            connection.transaction_mode = previous
+
+
+def write_atomic(using=None):
+    """``transaction.atomic(using=using)`` for write paths, immediate on SQLite when configured to"""
+    if getattr(settings, 'SQLITE_IMMEDIATE_WRITES', False):
+        return ImmediateAtomic(using, savepoint=True, durable=False)
+    return transaction.atomic(using=using)
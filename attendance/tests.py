@@ -0,0 +1,151 @@
+import unittest
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from professor.models import Class
+from .auth import (
+    EPOCH_SESSION_KEY, CachedModelBackend, SessionEpochMiddleware, _epoch_key, _user_key, bump_session_epoch,
+    session_epoch,
+)
+from .routers import PIN_COOKIE, REPLICA, ReplicaPinMiddleware, replica_reads
+
+
+def _subjects(request):
+    return HttpResponse(','.join(Class.objects.order_by('id').values_list('subject', flat=True)))
+
+
+def _write_then_read(request):
+    User.objects.create_user('written')
+    return HttpResponse(str(User.objects.filter(username='written').exists()))
+
+
+def _has_own_replica():
+    replica = settings.DATABASES.get(REPLICA)
+    return (
+        replica is not None and not replica.get('TEST', {}).get('MIRROR')
+        and connections[REPLICA].vendor == 'sqlite' and connections['default'].vendor == 'sqlite'
+    )
+
+
+@unittest.skipUnless(_has_own_replica(), 'Needs a separate SQLite replica (the SQLite fallback under manage.py test)')
+class ReplicaRoutingTests(TransactionTestCase):
+    """Reads in ``replica_reads`` views go to the replica, writes and pinned clients to the primary"""
+
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        self.professor = User.objects.create_user('prof', first_name='Pro', last_name='Fessor')
+        self.professor.groups.add(Group.objects.get_or_create(name='professor')[0])
+        self.replicate()
+        # Not replicated yet, so only the primary has it
+        self.class_obj = Class.objects.create(professor=self.professor, subject='On the primary')
+
+    def replicate(self):
+        """Copy the primary's file into the replica's, as replication would"""
+        for alias in ('default', REPLICA):
+            connections[alias].ensure_connection()
+        connections['default'].connection.backup(connections[REPLICA].connection)
+
+    def get(self, view, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaPinMiddleware(view)(request)
+
+    def test_replica_reads_read_from_the_replica(self):
+        self.assertEqual(self.get(replica_reads(_subjects)).content, b'')
+        self.replicate()
+        self.assertEqual(self.get(replica_reads(_subjects)).content, b'On the primary')
+
+    def test_other_views_read_from_the_primary(self):
+        self.assertEqual(self.get(_subjects).content, b'On the primary')
+
+    def test_writes_go_to_the_primary_and_pin_the_client(self):
+        response = self.get(replica_reads(_write_then_read))
+        # The view's own reads moved to the primary after it wrote
+        self.assertEqual(response.content, b'True')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(User.objects.using('default').filter(username='written').exists())
+        self.assertFalse(User.objects.using(REPLICA).filter(username='written').exists())
+
+    def test_reads_only_do_not_pin(self):
+        self.assertNotIn(PIN_COOKIE, self.get(replica_reads(_subjects)).cookies)
+
+    def test_pinned_client_reads_from_the_primary(self):
+        response = self.get(replica_reads(_subjects), cookies={PIN_COOKIE: '1'})
+        self.assertEqual(response.content, b'On the primary')
+
+    def test_class_detail_follows_the_pin_cookie(self):
+        self.client.force_login(self.professor)
+        url = reverse('professor:class_detail', args=[self.class_obj.id])
+        # The replica has not seen the class yet
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.cookies[PIN_COOKIE] = '1'
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_a_write_request_sets_the_pin_cookie(self):
+        self.client.force_login(self.professor)
+        response = self.client.post(
+            reverse('professor:post_announcement', args=[self.class_obj.id]),
+            {'title': 'Quiz', 'content': 'On Friday'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+
+class SessionEpochTests(TestCase):
+    """Signed-cookie sessions only survive with the user's current epoch"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('epoch')
+
+    def session_survives(self, stamp):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        request.session[SESSION_KEY] = str(self.user.pk)
+        if stamp is not None:
+            request.session[EPOCH_SESSION_KEY] = stamp
+        SessionEpochMiddleware(lambda request: HttpResponse())(request)
+        return SESSION_KEY in request.session
+
+    def test_current_epoch_keeps_the_session(self):
+        self.assertTrue(self.session_survives(session_epoch(self.user.pk)))
+
+    def test_logging_out_ends_earlier_sessions(self):
+        stamp = session_epoch(self.user.pk)
+        bump_session_epoch(self.user.pk)
+        self.assertFalse(self.session_survives(stamp))
+
+    def test_an_evicted_epoch_ends_every_session(self):
+        stamp = session_epoch(self.user.pk)
+        cache.delete(_epoch_key(self.user.pk))
+        self.assertFalse(self.session_survives(stamp))
+        self.assertFalse(self.session_survives(0))
+        self.assertFalse(self.session_survives(None))
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cached')
+
+    def test_a_saved_user_is_forgotten_after_the_commit(self):
+        backend = CachedModelBackend()
+        active = backend.get_user(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # A request between the save and the commit still reads the active row
+            cache.set(_user_key(self.user.pk), active)
+        self.assertIsNone(cache.get(_user_key(self.user.pk)))
+        # Inactive users are not loaded at all
+        self.assertIsNone(backend.get_user(self.user.pk))
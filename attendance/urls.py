@@ -9,4 +9,5 @@ urlpatterns = [
     path('', include('main.urls')),
     path('student/', include('student.urls')),
     path('professor/', include('professor.urls')),
+    path('jobs/', include('jobs.urls')),
 ]
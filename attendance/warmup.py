@@ -0,0 +1,120 @@
+"""Warming a server up as it starts taking traffic.
+
+``prepare()`` compiles every template and builds the URL resolver.
+``gunicorn.conf.py`` calls it in the master once the app is preloaded, so
+every worker is forked with them.
+
+``start()`` then fills, in a background thread of each worker, the versioned
+caches the first requests of the day hit hardest (see ``professor/cache.py``),
+classes meeting earliest today first: their scan rosters, then their
+professors' timetables, then their students'. Filling stops after
+``settings.WARMUP_SECONDS``; whatever is left is cached by the first request
+that needs it, as before. The caches are shared, so the workers after the
+first mostly find the values there.
+
+The worker serves while it fills. ``status()`` is what ``/healthz``
+reports: not ready while this worker is still filling.
+"""
+import logging
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.template.utils import get_app_template_dirs
+from django.urls import get_resolver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_state = {'status': 'not started', 'started_at': None, 'seconds': None, 'counts': {}}
+
+
+def _templates():
+    """Load every template once, so cached loaders keep them compiled"""
+    count = 0
+    for engine in engines.all():
+        dirs = [*engine.dirs, *(get_app_template_dirs('templates') if engine.app_dirs else [])]
+        for directory in dirs:
+            for path in Path(directory).rglob('*.html'):
+                try:
+                    engine.get_template(path.relative_to(directory).as_posix())
+                except Exception:
+                    # Templates that only compile inside another app's setup are not worth failing over
+                    logger.debug('Could not compile %s', path, exc_info=True)
+                    continue
+                count += 1
+    return count
+
+
+def _caches(deadline):
+    from professor import cache
+    from professor.models import Schedule, StudentClassEnrollment
+
+    today = timezone.localdate().strftime('%A')
+    # {class id: professor id} and the students, in order of the class's first start time today
+    classes = {}
+    for class_id, professor_id in (
+        Schedule.objects.filter(day=today, class_obj__deleted_at__isnull=True)
+        .order_by('start_time').values_list('class_obj_id', 'class_obj__professor_id')
+    ):
+        classes.setdefault(class_id, professor_id)
+    students_by_class = {}
+    for class_id, student_id in StudentClassEnrollment.objects.filter(class_obj_id__in=classes).values_list(
+        'class_obj_id', 'student_id'
+    ):
+        students_by_class.setdefault(class_id, []).append(student_id)
+    students = dict.fromkeys(student_id for class_id in classes for student_id in students_by_class.get(class_id, []))
+
+    steps = [
+        *(('rosters', cache.class_roster, class_id) for class_id in classes),
+        *(('timetables', cache.professor_calendar, professor_id) for professor_id in dict.fromkeys(classes.values())),
+        *(('timetables', cache.student_calendar, student_id) for student_id in students),
+    ]
+    counts = {'rosters': 0, 'timetables': 0}
+    for kind, fill, obj_id in steps:
+        if time.monotonic() > deadline:
+            counts['skipped'] = len(steps) - sum(counts.values())
+            break
+        fill(obj_id)
+        counts[kind] += 1
+    return counts
+
+
+def prepare():
+    """Build the URL resolver and compile the templates of this process"""
+    get_resolver().url_patterns
+    _state['counts'] = {'templates': _templates()}
+    # Forked workers must open their own connections
+    connections.close_all()
+
+
+def run():
+    """Fill the caches; errors are logged and leave them cold"""
+    started = time.monotonic()
+    _state.update(status='running', started_at=timezone.now().isoformat())
+    try:
+        counts = _caches(started + settings.WARMUP_SECONDS)
+    except Exception:
+        logger.exception('Warm-up failed; serving cold')
+        _state['status'] = 'failed'
+    else:
+        _state.update(status='done', counts={**_state['counts'], **counts})
+    finally:
+        _state['seconds'] = round(time.monotonic() - started, 3)
+        # The connections of this thread
+        connections.close_all()
+    logger.info('Warm-up %s in %.2fs: %s', _state['status'], _state['seconds'], _state['counts'])
+
+
+def start():
+    """``run()`` in a background thread; this process is not ready until it is over"""
+    _state.update(status='running', started_at=timezone.now().isoformat())
+    threading.Thread(target=run, name='warmup', daemon=True).start()
+
+
+def status():
+    """``(ready, details)``: ready unless a warm-up is still running"""
+    return _state['status'] != 'running', dict(_state)
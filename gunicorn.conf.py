@@ -0,0 +1,54 @@
+"""Gunicorn configuration.
+
+Two deployment modes are supported:
+
+* ``ASYNC_VIEWS`` unset (default): sync WSGI workers serving
+  ``attendance.wsgi``, as before.
+* ``ASYNC_VIEWS=true``: uvicorn workers serving ``attendance.asgi``, with the
+  scan, verify and calendar endpoints routed to their async views
+  (``professor/async_views.py``). Use ``manage.py bench_scanners`` against
+  both modes to compare throughput on your hardware.
+
+The app is preloaded in the master, which compiles the templates before the
+workers are forked, and each worker then fills the caches in the background
+while ``/healthz`` reports it not ready (``attendance/warmup.py``). Set
+``GUNICORN_PRELOAD=false`` to load and compile in each worker instead.
+"""
+import os
+
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() == 'true'
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+accesslog = '-'
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+errorlog = '-'
+
+if ASYNC_VIEWS:
+    wsgi_app = 'attendance.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'attendance.wsgi:application'
+
+
+def on_starting(server):
+    """Start each server with empty per-worker metrics files (attendance/metrics.py)"""
+    import shutil
+    import tempfile
+
+    metrics_dir = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'attendance-metrics'))
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def when_ready(server):
+    """With a preloaded app, compile the templates once; the workers inherit them"""
+    if preload_app:
+        from attendance import warmup
+        warmup.prepare()
+
+
+def post_worker_init(worker):
+    from attendance import warmup
+    if not preload_app:
+        warmup.prepare()
+    warmup.start()
@@ -0,0 +1,110 @@
+"""Run background job workers.
+
+    python manage.py run_workers --processes 2
+
+Each process claims and runs due jobs one at a time (see ``jobs/queue.py``),
+sleeping ``--poll-interval`` seconds when the queue is empty. Every minute a
+worker also queues again the jobs of workers that died and, every hour,
+deletes old succeeded jobs. SIGTERM or Ctrl-C lets the current job finish
+before exiting. ``--burst`` exits once the queue is empty instead of waiting
+for more work.
+"""
+import logging
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from jobs import queue
+
+REQUEUE_EVERY = 60
+PURGE_EVERY = 3600
+
+logger = logging.getLogger('jobs')
+
+
+def _work(burst, poll_interval):
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *args: stopping.append(True))
+    worker = queue.worker_id()
+    next_requeue = next_purge = 0
+    processed = 0
+    while not stopping:
+        try:
+            now = time.monotonic()
+            if now >= next_requeue:
+                queue.requeue_stale()
+                next_requeue = now + REQUEUE_EVERY
+            if now >= next_purge:
+                queue.purge_finished()
+                next_purge = now + PURGE_EVERY
+
+            job = queue.claim(worker)
+            if job is not None:
+                queue.run(job)
+                processed += 1
+                continue
+        except DatabaseError:
+            # e.g. "database is locked" on SQLite: back off and try again
+            logger.exception('Worker %s hit a database error', worker)
+            _sleep(stopping, min(poll_interval, 1.0))
+            continue
+        if burst:
+            break
+        _sleep(stopping, poll_interval)
+    connections.close_all()
+    return processed
+
+
+def _sleep(stopping, seconds):
+    # Sleep in short steps so a stop signal is noticed quickly
+    deadline = time.monotonic() + seconds
+    while not stopping and time.monotonic() < deadline:
+        time.sleep(min(0.2, seconds))
+
+
+def _child(burst, poll_interval):
+    # Connections inherited over fork must not be shared with the parent
+    connections.close_all()
+    _work(burst, poll_interval)
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help='Seconds to wait before looking again when the queue is empty')
+        parser.add_argument('--burst', action='store_true', help='Exit when there are no due jobs left')
+
+    def handle(self, *args, **options):
+        burst, poll_interval = options['burst'], options['poll_interval']
+        if options['processes'] <= 1:
+            processed = _work(burst, poll_interval)
+            self.stdout.write(f'{processed} jobs run')
+            return
+
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [
+            context.Process(target=_child, args=(burst, poll_interval))
+            for _ in range(options['processes'])
+        ]
+        for child in children:
+            child.start()
+
+        def stop(*args):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for child in children:
+            child.join()
+        self.stdout.write(f'{len(children)} workers stopped')
@@ -0,0 +1,205 @@
+"""A small job queue stored in the database.
+
+Slow side effects are moved off the request path by registering a function
+with ``@task`` in an app's ``tasks.py`` and calling ``func.enqueue(...)``
+instead of ``func(...)``. That inserts a ``Job`` row in the current
+transaction, so a job is only ever seen if the request that queued it
+committed. ``manage.py run_workers`` claims and runs the jobs.
+
+Claiming uses ``SELECT ... FOR UPDATE SKIP LOCKED`` where the database has
+it (PostgreSQL, MySQL 8), so concurrent workers never wait on each other.
+SQLite has no row locks; there a worker picks candidates and takes one with
+a compare-and-set ``UPDATE ... WHERE status = 'queued'``, moving on to the
+next candidate if another worker got there first.
+
+A task runs in a transaction, unless registered with ``atomic=False`` (long
+tasks that commit their work in steps). If it raises, the job is queued
+again with an exponential delay (``settings.JOBS_RETRY_DELAY`` doubled per
+attempt) until it has been tried ``max_attempts`` times, then marked failed.
+A job whose worker died is queued again once its lock is older than
+``settings.JOBS_LOCK_TIMEOUT``. Tasks must therefore be safe to run twice.
+Tasks that may run longer than that call ``touch()`` as they go (the batch
+loops of ``professor/purge.py`` and ``professor/archive.py`` do), which
+renews the lock of the job being run.
+
+With ``settings.JOBS_EAGER`` the job is run in the queuing process right
+after its transaction commits; nothing needs ``run_workers`` then. As no
+worker would ever pick a requeued job up, a failing eager job is retried
+right away, in the same process, until it succeeds or runs out of attempts.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# How many candidates a SQLite worker tries before giving up for this round
+CLAIM_CANDIDATES = 10
+# ``locked_by`` of jobs run in the process that queued them
+EAGER = 'eager'
+
+_registry = {}
+# The job this thread is running, for ``touch()``
+_running = threading.local()
+
+
+def task(priority=0, max_attempts=3, atomic=True):
+    """Register a function as a job; queue calls of it with ``func.enqueue(**kwargs)``.
+
+    Arguments must be JSON-serializable. ``enqueue`` also accepts
+    ``created_by`` (the user allowed to see the job's status) and returns the
+    ``Job``. With ``atomic=False`` the task runs outside a transaction and
+    manages its own.
+    """
+    def decorator(func):
+        func.job_name = f'{func.__module__}.{func.__qualname__}'
+        func.job_priority = priority
+        func.job_max_attempts = max_attempts
+        func.job_atomic = atomic
+        func.enqueue = partial(enqueue, func)
+        _registry[func.job_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, created_by=None, **kwargs):
+    job = Job.objects.create(
+        name=func.job_name,
+        kwargs=kwargs,
+        priority=func.job_priority,
+        max_attempts=func.job_max_attempts,
+        created_by=created_by,
+        **(_eager_lock() if settings.JOBS_EAGER else {}),
+    )
+    if settings.JOBS_EAGER:
+        transaction.on_commit(partial(run, job))
+    return job
+
+
+def _eager_lock():
+    return {'status': Job.RUNNING, 'attempts': 1, 'locked_by': EAGER, 'locked_at': timezone.now()}
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """Take the next due job for ``worker``, or return ``None``"""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).order_by('-priority', 'run_after', 'id')
+    lock = {'status': Job.RUNNING, 'locked_by': worker, 'locked_at': now}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = due.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            for field, value in lock.items():
+                setattr(job, field, value)
+            job.attempts += 1
+            job.save(update_fields=[*lock, 'attempts'])
+            return job
+
+    for job_id in due.values_list('id', flat=True)[:CLAIM_CANDIDATES]:
+        if Job.objects.filter(id=job_id, status=Job.QUEUED).update(attempts=F('attempts') + 1, **lock):
+            return Job.objects.get(id=job_id)
+    return None
+
+
+class LockLost(Exception):
+    """The job was taken over by another worker while this one ran it"""
+
+
+def _record(job, **outcome):
+    """Store the outcome of a job, unless another worker has taken it over"""
+    return Job.objects.filter(id=job.id, locked_by=job.locked_by, status=Job.RUNNING).update(
+        locked_by='', locked_at=None, **outcome
+    )
+
+
+def touch():
+    """Renew the lock of the job this thread is running, so it is not presumed dead.
+
+    Does nothing outside a job, and writes at most every quarter of
+    ``settings.JOBS_LOCK_TIMEOUT``. Raises ``LockLost`` if another worker has
+    taken the job over.
+    """
+    job = getattr(_running, 'job', None)
+    if job is None or time.monotonic() - _running.touched < settings.JOBS_LOCK_TIMEOUT / 4:
+        return
+    if not Job.objects.filter(id=job.id, locked_by=job.locked_by, status=Job.RUNNING).update(
+        locked_at=timezone.now()
+    ):
+        raise LockLost(job.id)
+    _running.touched = time.monotonic()
+
+
+def run(job):
+    """Run a claimed job and record the outcome"""
+    func = _registry.get(job.name)
+    # An eager job may be run from inside another
+    outer = getattr(_running, 'job', None), getattr(_running, 'touched', None)
+    try:
+        if func is None:
+            raise LookupError(f'No task named {job.name}')
+        _running.job, _running.touched = job, time.monotonic()
+        # The success is recorded in the task's transaction, so a job is never
+        # left done but still marked running (and run again later)
+        with transaction.atomic() if func.job_atomic else nullcontext():
+            result = func(**job.kwargs)
+            if not _record(job, status=Job.SUCCEEDED, result=result, finished_at=timezone.now(), error=''):
+                raise LockLost(job.id)
+        return Job.SUCCEEDED
+    except LockLost:
+        logger.warning('Job %s was taken over by another worker; its result is discarded', job)
+        return None
+    except Exception:
+        logger.exception('Job %s failed (attempt %s of %s)', job, job.attempts, job.max_attempts)
+        if func is not None and job.attempts < job.max_attempts and job.locked_by == EAGER:
+            # No worker will run it later, so try again now
+            job.attempts += 1
+            Job.objects.filter(id=job.id, locked_by=EAGER).update(
+                attempts=job.attempts, locked_at=timezone.now(), error=traceback.format_exc()
+            )
+            return run(job)
+        if func is not None and job.attempts < job.max_attempts:
+            delay = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            outcome = {'status': Job.QUEUED, 'run_after': timezone.now() + timedelta(seconds=delay)}
+        else:
+            outcome = {'status': Job.FAILED, 'finished_at': timezone.now()}
+        _record(job, error=traceback.format_exc(), **outcome)
+        return outcome['status']
+    finally:
+        _running.job, _running.touched = outer
+
+
+def requeue_stale():
+    """Give jobs whose worker has gone away back to the queue (or fail them)"""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    reset = {'locked_by': '', 'locked_at': None, 'error': 'Worker stopped while running the job'}
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=timezone.now(), **reset
+    )
+    requeued = stale.update(status=Job.QUEUED, run_after=timezone.now(), **reset)
+    return requeued, failed
+
+
+def purge_finished():
+    """Delete succeeded jobs older than ``settings.JOBS_KEEP_DAYS``"""
+    cutoff = timezone.now() - timedelta(days=settings.JOBS_KEEP_DAYS)
+    return Job.objects.filter(status=Job.SUCCEEDED, finished_at__lt=cutoff).delete()[0]
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim, requeue_stale, run, task, touch
+
+
+def _run_for_longer_than_the_lock_timeout():
+    Job.objects.filter(status=Job.RUNNING).update(
+        locked_at=timezone.now() - timedelta(seconds=2 * settings.JOBS_LOCK_TIMEOUT)
+    )
+
+
+@task(max_attempts=1, atomic=False)
+def _long_task():
+    _run_for_longer_than_the_lock_timeout()
+    with override_settings(JOBS_LOCK_TIMEOUT=0):
+        touch()
+    return requeue_stale()
+
+
+@task(max_attempts=1, atomic=False)
+def _taken_over_task():
+    # Another worker found the lock stale and claimed the job again
+    Job.objects.filter(status=Job.RUNNING).update(locked_by='other', locked_at=timezone.now())
+    with override_settings(JOBS_LOCK_TIMEOUT=0):
+        touch()
+    return 'not reached'
+
+
+@override_settings(JOBS_EAGER=False)
+class HeartbeatTests(TestCase):
+    """``touch()`` keeps a long job's lock from going stale"""
+
+    def run_job(self, func):
+        func.enqueue()
+        job = claim('worker')
+        return job, run(job)
+
+    def test_touched_job_is_not_requeued(self):
+        job, status = self.run_job(_long_task)
+        self.assertEqual(status, Job.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual(job.result, [0, 0])
+
+    def test_untouched_job_is_failed(self):
+        _long_task.enqueue()
+        claim('worker')
+        _run_for_longer_than_the_lock_timeout()
+        self.assertEqual(requeue_stale(), (0, 1))
+
+    def test_touch_stops_a_job_taken_over(self):
+        job, status = self.run_job(_taken_over_task)
+        self.assertIsNone(status)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.result), (Job.RUNNING, 'other', None))
+
+    def test_touch_outside_a_job_does_nothing(self):
+        with override_settings(JOBS_LOCK_TIMEOUT=0):
+            touch()
+        self.assertFalse(Job.objects.exists())
@@ -0,0 +1,22 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from .models import Job
+
+
+@login_required
+def job_status(request, job_id):
+    """JSON status of a job queued by the current user, for polling from the UI"""
+    job = get_object_or_404(Job, id=job_id, created_by=request.user)
+    data = {
+        'id': job.id,
+        'status': job.status,
+        'attempts': job.attempts,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': job.result,
+    }
+    if job.status == Job.FAILED:
+        data['error'] = 'The job failed'
+    return JsonResponse(data)
@@ -0,0 +1,17 @@
+from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+
+from professor import purge
+from professor.admin import PurgeInBackgroundMixin
+
+
+class PurgingUserAdmin(PurgeInBackgroundMixin, UserAdmin):
+    """Deleting a user deactivates them now and purges their classes and attendance with a job"""
+
+    def delete_queryset(self, request, queryset):
+        purge.delete_users(queryset, created_by=request.user)
+
+
+admin.site.unregister(User)
+admin.site.register(User, PurgingUserAdmin)
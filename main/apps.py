@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from attendance.sqlite import apply_pragmas
+        from . import signals  # noqa: F401
+
+        connection_created.connect(apply_pragmas)
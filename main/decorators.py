@@ -0,0 +1,46 @@
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+
+from .roles import PROFESSOR, STUDENT
+
+
+def role_required(role):
+    """Allow the view only for users with ``role`` in ``request.roles``.
+
+    The role check itself runs no queries. ``request.user`` is still loaded
+    first, since that is where Django verifies the session's auth hash (a
+    password change ends other sessions). Anonymous users are sent to the
+    login page and logged-in users without the role get a 403. Works for both
+    sync and async views.
+    """
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_async_view(request, *args, **kwargs):
+                # Async views cannot load the lazy request.user themselves, so
+                # force it here
+                is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+                if not is_authenticated:
+                    return redirect_to_login(request.get_full_path())
+                if role not in request.roles:
+                    raise PermissionDenied
+                return await view_func(request, *args, **kwargs)
+            return _wrapped_async_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return redirect_to_login(request.get_full_path())
+            if role not in request.roles:
+                raise PermissionDenied
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
+
+
+professor_required = role_required(PROFESSOR)
+student_required = role_required(STUDENT)
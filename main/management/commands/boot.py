@@ -0,0 +1,120 @@
+"""Prepare a web dyno and start gunicorn, skipping the steps that have nothing to do.
+
+    python manage.py boot
+
+Replaces ``collectstatic && migrate && createcachetable && gunicorn`` in the
+Procfile. Every restart and scale-out ran them in full before the server
+could answer; now:
+
+- ``collectstatic`` runs only when the collected files are out of date: the
+  manifest does not list exactly the current static sources, or a source
+  differs from its collected copy. Nothing but the manifest and the copies,
+  which every ``collectstatic`` writes, is consulted.
+- ``migrate`` runs only when the default database has unapplied migrations.
+- ``createcachetable`` no longer runs; run it once when switching to
+  ``CACHE_BACKEND=db``.
+
+gunicorn then replaces this process (``exec``) with the settings of
+``gunicorn.conf.py``, which preloads the app and warms it up
+(``attendance/warmup.py``).
+"""
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+# collectstatic's default ignore patterns
+IGNORE_PATTERNS = ['CVS', '.*', '*~']
+
+
+def static_sources():
+    """``{path: (storage, path in storage)}`` of the files ``collectstatic`` would copy"""
+    sources = {}
+    for finder in finders.get_finders():
+        for path, storage in finder.list(IGNORE_PATTERNS):
+            prefixed = os.path.join(storage.prefix, path) if getattr(storage, 'prefix', None) else path
+            # Like collectstatic, the first finder to have a path wins
+            sources.setdefault(prefixed, (storage, path))
+    return sources
+
+
+def _same_content(source, collected):
+    while True:
+        chunk = source.read(1 << 16)
+        if chunk != collected.read(1 << 16):
+            return False
+        if not chunk:
+            return True
+
+
+def changed_static_files():
+    """``(manifest current, changed paths)`` of the collected static files.
+
+    The manifest is current when it lists exactly the static sources (always,
+    for a storage without one); a path is changed when its collected copy is
+    missing or differs from the source.
+    """
+    sources = static_sources()
+    manifest_current = True
+    if hasattr(staticfiles_storage, 'load_manifest'):
+        try:
+            manifest_paths, _ = staticfiles_storage.load_manifest()
+        except ValueError:
+            # Unreadable, or written by another version
+            manifest_paths = {}
+        manifest_current = set(manifest_paths) == set(sources)
+    changed = []
+    for prefixed, (storage, path) in sources.items():
+        if not staticfiles_storage.exists(prefixed) or storage.size(path) != staticfiles_storage.size(prefixed):
+            changed.append(prefixed)
+            continue
+        with storage.open(path) as source, staticfiles_storage.open(prefixed) as collected:
+            if not _same_content(source, collected):
+                changed.append(prefixed)
+    return manifest_current, changed
+
+
+def unapplied_migrations(using=DEFAULT_DB_ALIAS):
+    executor = MigrationExecutor(connections[using])
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+class Command(BaseCommand):
+    help = 'Collect static files and migrate only when needed, then exec gunicorn'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Collect static files and migrate regardless')
+        parser.add_argument('--no-serve', action='store_true', help='Prepare only; do not start gunicorn')
+
+    def handle(self, *args, **options):
+        self.collectstatic(options['force'])
+
+        plan = unapplied_migrations()
+        if plan or options['force']:
+            self.stdout.write(f'Applying {len(plan)} migrations')
+            call_command('migrate', interactive=False, verbosity=options['verbosity'])
+        else:
+            self.stdout.write('Migrations: up to date, skipped')
+        connections.close_all()
+
+        if options['no_serve']:
+            return
+        self.stdout.flush()
+        os.execvp('gunicorn', ['gunicorn', '--config', str(settings.BASE_DIR / 'gunicorn.conf.py')])
+
+    def collectstatic(self, force):
+        manifest_current, changed = changed_static_files()
+        if manifest_current and not changed and not force:
+            self.stdout.write('Static files: unchanged, skipped')
+            return
+        # collectstatic skips a copy no older than its source, to the second
+        for path in changed:
+            if staticfiles_storage.exists(path):
+                staticfiles_storage.delete(path)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.stdout.write(f'Static files: collected ({len(changed)} changed)')
@@ -0,0 +1,88 @@
+"""User roles (professor / student) resolved once and kept in the session.
+
+The role is resolved from the user's groups with a single query at login and
+stored in the session together with the user's current *role version*.
+``RoleMiddleware`` exposes it as ``request.roles`` (a frozenset, empty for
+anonymous users) without touching the database, and the ``professor_required``
+/ ``student_required`` decorators in ``main.decorators`` check it.
+
+Changing a user's group membership bumps their role version in the cache
+(see ``main/signals.py``); sessions holding an older version re-resolve the
+role on their next request. The version lives in the default cache, so it is
+shared between workers whenever the configured cache backend is. A version
+missing from the cache (never set, or culled) matches no session: the role
+is re-resolved from the database and a fresh version is stored, so evicting
+a bumped version can never bring a revoked role back.
+"""
+import time
+
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+
+PROFESSOR = 'professor'
+STUDENT = 'student'
+ROLES = (PROFESSOR, STUDENT)
+
+ROLE_SESSION_KEY = '_attendance_roles'
+
+
+def _version_key(user_id):
+    return f'role-version:{user_id}'
+
+
+def role_version(user_id):
+    """The user's current role version, or ``None`` if the cache has none"""
+    return cache.get(_version_key(user_id))
+
+
+def _current_role_version(user_id):
+    # A fresh token never equals a version stored in a session before
+    return cache.get_or_set(_version_key(user_id), time.time_ns(), None)
+
+
+def bump_role_version(user_id):
+    """Invalidate the roles cached in every session of ``user_id``"""
+    cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def resolve_roles(user):
+    """The user's roles, from their groups (one query)"""
+    return frozenset(user.groups.filter(name__in=ROLES).values_list('name', flat=True))
+
+
+def remember_roles(request, user, roles=None):
+    """Store ``user``'s roles in the session; call after ``login()``"""
+    version = _current_role_version(user.pk)
+    if roles is None:
+        # Resolved after reading the version, so a bump in between is not missed
+        roles = resolve_roles(user)
+    request.session[ROLE_SESSION_KEY] = [user.pk, sorted(roles), version]
+    request.roles = frozenset(roles)
+    return request.roles
+
+
+class RoleMiddleware:
+    """Set ``request.roles`` from the session.
+
+    Must come after ``AuthenticationMiddleware``. Only a session without a
+    current role entry (logged in before roles were stored, or whose role
+    version was bumped or dropped from the cache) costs a query, once.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.roles = self.get_roles(request)
+        return self.get_response(request)
+
+    def get_roles(self, request):
+        user_id = request.session.get(SESSION_KEY)
+        if user_id is None:
+            return frozenset()
+        stored = request.session.get(ROLE_SESSION_KEY)
+        if stored and str(stored[0]) == str(user_id) and stored[2] is not None and stored[2] == role_version(stored[0]):
+            return frozenset(stored[1])
+        if not request.user.is_authenticated:
+            return frozenset()
+        return remember_roles(request, request.user)
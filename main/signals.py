@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from attendance.auth import EPOCH_SESSION_KEY, bump_session_epoch, forget_user, session_epoch
+from .roles import bump_role_version
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_cached_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    """Make sessions re-resolve roles when group membership changes"""
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        bump_role_version(instance.pk)
+    elif action == 'pre_clear':
+        # group.user_set.clear() does not report which users were removed
+        for user_id in instance.user_set.values_list('pk', flat=True):
+            bump_role_version(user_id)
+    else:
+        for user_id in pk_set or ():
+            bump_role_version(user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    # Not before the commit: a request in between would cache the old row again
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+@receiver(user_logged_in)
+def stamp_session_epoch(sender, request, user, **kwargs):
+    request.session[EPOCH_SESSION_KEY] = session_epoch(user.pk)
+
+
+@receiver(user_logged_out)
+def end_cached_sessions(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+        bump_session_epoch(user.pk)
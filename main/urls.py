@@ -15,4 +15,13 @@ urlpatterns = [
     # Authentication for professors
     path('login/professor/', views.professor_login, name='professor_login'),
     path('signup/professor/', views.professor_signup, name='professor_signup'),
+
+    # Staff-only query profiler summary
+    path('profiler/', views.query_profile, name='query_profile'),
+
+    # Prometheus metrics (token or staff only)
+    path('metrics', views.metrics, name='metrics'),
+
+    # Readiness probe (database reachable, warm-up finished)
+    path('healthz', views.healthz, name='healthz'),
 ]
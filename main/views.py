@@ -2,8 +2,19 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import Group
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+
+from django.db import DatabaseError, connection
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
+
+from attendance import metrics as attendance_metrics
+from attendance import warmup
+from attendance.profiler import summary as profile_summary
 
 from .forms import StudentSignUpForm, ProfessorSignUpForm
+from .roles import PROFESSOR, STUDENT, remember_roles, resolve_roles
 
 
 from django.contrib import messages
@@ -22,10 +33,12 @@ def home(request):
             student_login_form = AuthenticationForm(request, data=request.POST)
             if student_login_form.is_valid():
                 user = student_login_form.get_user()
-                if not user.groups.filter(name="student").exists():
+                roles = resolve_roles(user)
+                if STUDENT not in roles:
                     student_login_form.add_error(None, "This account is not registered as a student.")
                 else:
                     login(request, user)
+                    remember_roles(request, user, roles)
                     return redirect("student:dashboard")
             context['student_login_form'] = student_login_form
             context['professor_login_form'] = AuthenticationForm()
@@ -33,10 +46,12 @@ def home(request):
             professor_login_form = AuthenticationForm(request, data=request.POST)
             if professor_login_form.is_valid():
                 user = professor_login_form.get_user()
-                if not user.groups.filter(name="professor").exists():
+                roles = resolve_roles(user)
+                if PROFESSOR not in roles:
                     professor_login_form.add_error(None, "This account is not registered as a professor.")
                 else:
                     login(request, user)
+                    remember_roles(request, user, roles)
                     return redirect("professor:dashboard")
             context['professor_login_form'] = professor_login_form
             context['student_login_form'] = AuthenticationForm()
@@ -59,10 +74,12 @@ def student_login(request):
         form = AuthenticationForm(request, data=request.POST)
         if form.is_valid():
             user = form.get_user()
-            if not user.groups.filter(name="student").exists():
+            roles = resolve_roles(user)
+            if STUDENT not in roles:
                 form.add_error(None, "This account is not registered as a student.")
             else:
                 login(request, user)
+                remember_roles(request, user, roles)
                 return redirect("student:dashboard")
     else:
         form = AuthenticationForm(request)
@@ -78,6 +95,7 @@ def student_signup(request):
             student_group = _get_or_create_group("student")
             user.groups.add(student_group)
             login(request, user)
+            remember_roles(request, user, {STUDENT})
             return redirect("student:dashboard")
     else:
         form = StudentSignUpForm()
@@ -90,10 +108,12 @@ def professor_login(request):
         form = AuthenticationForm(request, data=request.POST)
         if form.is_valid():
             user = form.get_user()
-            if not user.groups.filter(name="professor").exists():
+            roles = resolve_roles(user)
+            if PROFESSOR not in roles:
                 form.add_error(None, "This account is not registered as a professor.")
             else:
                 login(request, user)
+                remember_roles(request, user, roles)
                 return redirect("professor:dashboard")
     else:
         form = AuthenticationForm(request)
@@ -109,8 +129,45 @@ def professor_signup(request):
             prof_group = _get_or_create_group("professor")
             user.groups.add(prof_group)
             login(request, user)
+            remember_roles(request, user, {PROFESSOR})
             return redirect("professor:dashboard")
     else:
         form = ProfessorSignUpForm()
 
     return render(request, "main/professor_signup.html", {"form": form})
+
+
+@staff_member_required
+def query_profile(request):
+    """Rolling per-view query/timing summary recorded by the profiler middleware."""
+    if request.method == "POST":
+        profile_summary.clear()
+        return redirect("query_profile")
+    recent, views = profile_summary.snapshot()
+    return render(request, "main/query_profile.html", {
+        "enabled": settings.QUERY_PROFILER,
+        "recent": recent,
+        "views": views,
+    })
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, for a bearer METRICS_TOKEN or a staff user."""
+    auth = request.headers.get("Authorization", "")
+    token_ok = bool(settings.METRICS_TOKEN) and constant_time_compare(auth, f"Bearer {settings.METRICS_TOKEN}")
+    if not token_ok and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(attendance_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def healthz(request):
+    """Readiness probe: 200 once the database answers and this worker's warm-up is over, 503 before."""
+    ready, details = warmup.status()
+    details = {"warmup": details, "database": "ok"}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except DatabaseError:
+        ready = False
+        details["database"] = "unavailable"
+    return JsonResponse({"ready": ready, **details}, status=200 if ready else 503)
@@ -1,41 +1,252 @@
-from django.contrib import admin
-from .models import Class, Schedule, Announcement, AttendanceRecord, AttendanceEntry, StudentClassEnrollment
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, models, transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+
+from . import purge, tasks
+from .models import (
+    Class, Schedule, Announcement, AttendanceRecord, AttendanceEntry, StudentClassEnrollment, Term, AttendanceSummary,
+)
+
+
+class PurgeInBackgroundMixin:
+    """Admin deletes that hide the objects now and purge them with a job (see ``purge.py``)"""
+
+    def get_deleted_objects(self, objs, request):
+        # The default confirmation page lists every dependent row, loading the whole history
+        objs = list(objs)
+        perms_needed = self._perms_needed(request, self.model, 'pk__in', [obj.pk for obj in objs], {self.model})
+        return [str(obj) for obj in objs], {self.model._meta.verbose_name_plural: len(objs)}, perms_needed, []
+
+    def _perms_needed(self, request, model, lookup, pks, seen):
+        """Names of the models the purge would delete rows of that the user may not delete.
+
+        Follows the cascades like the purge does; a model is only queried, for
+        whether it has any rows to delete, when the user lacks the permission.
+        """
+        perms_needed = set()
+        for relation in model._meta.related_objects:
+            related = relation.related_model
+            if relation.on_delete is not models.CASCADE or related in seen:
+                continue
+            related_lookup = f'{relation.field.name}__{lookup}'
+            model_admin = self.admin_site._registry.get(related)
+            if (
+                model_admin is not None and not model_admin.has_delete_permission(request)
+                and related._base_manager.filter(**{related_lookup: pks}).exists()
+            ):
+                perms_needed.add(related._meta.verbose_name)
+            perms_needed |= self._perms_needed(request, related, related_lookup, pks, seen | {related})
+        return perms_needed
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, self.model._default_manager.filter(pk=obj.pk))
+
+
+class HideDeletedClassesMixin:
+    """Leaves out the rows of deleted classes, which ``Class.objects`` already hides, until the purge removes them"""
+    class_lookup = 'class_obj'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(**{f'{self.class_lookup}__deleted_at__isnull': True})
+
+    def get_paginator(self, request, queryset, *args, **kwargs):
+        paginator = super().get_paginator(request, queryset, *args, **kwargs)
+        # With only this condition the list is still unfiltered for EstimatedCountPaginator
+        paginator.unfiltered_where = self.get_queryset(request).query.where
+        return paginator
+
+
+# Below this many rows the changelist count is exact
+ESTIMATE_THRESHOLD = 100000
+
+
+def estimated_row_count(model, using):
+    """The database's own estimate of the number of rows in ``model``'s table, or ``None``.
+
+    PostgreSQL and MySQL keep one in their catalogs. SQLite only has one once
+    ``ANALYZE`` has been run (in ``sqlite_stat1``).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        'postgresql': ('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [connection.ops.quote_name(table)]),
+        'mysql': (
+            'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+            [table],
+        ),
+        # The first number of any of the table's rows is its row count
+        'sqlite': ('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table]),
+    }
+    if connection.vendor not in queries:
+        return None
+    sql, params = queries[connection.vendor]
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        # No sqlite_stat1 before the first ANALYZE
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0].split('.')[0])
+    # PostgreSQL reports -1 for a table that has never been analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Changelist paginator that does not ``COUNT(*)`` a large unfiltered table.
+
+    The estimate is used when the list is unfiltered and the table has at
+    least ``ESTIMATE_THRESHOLD`` rows by it; filtered lists (a class, a date
+    from the date hierarchy) are counted exactly, on the indexes.
+    """
+
+    # The condition of the admin's own queryset, which does not filter the list
+    unfiltered_where = None
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where or queryset.query.where == self.unfiltered_where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class IdListFilter(admin.FieldListFilter):
+    """Filter on a foreign key by typing an id, instead of listing every related row.
+
+    Use as ``('field__path', IdListFilter)`` in ``list_filter``.
+    """
+    template = 'admin/professor/id_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg, [None])[-1]
+        self.related_model = field.related_model
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {}
+
+    def choices(self, changelist):
+        selected = None
+        if self.lookup_val and self.lookup_val.isdigit():
+            selected = self.related_model._default_manager.filter(pk=self.lookup_val).first()
+        yield {
+            'name': self.lookup_kwarg,
+            'value': self.lookup_val or '',
+            'selected': selected,
+            'clear_query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            # The other filters, kept when this one's form is submitted
+            'hidden': [
+                (key, value) for key, values in changelist.params.items() if key != self.lookup_kwarg
+                for value in (values if isinstance(values, list) else [values])
+            ],
+        }
 
 
 @admin.register(Class)
-class ClassAdmin(admin.ModelAdmin):
+class ClassAdmin(PurgeInBackgroundMixin, admin.ModelAdmin):
     list_display = ['subject', 'section', 'room', 'class_code', 'professor', 'created_at']
     list_filter = ['created_at', 'professor']
     search_fields = ['subject', 'section', 'room', 'class_code']
     readonly_fields = ['class_code']
 
+    def delete_queryset(self, request, queryset):
+        purge.delete_classes(queryset, created_by=request.user)
+
 
 @admin.register(Schedule)
-class ScheduleAdmin(admin.ModelAdmin):
+class ScheduleAdmin(HideDeletedClassesMixin, admin.ModelAdmin):
     list_display = ['class_obj', 'day', 'start_time', 'end_time']
     list_filter = ['day', 'class_obj']
+    list_select_related = ['class_obj']
+    autocomplete_fields = ['class_obj']
 
 
 @admin.register(Announcement)
-class AnnouncementAdmin(admin.ModelAdmin):
+class AnnouncementAdmin(HideDeletedClassesMixin, admin.ModelAdmin):
     list_display = ['title', 'class_obj', 'created_at']
     list_filter = ['created_at', 'class_obj']
+    list_select_related = ['class_obj']
+    autocomplete_fields = ['class_obj']
 
 
 @admin.register(AttendanceRecord)
-class AttendanceRecordAdmin(admin.ModelAdmin):
-    list_display = ['class_obj', 'date', 'schedule_time']
-    list_filter = ['date', 'class_obj']
+class AttendanceRecordAdmin(HideDeletedClassesMixin, admin.ModelAdmin):
+    list_display = ['class_obj', 'date', 'schedule_time', 'entries']
+    list_filter = ['canceled', ('class_obj', IdListFilter)]
+    list_select_related = ['class_obj']
+    date_hierarchy = 'date'
+    autocomplete_fields = ['class_obj']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @admin.display(description='Entries')
+    def entries(self, obj):
+        url = reverse('admin:professor_attendanceentry_changelist')
+        return format_html('<a href="{}?attendance_record__id__exact={}">View</a>', url, obj.id)
 
 
 @admin.register(AttendanceEntry)
-class AttendanceEntryAdmin(admin.ModelAdmin):
-    list_display = ['student', 'attendance_record', 'time_scanned']
-    list_filter = ['time_scanned', 'attendance_record']
+class AttendanceEntryAdmin(HideDeletedClassesMixin, admin.ModelAdmin):
+    class_lookup = 'attendance_record__class_obj'
+    list_display = ['student', 'attendance_record', 'time_scanned', 'minutes_late', 'lateness']
+    list_filter = ['lateness', ('attendance_record__class_obj', IdListFilter), ('attendance_record', IdListFilter)]
+    list_select_related = ['student', 'attendance_record__class_obj']
+    date_hierarchy = 'time_scanned'
+    # Newest first along the primary key; time_scanned has no index to sort on
+    ordering = ['-id']
+    raw_id_fields = ['attendance_record']
+    autocomplete_fields = ['student']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        # Listing the months of the whole table reads every entry; once the list
+        # is narrowed to a class or session it only reads theirs
+        narrowed = any(key.startswith('attendance_record__') for key in request.GET)
+        return super().changelist_view(request, {'show_date_hierarchy': narrowed, **(extra_context or {})})
 
 
 @admin.register(StudentClassEnrollment)
 class StudentClassEnrollmentAdmin(admin.ModelAdmin):
     list_display = ['student', 'class_obj', 'enrolled_at']
     list_filter = ['enrolled_at', 'class_obj']
+    list_select_related = ['student', 'class_obj']
+    search_fields = ['student__username', 'class_obj__subject']
+    autocomplete_fields = ['student', 'class_obj']
+
+
+@admin.register(Term)
+class TermAdmin(admin.ModelAdmin):
+    list_display = ['name', 'start_date', 'end_date', 'archived_at']
+    readonly_fields = ['archived_at']
+    actions = ['archive']
+
+    @admin.action(description='Archive the attendance of selected terms')
+    def archive(self, request, queryset):
+        ended = queryset.filter(end_date__lt=timezone.localdate())
+        for term in ended:
+            tasks.archive_term.enqueue(created_by=request.user, term_id=term.id)
+        self.message_user(request, f'Archiving {len(ended)} terms in the background.')
+        if len(ended) < len(queryset):
+            self.message_user(request, 'Terms that have not ended yet were skipped.', messages.WARNING)
+
+
+@admin.register(AttendanceSummary)
+class AttendanceSummaryAdmin(HideDeletedClassesMixin, admin.ModelAdmin):
+    list_display = ['student', 'class_obj', 'term', 'attended', 'sessions']
+    list_filter = ['term']
+    list_select_related = ['student', 'class_obj', 'term']
     search_fields = ['student__username', 'class_obj__subject']
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProfessorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'professor'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import search
+
+        post_migrate.connect(search.install, sender=self)
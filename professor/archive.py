@@ -0,0 +1,128 @@
+"""Moving the sessions of ended terms out of the attendance tables.
+
+``AttendanceRecord`` and ``AttendanceEntry`` only ever grow, and every class
+and dashboard query runs against them. ``archive_term`` moves the sessions
+dated within a term, with their entries, to ``ArchivedAttendanceRecord`` and
+``ArchivedAttendanceEntry``:
+
+- Sessions are moved ``ARCHIVE_BATCH_SIZE`` at a time with
+  ``INSERT ... SELECT`` and ``DELETE`` statements, each batch in its own
+  transaction, so rows never pass through Python and no lock is held for
+  long. Rows keep their ids. An interrupted run is finished by running it
+  again. Each batch renews the lock of the job running it
+  (``jobs.queue.touch``).
+- Once everything is moved, an ``AttendanceSummary`` row per student and
+  class (sessions attended out of sessions held) is written from the archive,
+  for everyone who attended or is still enrolled.
+
+The class views read the hot tables only; the attendance tabs show an
+archived term when asked for it with ``?term=<id>`` (see ``tabs.py``).
+"""
+from collections import Counter
+
+from django.db import connections, router
+from django.db.models import Count
+from django.utils import timezone
+
+from attendance.sqlite import write_atomic
+from jobs.queue import touch
+from . import cache
+from .models import (
+    AttendanceRecord, AttendanceEntry, ArchivedAttendanceRecord, ArchivedAttendanceEntry, AttendanceSummary,
+    StudentClassEnrollment,
+)
+
+ARCHIVE_BATCH_SIZE = 500
+
+
+class ArchiveError(Exception):
+    """The term cannot be archived"""
+
+
+def _move_batch(connection, term, record_ids):
+    quote = connection.ops.quote_name
+    tables = {
+        name: quote(model._meta.db_table) for name, model in (
+            ('record', AttendanceRecord), ('entry', AttendanceEntry),
+            ('archived_record', ArchivedAttendanceRecord), ('archived_entry', ArchivedAttendanceEntry),
+        )
+    }
+    ids = ', '.join(['%s'] * len(record_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {tables["archived_record"]} (id, class_obj_id, term_id, date, schedule_time, canceled) '
+            f'SELECT id, class_obj_id, %s, date, schedule_time, canceled FROM {tables["record"]} WHERE id IN ({ids})',
+            [term.id, *record_ids],
+        )
+        cursor.execute(
+            f'INSERT INTO {tables["archived_entry"]} '
+            f'(id, attendance_record_id, student_id, time_scanned, minutes_late, lateness) '
+            f'SELECT id, attendance_record_id, student_id, time_scanned, minutes_late, lateness FROM {tables["entry"]} '
+            f'WHERE attendance_record_id IN ({ids})',
+            record_ids,
+        )
+        cursor.execute(f'DELETE FROM {tables["entry"]} WHERE attendance_record_id IN ({ids})', record_ids)
+        entries = cursor.rowcount
+        cursor.execute(f'DELETE FROM {tables["record"]} WHERE id IN ({ids})', record_ids)
+    return entries
+
+
+def _summarize(term, using):
+    sessions = dict(
+        ArchivedAttendanceRecord.objects.using(using).filter(term=term, canceled=False)
+        .values_list('class_obj_id').annotate(n=Count('id'))
+    )
+    attended = Counter({
+        (class_id, student_id): n
+        for class_id, student_id, n in ArchivedAttendanceEntry.objects.using(using)
+        .filter(attendance_record__term=term, attendance_record__canceled=False)
+        .values_list('attendance_record__class_obj_id', 'student_id').annotate(n=Count('id'))
+    })
+    enrolled = StudentClassEnrollment.objects.using(using).filter(class_obj_id__in=sessions).values_list(
+        'class_obj_id', 'student_id'
+    )
+    summaries = [
+        AttendanceSummary(
+            term=term, class_obj_id=class_id, student_id=student_id,
+            attended=attended[class_id, student_id], sessions=sessions.get(class_id, 0),
+        )
+        for class_id, student_id in set(attended) | set(enrolled)
+    ]
+    touch()
+    with write_atomic(using=using):
+        AttendanceSummary.objects.using(using).filter(term=term).delete()
+        AttendanceSummary.objects.using(using).bulk_create(summaries, batch_size=ARCHIVE_BATCH_SIZE)
+    return len(summaries)
+
+
+def archive_term(term, batch_size=ARCHIVE_BATCH_SIZE, progress=None):
+    """Move the term's sessions to the archive tables and summarize them.
+
+    ``progress(sessions, entries)`` is called after each batch with the
+    totals so far. Returns ``(sessions, entries, summaries)``.
+    """
+    if term.end_date >= timezone.localdate():
+        raise ArchiveError(f'{term} has not ended yet')
+    using = router.db_for_write(AttendanceRecord)
+    connection = connections[using]
+    start, end = term.bounds()
+    pending = AttendanceRecord.objects.using(using).filter(date__gte=start, date__lt=end).order_by('id')
+
+    sessions = entries = 0
+    while True:
+        touch()
+        with write_atomic(using=using):
+            batch = list(pending.values_list('id', 'class_obj_id')[:batch_size])
+            if not batch:
+                break
+            entries += _move_batch(connection, term, [record_id for record_id, _ in batch])
+            cache.bump_many('class', {class_id for _, class_id in batch})
+        sessions += len(batch)
+        if progress is not None:
+            progress(sessions, entries)
+
+    summaries = _summarize(term, using)
+    term.archived_at = timezone.now()
+    term.save(using=using, update_fields=['archived_at'])
+    cache.bump_many('class', term.attendance_summaries.using(using).values_list('class_obj_id', flat=True).distinct())
+    return sessions, entries, summaries
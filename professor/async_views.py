@@ -0,0 +1,123 @@
+"""Async versions of the attendance write endpoints and the calendar feed.
+
+These mirror ``process_qr_scan``, ``verify_qr_code`` and ``calendar_data`` in
+``views.py`` using Django's async ORM, so that under an ASGI server a request
+waiting on the database does not hold a worker thread. The attendance writes
+themselves share the sync views' code (``mark_scanned_student``,
+``mark_verified_student``) through ``sync_to_async``: they need one
+transaction, IMMEDIATE on SQLite (``write_atomic``), which the async ORM
+cannot hold across queries. They are routed in
+place of the sync views when ``settings.ASYNC_VIEWS`` is enabled (see
+``gunicorn.conf.py``); under WSGI the sync views stay in use because async
+views there would pay an extra event-loop hop per request.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+from datetime import datetime
+import json
+
+from .models import Class
+from . import cache
+from .views import mark_scanned_student, mark_verified_student
+from attendance import metrics
+from attendance.routers import replica_reads
+from main.decorators import professor_required, student_required
+
+
+async def aget_active_schedule(class_obj, current_time):
+    """Async counterpart of ``views.get_active_schedule``"""
+    current_day = current_time.strftime('%A')
+    time_only = current_time.time()
+
+    async for schedule in class_obj.schedules.filter(day=current_day):
+        if schedule.start_time <= time_only <= schedule.end_time:
+            return schedule
+    return None
+
+
+async def _aget_class_or_404(**lookup):
+    try:
+        return await Class.objects.aget(**lookup)
+    except Class.DoesNotExist:
+        raise Http404('No Class matches the given query.')
+
+
+@professor_required
+@replica_reads
+async def calendar_data(request):
+    """JSON calendar feed for the professor dashboard"""
+    return JsonResponse(await sync_to_async(cache.professor_calendar)(request.user.id))
+
+
+@metrics.track_scan
+@student_required
+async def verify_qr_code(request):
+    """Verify QR code and mark attendance (for students to call)"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            qr_data = json.loads(data.get('qr_code_data', '{}'))
+
+            class_id = qr_data.get('classId')
+            timestamp_str = qr_data.get('timestamp')
+
+            if not class_id or not timestamp_str:
+                return JsonResponse({'success': False, 'error': 'Invalid QR code data'}, status=400)
+
+            # Verify timestamp (QR code should be valid for current session)
+            qr_timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+            now = timezone.now()
+
+            # Check if QR code is not too old (within 2 hours)
+            if (now - qr_timestamp).total_seconds() > 7200:
+                return JsonResponse({'success': False, 'error': 'QR code has expired'}, status=400)
+
+            # Get class and verify
+            class_obj = await _aget_class_or_404(id=class_id)
+
+            # The lookup, duplicate check and insert run in one write transaction
+            return await sync_to_async(mark_verified_student)(class_obj, timestamp_str, request.user)
+
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+
+
+@metrics.track_scan
+@professor_required
+async def process_qr_scan(request, class_id):
+    """Process a scanned student QR code and mark attendance.
+
+    Same contract as ``views.process_qr_scan``.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = json.loads(request.body or '{}')
+        scanned_name = (data.get('student_name') or '').strip()
+
+        if not scanned_name:
+            return JsonResponse({'success': False, 'error': 'No student name provided'}, status=400)
+
+        # Get the class, making sure it belongs to this professor
+        class_obj = await _aget_class_or_404(id=class_id, professor=request.user)
+
+        # Only allow processing during an active schedule window (Asia/Manila local time)
+        now = timezone.localtime(timezone.now(), timezone.get_default_timezone())
+        active_schedule = await aget_active_schedule(class_obj, now)
+        if not active_schedule:
+            return JsonResponse({
+                'success': False,
+                'error': 'No active class schedule at this time. QR scanning is only allowed during scheduled class hours.'
+            }, status=400)
+
+        schedule_time_str = f"{active_schedule.start_time.strftime('%H:%M')} - {active_schedule.end_time.strftime('%H:%M')}"
+
+        # The session, roster lookup, duplicate check and insert run in one write transaction
+        return await sync_to_async(mark_scanned_student)(class_obj, now, schedule_time_str, scanned_name)
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -0,0 +1,214 @@
+"""Versioned caching of dashboard, roster, timetable and class stats data.
+
+Every cached value is stored under a key that embeds the current *version
+token* of each scope it depends on:
+
+- ``('class', id)``: anything about one class (details, schedules, extra
+  classes, announcements, sessions, attendance, enrollments)
+- ``('roster', id)``: the names of the students enrolled in one class
+- ``('user', id)``: which classes a professor teaches or a student takes,
+  and the user's name
+- ``TERMS``: the terms and their dates
+
+The signal handlers in ``signals.py`` bump the tokens when the underlying rows
+change, which makes every key built from the old token unreachable; nothing
+is ever deleted explicitly. Tokens and values live in the default cache, so
+with the file or database backend (see ``CACHE_BACKEND`` in settings) every
+worker sees the same versions. The local-memory backend is per process and
+only suits a single worker.
+
+Code that changes rows with ``QuerySet.update()`` or ``bulk_create()`` skips
+the signals and must call ``bump()`` / ``bump_many()`` itself.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from attendance.routers import reading_from_replica
+from .calendar import build_calendar, professor_calendar_querysets, student_calendar_querysets
+from .models import Class, AttendanceRecord, AttendanceEntry, StudentClassEnrollment
+
+_MISSING = object()
+
+TERMS = ('terms', 0)
+
+
+def _version_key(scope, obj_id):
+    return f'v:{scope}:{obj_id}'
+
+
+def _new_token():
+    return time.time_ns()
+
+
+def versions(scopes):
+    """Current tokens for ``scopes`` (a list of ``(scope, id)`` pairs), in order"""
+    keys = [_version_key(scope, obj_id) for scope, obj_id in scopes]
+    found = cache.get_many(keys)
+    tokens = []
+    for key in keys:
+        token = found.get(key)
+        if token is None:
+            # Never seen (or evicted): start from a fresh token so keys written
+            # under an older, evicted token can never be served again
+            token = cache.get_or_set(key, _new_token(), None)
+        tokens.append(token)
+    return tokens
+
+
+def bump_many(scope, ids):
+    """Invalidate everything cached for ``scope`` and ``ids`` once the transaction commits"""
+    ids = list(ids)
+    if not ids:
+        return
+
+    def _bump():
+        token = _new_token()
+        cache.set_many({_version_key(scope, obj_id): token for obj_id in ids}, None)
+
+    transaction.on_commit(_bump)
+
+
+def bump(scope, obj_id):
+    bump_many(scope, [obj_id])
+
+
+def cached(name, scopes, compute, timeout=None):
+    """``compute()``, cached under ``name`` and the current tokens of ``scopes``"""
+    tokens = versions(scopes)
+    key = f'data:{name}:' + '.'.join(str(token) for token in tokens)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        if timeout is None:
+            timeout = settings.DATA_CACHE_TIMEOUT
+        if reading_from_replica():
+            # The replica may lag behind the write that produced these tokens
+            timeout = min(timeout, settings.REPLICA_PIN_SECONDS)
+        cache.set(key, value, timeout)
+    return value
+
+
+def professor_class_ids(professor_id):
+    return cached(
+        f'professor-classes:{professor_id}', [('user', professor_id)],
+        lambda: list(Class.objects.filter(professor_id=professor_id).values_list('id', flat=True)),
+    )
+
+
+def student_class_ids(student_id):
+    return cached(
+        f'student-classes:{student_id}', [('user', student_id)],
+        lambda: list(
+            StudentClassEnrollment.objects.filter(student_id=student_id).values_list('class_obj_id', flat=True)
+        ),
+    )
+
+
+def class_scopes(user_id, class_ids):
+    return [('user', user_id)] + [('class', class_id) for class_id in class_ids]
+
+
+def student_tag(student_id):
+    """A string that changes whenever the student's classes, or anything in them, change"""
+    tokens = versions(class_scopes(student_id, student_class_ids(student_id)))
+    return '.'.join(str(token) for token in tokens)
+
+
+def professor_dashboard_classes(professor_id):
+    """The professor's classes with their schedules and counts, for the dashboard cards"""
+    def compute():
+        return list(
+            Class.objects.filter(professor_id=professor_id)
+            .prefetch_related('schedules')
+            .annotate(
+                schedule_count=Count('schedules', distinct=True),
+                announcement_count=Count('announcements', distinct=True),
+                attendance_count=Count('attendance_records', distinct=True),
+                student_count=Count('enrolled_students', distinct=True),
+            )
+        )
+    return cached(
+        f'professor-dashboard:{professor_id}',
+        class_scopes(professor_id, professor_class_ids(professor_id)),
+        compute,
+    )
+
+
+def student_dashboard_classes(student_id):
+    """The student's classes with schedules, recent announcements and attendance count"""
+    def compute():
+        enrollments = StudentClassEnrollment.objects.filter(student_id=student_id).select_related('class_obj')
+        attended = dict(
+            AttendanceRecord.objects.filter(entries__student_id=student_id)
+            .values_list('class_obj_id')
+            .annotate(n=Count('id', distinct=True))
+        )
+        classes = []
+        for enrollment in enrollments:
+            class_obj = enrollment.class_obj
+            classes.append({
+                'class_obj': class_obj,
+                'schedules': list(class_obj.schedules.all()),
+                'announcements': list(class_obj.announcements.all()[:3]),
+                'attendance_count': attended.get(class_obj.id, 0),
+            })
+        return classes
+    return cached(
+        f'student-dashboard:{student_id}',
+        class_scopes(student_id, student_class_ids(student_id)),
+        compute,
+    )
+
+
+def professor_calendar(professor_id):
+    return cached(
+        f'professor-calendar:{professor_id}',
+        class_scopes(professor_id, professor_class_ids(professor_id)),
+        lambda: build_calendar(*professor_calendar_querysets(professor_id)),
+    )
+
+
+def student_calendar(student_id):
+    class_ids = student_class_ids(student_id)
+    return cached(
+        f'student-calendar:{student_id}',
+        class_scopes(student_id, class_ids),
+        lambda: build_calendar(*student_calendar_querysets(class_ids)),
+    )
+
+
+def class_roster(class_id):
+    """``{lowercased display name: (student id, display name)}`` for the scan endpoint"""
+    def compute():
+        roster = {}
+        enrollments = StudentClassEnrollment.objects.filter(class_obj_id=class_id).select_related('student')
+        for enrollment in enrollments:
+            student = enrollment.student
+            display_name = student.get_full_name() or student.username
+            # The first enrollment wins, as in the original linear scan
+            roster.setdefault(display_name.strip().lower(), (student.id, display_name))
+        return roster
+    return cached(f'roster:{class_id}', [('roster', class_id)], compute)
+
+
+def class_stats(class_obj):
+    """Enrolled students, sessions held and average attendance rate of a class"""
+    def compute():
+        total_students = class_obj.get_total_students()
+        total_sessions = class_obj.get_total_sessions()
+        attendance_rate = 0
+        if total_students > 0 and total_sessions > 0:
+            total_possible = total_students * total_sessions
+            # AttendanceEntry records mean the student was present (scanned QR)
+            total_present = AttendanceEntry.objects.filter(attendance_record__class_obj=class_obj).count()
+            attendance_rate = round((total_present / total_possible) * 100)
+        return {
+            'total_students': total_students,
+            'total_sessions': total_sessions,
+            'attendance_rate': attendance_rate,
+        }
+    return cached(f'class-stats:{class_obj.id}', [('class', class_obj.id)], compute)
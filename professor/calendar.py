@@ -0,0 +1,87 @@
+"""Builders for the calendar data shown on the professor and student dashboards.
+
+The dashboards embed three dictionaries as JSON (weekly schedules by day,
+extra classes by date and canceled sessions by date). The same data is served
+by the calendar JSON endpoints, so the shaping lives here and takes plain
+iterables; callers are responsible for fetching the rows with
+``select_related('class_obj')``.
+"""
+from .models import Schedule, ExtraClass, AttendanceRecord
+
+
+def professor_calendar_querysets(user):
+    """Querysets feeding the calendar of every class taught by ``user``"""
+    taught = {'class_obj__professor': user, 'class_obj__deleted_at__isnull': True}
+    return (
+        Schedule.objects.filter(**taught).select_related('class_obj'),
+        ExtraClass.objects.filter(**taught).select_related('class_obj'),
+        AttendanceRecord.objects.filter(
+            **taught,
+            canceled=True
+        ).select_related('class_obj'),
+    )
+
+
+def student_calendar_querysets(class_ids):
+    """Querysets feeding the calendar of the given enrolled classes"""
+    return (
+        Schedule.objects.filter(class_obj__id__in=class_ids).select_related('class_obj'),
+        ExtraClass.objects.filter(class_obj__id__in=class_ids).select_related('class_obj'),
+        AttendanceRecord.objects.filter(
+            class_obj__id__in=class_ids,
+            canceled=True
+        ).select_related('class_obj'),
+    )
+
+
+def build_schedules_by_day(schedules):
+    """Build a dictionary of day -> list of weekly schedules"""
+    schedules_by_day = {}
+    for schedule in schedules:
+        schedules_by_day.setdefault(schedule.day, []).append({
+            'id': schedule.id,
+            'class_id': schedule.class_obj.id,
+            'class_name': schedule.class_obj.subject,
+            'start_time': schedule.start_time.strftime('%H:%M'),
+            'end_time': schedule.end_time.strftime('%H:%M'),
+        })
+    return schedules_by_day
+
+
+def build_extra_classes_by_date(extra_classes):
+    """Build a dictionary of date -> list of extra classes"""
+    extra_classes_by_date = {}
+    for extra in extra_classes:
+        date_str = extra.date.strftime('%Y-%m-%d')
+        extra_classes_by_date.setdefault(date_str, []).append({
+            'id': extra.id,
+            'class_id': extra.class_obj.id,
+            'class_name': extra.class_obj.subject,
+            'start_time': extra.start_time.strftime('%H:%M'),
+            'end_time': extra.end_time.strftime('%H:%M'),
+            'reason': extra.reason or '',
+        })
+    return extra_classes_by_date
+
+
+def build_canceled_classes(canceled_records):
+    """Build a dictionary of date -> list of canceled schedule times"""
+    canceled_classes = {}
+    for record in canceled_records:
+        # Use date() to ensure we get just the date part, avoiding timezone issues
+        date_str = record.date.date().strftime('%Y-%m-%d')
+        canceled_classes.setdefault(date_str, []).append({
+            'class_id': record.class_obj.id,
+            'class_name': record.class_obj.subject,
+            'schedule_time': record.schedule_time,
+        })
+    return canceled_classes
+
+
+def build_calendar(schedules, extra_classes, canceled_records):
+    """Return the three calendar dictionaries keyed the way the templates expect"""
+    return {
+        'schedules_by_day': build_schedules_by_day(schedules),
+        'extra_classes_by_date': build_extra_classes_by_date(extra_classes),
+        'canceled_classes': build_canceled_classes(canceled_records),
+    }
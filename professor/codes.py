@@ -0,0 +1,90 @@
+"""Class code allocation without existence queries.
+
+Codes are 6 characters over ``A-Z0-9`` (36^6, about 2.2 billion codes).
+Instead of drawing random codes and asking the database whether each one is
+taken, every process walks a counter through a keyed permutation of that
+space: distinct counter values always give distinct codes, and the codes
+look random to anyone without ``SECRET_KEY``.
+
+The permutation is a 4-round Feistel network over 32 bits, keyed from
+``SECRET_KEY``, with cycle walking to stay below 36^6. Each process starts
+its counter at a random point, so two processes (or codes allocated before
+this module existed) can still meet. The unique constraint on
+``Class.class_code`` settles that: ``Class.save()`` retries with a new code
+on ``IntegrityError`` and ``reseed()`` moves the counter to a new start.
+"""
+import hashlib
+import itertools
+import os
+import secrets
+import string
+import threading
+
+from django.conf import settings
+
+CHARACTERS = string.ascii_uppercase + string.digits
+LENGTH = 6
+SPACE = len(CHARACTERS) ** LENGTH
+
+_ROUNDS = 4
+_HALF_BITS = 16
+_HALF_MASK = (1 << _HALF_BITS) - 1
+
+_lock = threading.Lock()
+_counter = None
+_round_keys = None
+
+
+def _keys():
+    global _round_keys
+    if _round_keys is None:
+        secret = settings.SECRET_KEY.encode()
+        _round_keys = [
+            hashlib.blake2b(secret, digest_size=16, person=b'class-code', salt=bytes([i]) * 16).digest()
+            for i in range(_ROUNDS)
+        ]
+    return _round_keys
+
+
+def _feistel(value):
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for key in _keys():
+        digest = hashlib.blake2b(right.to_bytes(2, 'big'), key=key, digest_size=2).digest()
+        left, right = right, left ^ int.from_bytes(digest, 'big')
+    return (left << _HALF_BITS) | right
+
+
+def permute(n):
+    """Map ``n`` in ``range(SPACE)`` to a distinct value in the same range"""
+    value = _feistel(n)
+    # SPACE is a little over half of 2**32, so this takes two steps on average
+    while value >= SPACE:
+        value = _feistel(value)
+    return value
+
+
+def encode(value):
+    chars = []
+    for _ in range(LENGTH):
+        value, digit = divmod(value, len(CHARACTERS))
+        chars.append(CHARACTERS[digit])
+    return ''.join(reversed(chars))
+
+
+def reseed():
+    """Restart this process's counter at a new random point"""
+    global _counter
+    with _lock:
+        _counter = itertools.count(secrets.randbelow(SPACE))
+
+
+def allocate(count=1):
+    """``count`` class codes, distinct from each other and from this process's earlier codes"""
+    if _counter is None:
+        reseed()
+    with _lock:
+        return [encode(permute(next(_counter) % SPACE)) for _ in range(count)]
+
+
+# Forked workers (e.g. gunicorn with preload_app) must not share a counter
+os.register_at_fork(after_in_child=reseed)
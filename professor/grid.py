@@ -0,0 +1,143 @@
+"""The attendance grid: a class's students by its sessions, edited in bulk.
+
+Professors fix missed scans on ``attendance_grid``. The page loads the grid
+a page of students at a time from ``attendance_grid_data`` (``page()``): one
+query for the sessions, one for the students and one prefetch for their
+marks in those sessions, however large the class. Only the current term's
+sessions (the hot tables) are editable; canceled sessions are left out.
+
+Edits are sent back as a diff, ``{"add": [[student, session], ...],
+"remove": [...]}``, and ``apply()`` writes it in one transaction: one
+``bulk_create(ignore_conflicts=True)`` for the added marks, so marks that
+already exist are skipped by the unique constraint, and one raw ``DELETE``
+for the removed ones (``QuerySet.delete()`` would load every mark and send
+its ``post_delete``, which looks up its session's class, one query per
+mark). Neither sends signals, so the class's caches are bumped here. Marks
+added by hand get no lateness (see ``lateness.py``):
+when the student arrived is unknown.
+"""
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.db.models import Prefetch, prefetch_related_objects
+
+from attendance.sqlite import write_atomic
+from . import cache
+from .models import AttendanceEntry, StudentClassEnrollment
+
+# Students per page of the grid
+PAGE_SIZE = 50
+# Marks one save may add and remove in total
+MAX_CHANGES = 5000
+
+
+class InvalidChanges(ValueError):
+    """The submitted diff is malformed or names students or sessions outside the class"""
+
+
+def _sessions(class_obj):
+    return class_obj.attendance_records.filter(canceled=False).order_by('date')
+
+
+def page(class_obj, number):
+    """One page of the grid, as the JSON ``attendance_grid_data`` returns"""
+    sessions = list(_sessions(class_obj).values('id', 'date', 'schedule_time'))
+    enrollments = (
+        class_obj.enrolled_students.select_related('student')
+        .order_by('student__last_name', 'student__first_name', 'student__username')
+    )
+    paginator = Paginator(enrollments, PAGE_SIZE)
+    current = paginator.get_page(number)
+    enrollments = list(current)
+    marks = AttendanceEntry.objects.filter(attendance_record__in=_sessions(class_obj))
+    prefetch_related_objects(enrollments, Prefetch(
+        'student__attendance_entries', queryset=marks.only('student_id', 'attendance_record_id'), to_attr='grid_marks'
+    ))
+    return {
+        'sessions': [
+            {'id': session['id'], 'date': session['date'].isoformat(), 'time': session['schedule_time']}
+            for session in sessions
+        ],
+        'students': [
+            {
+                'id': enrollment.student_id,
+                'name': enrollment.student.get_full_name() or enrollment.student.username,
+                'username': enrollment.student.username,
+                'marks': [mark.attendance_record_id for mark in enrollment.student.grid_marks],
+            }
+            for enrollment in enrollments
+        ],
+        'page': current.number,
+        'pages': paginator.num_pages,
+        'count': paginator.count,
+    }
+
+
+def _pairs(changes, key):
+    pairs = changes.get(key, [])
+    if not isinstance(pairs, list):
+        raise InvalidChanges(f'"{key}" must be a list')
+    try:
+        return {(int(student_id), int(session_id)) for student_id, session_id in pairs}
+    except (TypeError, ValueError):
+        raise InvalidChanges(f'"{key}" must hold [student id, session id] pairs')
+
+
+def apply(class_obj, changes):
+    """Add and remove the marks in ``changes``; returns ``(marked, removed)``.
+
+    ``marked`` counts the marks asked for, including any that already existed.
+    """
+    if not isinstance(changes, dict):
+        raise InvalidChanges('Expected an object with "add" and "remove"')
+    add, remove = _pairs(changes, 'add'), _pairs(changes, 'remove')
+    if len(add) + len(remove) > MAX_CHANGES:
+        raise InvalidChanges(f'At most {MAX_CHANGES} changes can be saved at once')
+    if add & remove:
+        raise InvalidChanges('A mark cannot be both added and removed')
+    pairs = add | remove
+    if not pairs:
+        return 0, 0
+
+    student_ids = {student_id for student_id, _ in pairs}
+    session_ids = {session_id for _, session_id in pairs}
+    enrolled = set(StudentClassEnrollment.objects.filter(
+        class_obj=class_obj, student_id__in=student_ids
+    ).values_list('student_id', flat=True))
+    sessions = set(_sessions(class_obj).filter(id__in=session_ids).values_list('id', flat=True))
+    if student_ids - enrolled:
+        raise InvalidChanges('Some students are not enrolled in this class')
+    if session_ids - sessions:
+        raise InvalidChanges('Some sessions are not current sessions of this class')
+
+    using = router.db_for_write(AttendanceEntry)
+    removed = 0
+    with write_atomic(using=using):
+        AttendanceEntry.objects.using(using).bulk_create(
+            [AttendanceEntry(attendance_record_id=session_id, student_id=student_id) for student_id, session_id in add],
+            ignore_conflicts=True,
+        )
+        if remove:
+            removed = _delete_marks(remove, using)
+        cache.bump('class', class_obj.id)
+    return len(add), removed
+
+
+def _delete_marks(pairs, using):
+    """Delete the marks of the ``(student, session)`` pairs in one statement; returns how many"""
+    # Grouped by session, one condition each
+    students_by_session = {}
+    for student_id, session_id in pairs:
+        students_by_session.setdefault(session_id, []).append(student_id)
+    quote = connections[using].ops.quote_name
+    session_column = quote(AttendanceEntry._meta.get_field('attendance_record').column)
+    student_column = quote(AttendanceEntry._meta.get_field('student').column)
+    conditions, params = [], []
+    for session_id, student_ids in students_by_session.items():
+        conditions.append(f"({session_column} = %s AND {student_column} IN ({', '.join(['%s'] * len(student_ids))}))")
+        params += [session_id, *student_ids]
+    # Nothing references entries, so there is nothing to cascade
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(AttendanceEntry._meta.db_table)} WHERE {" OR ".join(conditions)}', params
+        )
+        return cursor.rowcount
@@ -0,0 +1,242 @@
+"""iCalendar (RFC 5545) subscription feeds of a user's classes.
+
+Each professor and student has a feed URL with a signed token in it, which
+calendar apps poll without a session. Weekly schedules become recurring
+events (``RRULE:FREQ=WEEKLY``) starting the week the class was created and
+ending with the class's term: the term the class was created in, or the next
+one when it was created between terms (no end when there is no such term).
+Canceled sessions, archived ones included, are ``EXDATE``s; extra classes
+are single events. Times carry the site's ``TIME_ZONE`` as ``TZID``, which a
+``VTIMEZONE`` defines as a fixed UTC offset: the site's zone (Asia/Manila)
+has no daylight saving time.
+
+The token is signed with a salt made of the role and the user's password
+hash, so it only opens that role's feed and changing the password changes
+the URL. The user is loaded through ``CachedModelBackend``.
+
+Calendar apps poll often. The ETag is built from the cache version tokens of
+the user (whose name titles the feed), their classes and the terms (see
+``cache.py``), so a poll with nothing new is answered with 304 without a
+query, and the serialized feed is cached under the same versions, so a
+changed class is rebuilt once and not per poll.
+"""
+import hashlib
+from itertools import chain
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core import signing
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+
+from attendance.auth import CachedModelBackend
+from main.roles import PROFESSOR
+from . import cache
+from .calendar import professor_calendar_querysets, student_calendar_querysets
+from .models import Schedule, ArchivedAttendanceRecord, Term
+
+DAYS = [day for day, _ in Schedule.DAY_CHOICES]
+RRULE_DAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+# Event UIDs are "<kind>-<id>@" this
+UID_DOMAIN = 'class-attendance'
+# Calendar apps that honour it poll no more often than this
+REFRESH_INTERVAL = 'PT1H'
+
+
+def _signer(role, user):
+    return signing.Signer(salt=f'professor.ical:{role}:{user.password}')
+
+
+def feed_token(user, role):
+    return _signer(role, user).sign(str(user.pk))
+
+
+def feed_url(request, user, role):
+    """Absolute ``webcal://`` URL of the user's feed for ``role``"""
+    url = request.build_absolute_uri(reverse(f'{role}:calendar_feed', args=[feed_token(user, role)]))
+    return 'webcal://' + url.split('://', 1)[1]
+
+
+def user_for_token(token, role):
+    """The active user a feed token was issued to, or ``None``"""
+    user_id = token.partition(':')[0]
+    if not user_id.isdigit():
+        return None
+    user = CachedModelBackend().get_user(int(user_id))
+    if user is None:
+        return None
+    try:
+        _signer(role, user).unsign(token)
+    except signing.BadSignature:
+        return None
+    return user
+
+
+def _escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into chunks of at most 75 octets (RFC 5545 3.1)"""
+    data = line.encode()
+    chunks = []
+    while len(data) > 75:
+        cut = 75 if not chunks else 74
+        # Never split a UTF-8 sequence
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        chunks.append(data[:cut].decode())
+        data = data[cut:]
+    chunks.append(data.decode())
+    return '\r\n '.join(chunks)
+
+
+def _local(day, time):
+    return datetime.combine(day, time).strftime('%Y%m%dT%H%M%S')
+
+
+def _event(uid, stamp, class_obj, day, start, end, extra=(), description=''):
+    tzid = settings.TIME_ZONE
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART;TZID={tzid}:{_local(day, start)}',
+        f'DTEND;TZID={tzid}:{_local(day, end)}',
+        f'SUMMARY:{_escape(str(class_obj))}',
+        *extra,
+    ]
+    if class_obj.room:
+        lines.append(f'LOCATION:{_escape(class_obj.room)}')
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    lines.append('END:VEVENT')
+    return lines
+
+
+def _utc(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _offset(delta):
+    minutes = int(delta.total_seconds()) // 60
+    return f"{'-' if minutes < 0 else '+'}{abs(minutes) // 60:02}{abs(minutes) % 60:02}"
+
+
+def _vtimezone(tzid):
+    """The ``VTIMEZONE`` of ``tzid`` at its current offset, which it is assumed never to change"""
+    now = timezone.now().astimezone(ZoneInfo(tzid))
+    offset = _offset(now.utcoffset())
+    return [
+        'BEGIN:VTIMEZONE',
+        f'TZID:{tzid}',
+        'BEGIN:STANDARD',
+        'DTSTART:19700101T000000',
+        f'TZOFFSETFROM:{offset}',
+        f'TZOFFSETTO:{offset}',
+        f'TZNAME:{now.tzname()}',
+        'END:STANDARD',
+        'END:VTIMEZONE',
+    ]
+
+
+def _class_term(terms, created):
+    """The term a class created on ``created`` belongs to, or ``None``; ``terms`` are by start date"""
+    return next((term for term in terms if term.end_date >= created), None)
+
+
+def build_feed(name, schedules, extra_classes, canceled_records, terms=()):
+    """The feed as text, from the querysets of ``calendar.py`` and the terms by start date"""
+    stamp = _utc(timezone.now())
+
+    # (class id, date, "HH:MM - HH:MM") of every canceled session
+    canceled = {
+        (record.class_obj_id, timezone.localtime(record.date).date(), record.schedule_time)
+        for record in canceled_records
+    }
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Class Attendance Monitoring//Timetable//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+        f'X-WR-TIMEZONE:{settings.TIME_ZONE}',
+        f'REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}',
+        f'X-PUBLISHED-TTL:{REFRESH_INTERVAL}',
+        *_vtimezone(settings.TIME_ZONE),
+    ]
+    for schedule in schedules:
+        weekday = DAYS.index(schedule.day)
+        created = timezone.localtime(schedule.class_obj.created_at).date()
+        first = created + timedelta(days=(weekday - created.weekday()) % 7)
+        term = _class_term(terms, created)
+        if term is not None and first > term.end_date:
+            # The term ends before the first of these sessions
+            continue
+        schedule_time = f"{schedule.start_time.strftime('%H:%M')} - {schedule.end_time.strftime('%H:%M')}"
+        exdates = sorted(
+            day for class_id, day, time_range in canceled
+            if class_id == schedule.class_obj_id and time_range == schedule_time
+            and day.weekday() == weekday and day >= first
+        )
+        rrule = f'RRULE:FREQ=WEEKLY;BYDAY={RRULE_DAYS[weekday]}'
+        if term is not None:
+            # UNTIL is in UTC when DTSTART has a TZID (RFC 5545 3.3.10)
+            rrule += f';UNTIL={_utc(term.bounds()[1] - timedelta(seconds=1))}'
+        extra = [rrule]
+        if exdates:
+            exdate_values = ','.join(_local(day, schedule.start_time) for day in exdates)
+            extra.append(f'EXDATE;TZID={settings.TIME_ZONE}:{exdate_values}')
+        lines += _event(
+            f'schedule-{schedule.id}@{UID_DOMAIN}', stamp, schedule.class_obj, first,
+            schedule.start_time, schedule.end_time, extra,
+        )
+    for extra_class in extra_classes:
+        lines += _event(
+            f'extra-class-{extra_class.id}@{UID_DOMAIN}', stamp, extra_class.class_obj, extra_class.date,
+            extra_class.start_time, extra_class.end_time, description=extra_class.reason or 'Extra class',
+        )
+    lines.append('END:VCALENDAR')
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+
+def feed_response(request, token, role):
+    """The feed of the user ``token`` was issued to, or 304 when the client has it"""
+    user = user_for_token(token, role)
+    if user is None:
+        raise Http404('Unknown calendar feed')
+    if role == PROFESSOR:
+        class_ids = cache.professor_class_ids(user.id)
+    else:
+        class_ids = cache.student_class_ids(user.id)
+    scopes = cache.class_scopes(user.id, class_ids) + [cache.TERMS]
+    version = '.'.join(str(value) for value in cache.versions(scopes))
+    etag = quote_etag(hashlib.blake2b(f'{role}:{version}'.encode(), digest_size=16).hexdigest())
+
+    def compute():
+        if role == PROFESSOR:
+            schedules, extra_classes, canceled = professor_calendar_querysets(user.id)
+        else:
+            schedules, extra_classes, canceled = student_calendar_querysets(class_ids)
+        archived = ArchivedAttendanceRecord.objects.filter(class_obj_id__in=class_ids, canceled=True)
+        return build_feed(
+            f'{user.get_full_name() or user.username} - Classes', schedules, extra_classes,
+            chain(canceled, archived.only('class_obj_id', 'date', 'schedule_time')),
+            Term.objects.order_by('start_date').only('start_date', 'end_date'),
+        )
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        body = cache.cached(f'ical:{role}:{user.id}', scopes, compute)
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
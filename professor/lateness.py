@@ -0,0 +1,65 @@
+"""How late each attendance scan was.
+
+``AttendanceEntry.save`` stores, when the entry is created, the minutes
+between the session's scheduled start and the scan (0 when on time or
+early) and a bucket: on time up to ``settings.LATE_AFTER_MINUTES``, late up
+to ``settings.VERY_LATE_AFTER_MINUTES``, very late after that. The start is
+the first half of the session's ``schedule_time`` ("09:00 - 10:30") on the
+session's local date; entries of sessions without a parsable start get
+neither.
+
+Buckets are stored so the tabs can count them on an index instead of parsing
+``schedule_time`` per row. After changing the thresholds, ``manage.py
+relabel_lateness`` re-buckets the stored entries from their minutes.
+"""
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+ON_TIME = 'on_time'
+LATE = 'late'
+VERY_LATE = 'very_late'
+CHOICES = [(ON_TIME, 'On time'), (LATE, 'Late'), (VERY_LATE, 'Very late')]
+
+# Largest value of a PositiveSmallIntegerField on every backend
+MAX_MINUTES = 32767
+
+
+def session_start(date, schedule_time):
+    """Scheduled start of the session held on ``date`` at ``schedule_time``, or ``None``"""
+    try:
+        start = datetime.time.fromisoformat(schedule_time.split('-', 1)[0].strip())
+    except ValueError:
+        return None
+    return timezone.make_aware(datetime.datetime.combine(timezone.localtime(date).date(), start))
+
+
+def bucket(minutes):
+    if minutes is None:
+        return ''
+    if minutes > settings.VERY_LATE_AFTER_MINUTES:
+        return VERY_LATE
+    if minutes > settings.LATE_AFTER_MINUTES:
+        return LATE
+    return ON_TIME
+
+
+def compute(scanned_at, date, schedule_time):
+    """``(minutes late, bucket)`` of a scan at ``scanned_at`` in the session held on ``date`` at ``schedule_time``"""
+    starts_at = session_start(date, schedule_time)
+    if starts_at is None:
+        return None, ''
+    minutes = min(MAX_MINUTES, max(0, int((scanned_at - starts_at).total_seconds() // 60)))
+    return minutes, bucket(minutes)
+
+
+def relabel(entries):
+    """Re-bucket ``entries`` (a queryset) by the current thresholds; returns the number of rows changed"""
+    late_after, very_late_after = settings.LATE_AFTER_MINUTES, settings.VERY_LATE_AFTER_MINUTES
+    return (
+        entries.filter(minutes_late__lte=late_after).exclude(lateness=ON_TIME).update(lateness=ON_TIME)
+        + entries.filter(minutes_late__gt=late_after, minutes_late__lte=very_late_after)
+        .exclude(lateness=LATE).update(lateness=LATE)
+        + entries.filter(minutes_late__gt=very_late_after).exclude(lateness=VERY_LATE).update(lateness=VERY_LATE)
+    )
@@ -0,0 +1,37 @@
+"""Move an ended term's sessions and attendance to the archive tables.
+
+    python manage.py archive_term "1st Semester 2025-2026"
+
+Terms are created in the admin. See ``professor/archive.py``; the command can
+be run again to finish an interrupted archive.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from professor import archive
+from professor.models import Term
+
+
+class Command(BaseCommand):
+    help = "Archive an ended term's attendance sessions and entries, leaving per-student summaries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('term', help='Term name')
+        parser.add_argument('--batch-size', type=int, default=archive.ARCHIVE_BATCH_SIZE,
+                            help='Sessions moved per transaction (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        try:
+            term = Term.objects.get(name=options['term'])
+        except Term.DoesNotExist:
+            raise CommandError(f'No term named "{options["term"]}"')
+
+        def progress(sessions, entries):
+            self.stdout.write(f'  {sessions} sessions, {entries} entries moved')
+
+        try:
+            sessions, entries, summaries = archive.archive_term(term, options['batch_size'], progress)
+        except archive.ArchiveError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'{term}: archived {sessions} sessions and {entries} entries, {summaries} student summaries'
+        ))
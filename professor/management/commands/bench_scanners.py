@@ -0,0 +1,160 @@
+"""Load test ``process_qr_scan`` with many concurrent scanners.
+
+Run the server in the mode under test (``gunicorn --config gunicorn.conf.py``
+with ``ASYNC_VIEWS`` unset for sync workers, ``ASYNC_VIEWS=true`` for ASGI),
+then point this command at it from a machine sharing the same database:
+
+    python manage.py bench_scanners --class-id 12 --concurrency 200 --output sync.json
+    python manage.py bench_scanners --class-id 12 --concurrency 200 --output asgi.json --compare sync.json
+
+The class must have a schedule covering the current time; its attendance
+session is opened before the run starts. Each scanner posts
+the names of enrolled students in turn, so after the first pass most scans
+take the "already marked" path, as they do in a real scan burst.
+"""
+import http.client
+import json
+import secrets
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from professor.models import Class, AttendanceRecord, StudentClassEnrollment
+from professor.views import get_active_schedule
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Measure requests/sec and latency percentiles of the QR scan endpoint under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running server')
+        parser.add_argument('--class-id', type=int, required=True, help='Class whose scan endpoint is hammered')
+        parser.add_argument('--concurrency', type=int, default=200, help='Number of concurrent scanners')
+        parser.add_argument('--requests', type=int, default=20, help='Scans sent by each scanner')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Previous results JSON to compare against')
+
+    def handle(self, *args, **options):
+        try:
+            class_obj = Class.objects.select_related('professor').get(id=options['class_id'])
+        except Class.DoesNotExist:
+            raise CommandError(f"Class {options['class_id']} does not exist")
+
+        names = [
+            (e.student.get_full_name() or e.student.username)
+            for e in StudentClassEnrollment.objects.filter(class_obj=class_obj).select_related('student')
+        ]
+        if not names:
+            raise CommandError('The class has no enrolled students to scan')
+
+        # Open the session up front, as the professor's scanner page does
+        now = timezone.localtime(timezone.now(), timezone.get_default_timezone())
+        active_schedule = get_active_schedule(class_obj, now)
+        if not active_schedule:
+            raise CommandError('The class has no schedule covering the current time')
+        AttendanceRecord.objects.get_or_create(
+            class_obj=class_obj,
+            date__date=now.date(),
+            schedule_time=f"{active_schedule.start_time.strftime('%H:%M')} - {active_schedule.end_time.strftime('%H:%M')}",
+            defaults={'date': now},
+        )
+
+        session_key = self._login(class_obj.professor)
+        csrf_token = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
+        url = urlsplit(options['url'])
+        path = reverse('professor:process_qr_scan', args=[class_obj.id])
+        headers = {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrf_token,
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={session_key}; {settings.CSRF_COOKIE_NAME}={csrf_token}',
+        }
+
+        latencies = []
+        statuses = {}
+        lock = threading.Lock()
+
+        def scanner(worker_index):
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+            local_latencies = []
+            local_statuses = {}
+            for i in range(options['requests']):
+                name = names[(worker_index + i) % len(names)]
+                body = json.dumps({'student_name': name})
+                started = time.perf_counter()
+                try:
+                    conn.request('POST', path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+                    status = 'error'
+                local_latencies.append(time.perf_counter() - started)
+                local_statuses[status] = local_statuses.get(status, 0) + 1
+            conn.close()
+            with lock:
+                latencies.extend(local_latencies)
+                for status, count in local_statuses.items():
+                    statuses[status] = statuses.get(status, 0) + count
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(scanner, range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        results = {
+            'concurrency': options['concurrency'],
+            'requests': len(latencies),
+            'elapsed_seconds': round(elapsed, 3),
+            'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 2),
+                'p95': round(percentile(latencies, 95) * 1000, 2),
+                'p99': round(percentile(latencies, 99) * 1000, 2),
+                'max': round(latencies[-1] * 1000, 2),
+            },
+            'statuses': {str(k): v for k, v in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        }
+
+        self.stdout.write(json.dumps(results, indent=2))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            rps_change = results['requests_per_second'] / baseline['requests_per_second'] if baseline['requests_per_second'] else 0
+            self.stdout.write(
+                f"requests/sec: {baseline['requests_per_second']} -> {results['requests_per_second']} ({rps_change:.2f}x)\n"
+                f"p99 latency ms: {baseline['latency_ms']['p99']} -> {results['latency_ms']['p99']}"
+            )
+
+    def _login(self, user):
+        """Create a logged-in session for ``user`` the way ``Client.force_login`` does"""
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
@@ -0,0 +1,278 @@
+"""Benchmark the main views in-process against the current database.
+
+Intended to run against a dataset from ``generate_dataset``::
+
+    python manage.py generate_dataset --professors 50 --students 3000 --students-per-class 50
+    python manage.py benchmark --update-baseline     # record benchmarks/baseline.json
+    python manage.py benchmark --output run.json     # later: compare, exit 1 on regression
+
+Every scenario is measured with the test client for ``--iterations`` runs
+after ``--warmup`` unmeasured ones. For each it reports latency
+percentiles, the number of SQL queries and the time spent in the database.
+All writes (scans, cancellations, new schedules) happen inside a
+transaction that is rolled back at the end, so the dataset is unchanged.
+
+A run fails if any scenario issues more queries than the baseline, or if its
+p95 latency is more than ``--latency-threshold`` (plus ``--latency-slack-ms``)
+above the baseline.
+"""
+import json
+import logging
+import time
+from pathlib import Path
+from datetime import time as dt_time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.querylog import QueryLog
+from professor.models import Class, Schedule, AttendanceRecord, StudentClassEnrollment
+from .bench_scanners import percentile
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+CLASS_DETAIL_TABS = ['overview', 'schedule', 'announcements', 'attendance', 'students']
+
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure latency, query counts and DB time of the main views and compare against a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--professor', help='Username of the professor to benchmark as (default: the one with the most students)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmarks' / 'baseline.json'))
+        parser.add_argument('--update-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument('--latency-threshold', type=float, default=0.25, help='Allowed p95 slowdown, as a fraction')
+        parser.add_argument('--latency-slack-ms', type=float, default=2.0, help='Absolute p95 slack so millisecond views do not flap')
+        parser.add_argument('--only', nargs='*', help='Run only the scenarios with these names')
+
+    def handle(self, *args, **options):
+        self.options = options
+        professor, class_obj, other_class = self.pick_subjects(options['professor'])
+
+        # Rejected scans and duplicate marks are expected; keep their 4xx warnings out of the report
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        results = {}
+        try:
+            with transaction.atomic():
+                # Hosts are checked by the test client; keep the benchmark independent of ALLOWED_HOSTS.
+                # A private cache keeps values computed from rolled-back rows out of the real one.
+                with override_settings(ALLOWED_HOSTS=['*'], CACHES=BENCHMARK_CACHES):
+                    results = self.run_scenarios(professor, class_obj, other_class)
+                raise Rollback
+        except Rollback:
+            pass
+
+        report = {
+            'dataset': {
+                'professor': professor.username,
+                'class_id': class_obj.id,
+                'students_in_class': class_obj.enrolled_students.count(),
+                'sessions_in_class': class_obj.attendance_records.count(),
+            },
+            'scenarios': results,
+        }
+        self.print_table(results)
+        if options['output']:
+            self.write_json(options['output'], report)
+
+        if options['update_baseline']:
+            self.write_json(options['baseline'], report)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+
+        try:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --update-baseline to create one.")
+            return
+
+        regressions = self.compare(baseline['scenarios'], results)
+        if regressions:
+            raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def pick_subjects(self, username):
+        professors = User.objects.filter(groups__name='professor')
+        if username:
+            professors = professors.filter(username=username)
+        professor = professors.annotate(n=Count('classes')).filter(n__gte=2).order_by('-n', 'id').first()
+        if professor is None:
+            raise CommandError('Need a professor with at least two classes; run generate_dataset first.')
+        classes = list(
+            Class.objects.filter(professor=professor).annotate(
+                n=Count('enrolled_students')
+            ).filter(n__gt=0).order_by('-n', 'id')[:2]
+        )
+        if len(classes) < 2:
+            raise CommandError(f'{professor.username} needs two classes with enrolled students.')
+        return professor, classes[0], classes[1]
+
+    def write_json(self, path, data):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    def measure(self, name, request):
+        """Call ``request(i)`` for each iteration and summarise timing and queries"""
+        if self.options['only'] and name not in self.options['only']:
+            return None
+        for i in range(self.options['warmup']):
+            request(-1 - i)
+
+        latencies, query_counts, db_times = [], [], []
+        for i in range(self.options['iterations']):
+            with QueryLog() as log:
+                started = time.perf_counter()
+                response = request(i)
+                latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                raise CommandError(f'{name} returned {response.status_code}')
+            query_counts.append(log.count)
+            db_times.append(log.total_time)
+
+        latencies.sort()
+        db_times.sort()
+        return {
+            'iterations': len(latencies),
+            'queries': max(query_counts),
+            'queries_median': sorted(query_counts)[len(query_counts) // 2],
+            'db_time_ms_median': round(db_times[len(db_times) // 2] * 1000, 3),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 3),
+                'p95': round(percentile(latencies, 95) * 1000, 3),
+                'p99': round(percentile(latencies, 99) * 1000, 3),
+            },
+        }
+
+    def run_scenarios(self, professor, class_obj, other_class):
+        professor_client = Client()
+        professor_client.force_login(professor)
+
+        enrollments = list(
+            StudentClassEnrollment.objects.filter(class_obj=class_obj).select_related('student').order_by('id')
+        )
+        student = enrollments[0].student
+        student_client = Client()
+        student_client.force_login(student)
+
+        # Make scanning possible right now, and give verify_qr_code an open QR session
+        now = timezone.localtime(timezone.now(), timezone.get_default_timezone())
+        Schedule.objects.create(
+            class_obj=class_obj, day=now.strftime('%A'), start_time=dt_time(0, 0), end_time=dt_time(23, 59)
+        )
+        timestamp = timezone.now().isoformat()
+        AttendanceRecord.objects.create(
+            class_obj=class_obj, date=now, schedule_time='00:00 - 23:59',
+            qr_code_data=json.dumps({'classId': class_obj.id, 'timestamp': timestamp}),
+        )
+        verify_clients = []
+        for enrollment in enrollments:
+            client = Client()
+            client.force_login(enrollment.student)
+            verify_clients.append(client)
+        cancel_schedule = class_obj.schedules.order_by('id').first()
+
+        def scan(i):
+            enrollment = enrollments[i % len(enrollments)]
+            name = enrollment.student.get_full_name() or enrollment.student.username
+            return professor_client.post(
+                reverse('professor:process_qr_scan', args=[class_obj.id]),
+                json.dumps({'student_name': name}), content_type='application/json',
+            )
+
+        def verify(i):
+            return verify_clients[i % len(verify_clients)].post(
+                reverse('professor:verify_qr'),
+                json.dumps({'qr_code_data': json.dumps({'classId': class_obj.id, 'timestamp': timestamp})}),
+                content_type='application/json',
+            )
+
+        def cancel(i):
+            cancel_date = (now.date() + timedelta(weeks=52 + (i % 26))).strftime('%Y-%m-%d')
+            return professor_client.post(reverse('professor:cancel_class'), {
+                'schedule_id': cancel_schedule.id,
+                'cancel_date': cancel_date,
+                'announcement_title': 'Class Canceled',
+                'announcement_content': 'Benchmark cancellation',
+            })
+
+        def add_schedule(i):
+            # Distinct 5-minute slots before 07:00, so every request takes the insert path
+            slot = i + self.options['warmup']
+            start = 5 + (slot // 7) * 6
+            return professor_client.post(reverse('professor:add_schedule', args=[other_class.id]), {
+                'day': DAYS[slot % 7],
+                'start_time': f'{start // 60:02d}:{start % 60:02d}',
+                'end_time': f'{(start + 5) // 60:02d}:{(start + 5) % 60:02d}',
+            })
+
+        scenarios = {
+            'professor_dashboard': lambda i: professor_client.get(reverse('professor:dashboard')),
+            'student_dashboard': lambda i: student_client.get(reverse('student:dashboard')),
+        }
+        for tab in CLASS_DETAIL_TABS:
+            scenarios[f'professor_class_detail_{tab}'] = (
+                lambda i, tab=tab: professor_client.get(reverse('professor:class_detail', args=[class_obj.id]), {'tab': tab})
+            )
+        scenarios.update({
+            'process_qr_scan': scan,
+            'verify_qr_code': verify,
+            'cancel_class': cancel,
+            'add_schedule': add_schedule,
+        })
+
+        results = {}
+        for name, request in scenarios.items():
+            result = self.measure(name, request)
+            if result is not None:
+                results[name] = result
+        return results
+
+    def print_table(self, results):
+        self.stdout.write(f"{'scenario':<36}{'queries':>8}{'db ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, result in results.items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:<36}{result['queries']:>8}{result['db_time_ms_median']:>10.2f}"
+                f"{latency['p50']:>10.2f}{latency['p95']:>10.2f}{latency['p99']:>10.2f}"
+            )
+
+    def compare(self, baseline, results):
+        regressions = []
+        threshold = self.options['latency_threshold']
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            if result['queries'] > before['queries']:
+                regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+            allowed = before['latency_ms']['p95'] * (1 + threshold) + self.options['latency_slack_ms']
+            if result['latency_ms']['p95'] > allowed:
+                regressions.append(
+                    f"{name}: p95 {before['latency_ms']['p95']:.2f} -> {result['latency_ms']['p95']:.2f} ms"
+                )
+        return regressions
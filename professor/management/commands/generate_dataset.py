@@ -0,0 +1,314 @@
+"""Generate a synthetic dataset for load testing.
+
+Creates professors, students, classes with weekly schedules and extra
+classes, enrollments, announcements, held and canceled sessions and
+attendance entries, all with ``bulk_create`` in large batches. The same
+``--seed`` and ``--start-date`` always produce the same data, so numbers
+measured against it can be reproduced.
+
+The number of attendance entries is roughly::
+
+    professors * classes-per-professor * schedules-per-class * weeks
+        * (1 - cancel-rate) * students-per-class * attendance-rate
+
+e.g. ``--professors 200 --classes-per-professor 5 --students-per-class 50
+--schedules-per-class 2 --weeks 16`` gives about 13 million entries.
+
+All synthetic accounts are named ``synth_*`` and share one password
+(``--password``, default ``synthetic``).
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from professor import cache as data_cache
+from professor.models import (
+    Class, Schedule, ExtraClass, Announcement, AttendanceRecord, AttendanceEntry, StudentClassEnrollment,
+)
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+FIRST_NAMES = [
+    'Maria', 'Jose', 'Juan', 'Ana', 'Mark', 'Angel', 'John', 'Kristine', 'Paolo', 'Nicole',
+    'Carlo', 'Camille', 'Miguel', 'Patricia', 'Rafael', 'Bea', 'Joshua', 'Andrea', 'Gabriel', 'Isabel',
+]
+LAST_NAMES = [
+    'Santos', 'Reyes', 'Cruz', 'Bautista', 'Garcia', 'Mendoza', 'Torres', 'Flores', 'Gonzales', 'Ramos',
+    'Aquino', 'Castillo', 'Villanueva', 'Rivera', 'Navarro', 'Dela Cruz', 'Tan', 'Lim', 'Soriano', 'Lopez',
+]
+SUBJECTS = [
+    'Calculus', 'Physics', 'Chemistry', 'Biology', 'Data Structures', 'Algorithms', 'Philippine History',
+    'Statistics', 'Linear Algebra', 'Economics', 'Accounting', 'Purposive Communication', 'Ethics',
+    'Operating Systems', 'Databases', 'Networks', 'Discrete Mathematics', 'Art Appreciation',
+]
+CODE_CHARACTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let ``bulk_create`` keep the timestamps we set on ``auto_now_add`` fields"""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset (users, classes, schedules, sessions, attendance) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--professors', type=int, default=20)
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--classes-per-professor', type=int, default=4)
+        parser.add_argument('--students-per-class', type=int, default=40)
+        parser.add_argument('--schedules-per-class', type=int, default=2)
+        parser.add_argument('--extra-classes-per-class', type=int, default=2)
+        parser.add_argument('--announcements-per-class', type=int, default=5)
+        parser.add_argument('--weeks', type=int, default=16, help='Length of the term that has already been held')
+        parser.add_argument('--attendance-rate', type=float, default=0.85)
+        parser.add_argument('--cancel-rate', type=float, default=0.03)
+        parser.add_argument('--start-date', help='Monday the term started (YYYY-MM-DD); defaults to --weeks before this week')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='synthetic')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith='synth_').exists():
+            raise CommandError('Synthetic data already exists in this database; generate into a fresh database.')
+        if options['students_per_class'] > options['students']:
+            raise CommandError('--students-per-class cannot exceed --students')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.options = options
+        self.tz = timezone.get_default_timezone()
+        if options['start_date']:
+            self.start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+        else:
+            today = date.today()
+            self.start_date = today - timedelta(days=today.weekday(), weeks=options['weeks'])
+        started = time.perf_counter()
+
+        professor_ids, student_ids = self.create_users()
+        classes = self.create_classes(professor_ids)
+        schedules = self.create_schedules(classes)
+        self.create_extra_classes(classes)
+        self.create_announcements(classes)
+        rosters = self.create_enrollments(classes, student_ids)
+        self.create_sessions_and_entries(classes, schedules, rosters)
+
+        # bulk_create skips the signals that invalidate cached data, and the ids
+        # may repeat those of a database that was dropped with its cache intact
+        class_ids = [class_obj.id for class_obj in classes]
+        data_cache.bump_many('class', class_ids)
+        data_cache.bump_many('roster', class_ids)
+        data_cache.bump_many('user', professor_ids + student_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def random_name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def create_users(self):
+        password = make_password(self.options['password'])
+        groups = {name: Group.objects.get_or_create(name=name)[0] for name in ('professor', 'student')}
+        ids = {}
+        for role, count in (('professor', self.options['professors']), ('student', self.options['students'])):
+            users = []
+            for i in range(count):
+                first, last = self.random_name()
+                users.append(User(
+                    username=f'synth_{role}_{i}', password=password,
+                    first_name=first, last_name=f'{last} {i}', email=f'synth_{role}_{i}@example.com',
+                ))
+            with transaction.atomic():
+                for batch in chunked(users, self.batch_size):
+                    User.objects.bulk_create(batch)
+                ids[role] = list(
+                    User.objects.filter(username__startswith=f'synth_{role}_').order_by('id').values_list('id', flat=True)
+                )
+                Membership = User.groups.through
+                for batch in chunked(ids[role], self.batch_size):
+                    Membership.objects.bulk_create(
+                        [Membership(user_id=user_id, group_id=groups[role].id) for user_id in batch]
+                    )
+            self.log(f'{len(ids[role])} {role}s')
+        return ids['professor'], ids['student']
+
+    def create_classes(self, professor_ids):
+        existing_codes = set(Class.all_objects.exclude(class_code=None).values_list('class_code', flat=True))
+        classes = []
+        for professor_id in professor_ids:
+            for _ in range(self.options['classes_per_professor']):
+                code = ''.join(self.rng.choice(CODE_CHARACTERS) for _ in range(6))
+                while code in existing_codes:
+                    code = ''.join(self.rng.choice(CODE_CHARACTERS) for _ in range(6))
+                existing_codes.add(code)
+                classes.append(Class(
+                    professor_id=professor_id,
+                    subject=self.rng.choice(SUBJECTS),
+                    section=f'{self.rng.randint(1, 4)}{self.rng.choice("ABCDE")}',
+                    room=f'Room {self.rng.randint(100, 499)}',
+                    description='Synthetic class for load testing',
+                    class_code=code,
+                ))
+        with transaction.atomic():
+            for batch in chunked(classes, self.batch_size):
+                Class.objects.bulk_create(batch)
+        # Map back by class code so this works whether or not the backend returns primary keys
+        ids = dict(Class.objects.filter(class_code__in=[c.class_code for c in classes]).values_list('class_code', 'id'))
+        for class_obj in classes:
+            class_obj.id = ids[class_obj.class_code]
+        self.log(f'{len(classes)} classes')
+        return classes
+
+    def create_schedules(self, classes):
+        """Give each class non-overlapping weekly slots on distinct days"""
+        schedules = []
+        per_class = min(self.options['schedules_per_class'], 6)
+        for class_obj in classes:
+            for day in self.rng.sample(DAYS[:6], per_class):
+                start_hour = self.rng.randint(7, 18)
+                start = dt_time(start_hour, self.rng.choice([0, 30]))
+                end_minutes = start_hour * 60 + start.minute + self.rng.choice([60, 90, 120])
+                end = dt_time(end_minutes // 60, end_minutes % 60)
+                schedules.append(Schedule(class_obj_id=class_obj.id, day=day, start_time=start, end_time=end))
+        with transaction.atomic():
+            for batch in chunked(schedules, self.batch_size):
+                Schedule.objects.bulk_create(batch)
+        self.log(f'{len(schedules)} weekly schedules')
+        return schedules
+
+    def create_extra_classes(self, classes):
+        extras = []
+        for class_obj in classes:
+            days = self.rng.sample(range(self.options['weeks'] * 7), min(self.options['extra_classes_per_class'], self.options['weeks'] * 7))
+            for offset in days:
+                start_hour = self.rng.randint(7, 19)
+                extras.append(ExtraClass(
+                    class_obj_id=class_obj.id,
+                    date=self.start_date + timedelta(days=offset),
+                    start_time=dt_time(start_hour, 0),
+                    end_time=dt_time(start_hour + 1, 30),
+                    reason=self.rng.choice(['Makeup class', 'Review session', 'Consultation']),
+                ))
+        with transaction.atomic(), explicit_timestamps(ExtraClass._meta.get_field('created_at')):
+            for extra in extras:
+                extra.created_at = timezone.make_aware(datetime.combine(extra.date - timedelta(days=3), dt_time(9, 0)), self.tz)
+            for batch in chunked(extras, self.batch_size):
+                ExtraClass.objects.bulk_create(batch)
+        self.log(f'{len(extras)} extra classes')
+
+    def create_announcements(self, classes):
+        announcements = []
+        term_seconds = self.options['weeks'] * 7 * 86400
+        term_start = timezone.make_aware(datetime.combine(self.start_date, dt_time(8, 0)), self.tz)
+        for class_obj in classes:
+            for i in range(self.options['announcements_per_class']):
+                announcements.append(Announcement(
+                    class_obj_id=class_obj.id,
+                    title=f'{class_obj.subject} update #{i + 1}',
+                    content=f'Please read chapter {self.rng.randint(1, 20)} before our next meeting and bring your notes.',
+                    created_at=term_start + timedelta(seconds=self.rng.randrange(term_seconds)),
+                ))
+        with transaction.atomic(), explicit_timestamps(Announcement._meta.get_field('created_at')):
+            for batch in chunked(announcements, self.batch_size):
+                Announcement.objects.bulk_create(batch)
+        self.log(f'{len(announcements)} announcements')
+
+    def create_enrollments(self, classes, student_ids):
+        rosters = {}
+        enrollments = []
+        enrolled_at = timezone.make_aware(datetime.combine(self.start_date - timedelta(days=7), dt_time(9, 0)), self.tz)
+        for class_obj in classes:
+            roster = self.rng.sample(student_ids, self.options['students_per_class'])
+            rosters[class_obj.id] = roster
+            enrollments.extend(
+                StudentClassEnrollment(
+                    student_id=student_id, class_obj_id=class_obj.id,
+                    enrolled_at=enrolled_at, announcements_seen_at=enrolled_at,
+                )
+                for student_id in roster
+            )
+        with transaction.atomic(), explicit_timestamps(StudentClassEnrollment._meta.get_field('enrolled_at')):
+            for batch in chunked(enrollments, self.batch_size):
+                StudentClassEnrollment.objects.bulk_create(batch)
+        self.log(f'{len(enrollments)} enrollments')
+        return rosters
+
+    def create_sessions_and_entries(self, classes, schedules, rosters):
+        """Create held/canceled sessions week by week and stream their entries"""
+        schedules_by_class = {}
+        for schedule in schedules:
+            schedules_by_class.setdefault(schedule.class_obj_id, []).append(schedule)
+
+        attendance_rate = self.options['attendance_rate']
+        cancel_rate = self.options['cancel_rate']
+        time_scanned_field = AttendanceEntry._meta.get_field('time_scanned')
+        total_records = total_entries = 0
+        class_chunk = max(1, self.batch_size // max(1, self.options['weeks'] * self.options['schedules_per_class']))
+
+        for class_batch in chunked(classes, class_chunk):
+            records = []
+            for class_obj in class_batch:
+                for week in range(self.options['weeks']):
+                    for schedule in schedules_by_class.get(class_obj.id, []):
+                        day = self.start_date + timedelta(weeks=week, days=DAYS.index(schedule.day))
+                        records.append(AttendanceRecord(
+                            class_obj_id=class_obj.id,
+                            date=timezone.make_aware(datetime.combine(day, schedule.start_time), self.tz),
+                            schedule_time=f"{schedule.start_time.strftime('%H:%M')} - {schedule.end_time.strftime('%H:%M')}",
+                            canceled=self.rng.random() < cancel_rate,
+                        ))
+            with transaction.atomic():
+                created = AttendanceRecord.objects.bulk_create(records, batch_size=self.batch_size)
+                if created and created[0].pk is None:
+                    # Backend without RETURNING: read the ids back in insertion order
+                    ids = AttendanceRecord.objects.filter(
+                        class_obj_id__in=[c.id for c in class_batch]
+                    ).order_by('id').values_list('id', flat=True)
+                    for record, pk in zip(records, ids):
+                        record.pk = pk
+
+                entries = []
+                with explicit_timestamps(time_scanned_field):
+                    for record in records:
+                        if record.canceled:
+                            continue
+                        for student_id in rosters[record.class_obj_id]:
+                            if self.rng.random() < attendance_rate:
+                                entry = AttendanceEntry(
+                                    attendance_record=record,
+                                    student_id=student_id,
+                                    time_scanned=record.date + timedelta(seconds=self.rng.randrange(-300, 1800)),
+                                )
+                                # bulk_create skips save(), which computes it
+                                entry.set_lateness()
+                                entries.append(entry)
+                            if len(entries) >= self.batch_size:
+                                AttendanceEntry.objects.bulk_create(entries)
+                                total_entries += len(entries)
+                                entries = []
+                    if entries:
+                        AttendanceEntry.objects.bulk_create(entries)
+                        total_entries += len(entries)
+            total_records += len(records)
+            self.log(f'{total_records} sessions, {total_entries} attendance entries')
@@ -0,0 +1,175 @@
+"""Import classes, weekly schedules and extra classes for a whole term.
+
+    python manage.py import_timetable timetable.csv --dry-run
+    python manage.py import_timetable timetable.json
+
+See ``professor/timetable.py`` for the file formats. The whole file is
+validated before anything is written: unknown professors, malformed rows and
+every overlap (with other rows or with schedules already in the database)
+are reported together. Nothing is imported unless the file is clean, and
+then everything is inserted with ``bulk_create`` in one transaction.
+``--dry-run`` stops after the report.
+
+As with ``add_extra_class``, each extra class gets an announcement unless
+``--no-announcements`` is given.
+"""
+import sys
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction, IntegrityError
+
+from main.roles import PROFESSOR
+from professor import cache as data_cache
+from professor import codes, timetable
+from professor.models import Class, Schedule, ExtraClass, Announcement, CLASS_CODE_ATTEMPTS
+from professor.views import format_time_12h
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Bulk import classes, weekly schedules and extra classes from a CSV or JSON timetable'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Timetable file, or - for standard input')
+        parser.add_argument('--format', choices=['csv', 'json'],
+                            help='File format (default: from the file extension)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without writing')
+        parser.add_argument('--no-announcements', action='store_true',
+                            help='Do not announce the imported extra classes')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('json' if options['path'].lower().endswith('.json') else 'csv')
+        parse = timetable.parse_json if fmt == 'json' else timetable.parse_csv
+        try:
+            if options['path'] == '-':
+                classes, errors = parse(sys.stdin)
+            else:
+                with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                    classes, errors = parse(stream)
+        except (OSError, timetable.TimetableError) as e:
+            raise CommandError(str(e))
+
+        professor_ids = self._resolve(classes, errors)
+        conflicts = timetable.find_conflicts(classes, *self._existing_slots(classes))
+
+        new = [planned for planned in classes if planned.existing_id is None]
+        schedules = sum(len(planned.schedules) for planned in classes)
+        extras = sum(len(planned.extra_classes) for planned in classes)
+        self.stdout.write(
+            f'{len(classes)} classes ({len(new)} new), {schedules} weekly schedules, {extras} extra classes'
+        )
+        for error in errors:
+            self.stderr.write(f'  {error}')
+        for reason, first, second in conflicts:
+            self.stderr.write(f'  {reason}: {timetable.describe(first)} and {timetable.describe(second)}')
+        if errors or conflicts:
+            raise CommandError(f'{len(errors)} invalid rows and {len(conflicts)} conflicts; nothing imported')
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('No conflicts (dry run, nothing imported)'))
+            return
+
+        with transaction.atomic():
+            self._create_classes(new, professor_ids)
+            self._create_slots(classes, announce=not options['no_announcements'])
+            data_cache.bump_many('class', [planned.existing_id for planned in classes])
+            data_cache.bump_many('user', {professor_ids[planned.professor] for planned in new})
+        self.stdout.write(self.style.SUCCESS('Timetable imported'))
+
+    def _resolve(self, classes, errors):
+        """Map usernames to professor ids and match classes that already exist"""
+        usernames = {planned.professor for planned in classes}
+        professor_ids = dict(
+            User.objects.filter(username__in=usernames, groups__name=PROFESSOR).values_list('username', 'id')
+        )
+        for planned in classes:
+            if planned.professor not in professor_ids:
+                errors.append(f'{planned.source}: "{planned.professor}" is not a professor')
+
+        existing = Counter()
+        ids = {}
+        rows = Class.objects.filter(professor_id__in=professor_ids.values()).values_list(
+            'id', 'professor__username', 'subject', 'section'
+        )
+        for class_id, username, subject, section in rows:
+            key = (username, subject.lower(), (section or '').lower())
+            existing[key] += 1
+            ids[key] = class_id
+        for planned in classes:
+            if existing[planned.key] > 1:
+                errors.append(f'{planned.source}: {planned} matches {existing[planned.key]} existing classes')
+            elif planned.key in ids:
+                planned.existing_id = ids[planned.key]
+        return professor_ids
+
+    def _existing_slots(self, classes):
+        keys = {planned.existing_id: planned.key for planned in classes if planned.existing_id is not None}
+        schedules = [
+            timetable.Slot(keys[class_id], day, None, start, end, '', f'existing schedule #{pk}')
+            for pk, class_id, day, start, end in Schedule.objects.filter(class_obj_id__in=keys).values_list(
+                'id', 'class_obj_id', 'day', 'start_time', 'end_time'
+            )
+        ]
+        extras = [
+            timetable.Slot(keys[class_id], timetable.DAYS[date.weekday()], date, start, end, '',
+                           f'existing extra class #{pk}')
+            for pk, class_id, date, start, end in ExtraClass.objects.filter(class_obj_id__in=keys).values_list(
+                'id', 'class_obj_id', 'date', 'start_time', 'end_time'
+            )
+        ]
+        return schedules, extras
+
+    def _create_classes(self, new, professor_ids):
+        """Insert the new classes and set their ``existing_id``"""
+        if not new:
+            return
+        for attempt in range(CLASS_CODE_ATTEMPTS):
+            objs = [
+                Class(
+                    professor_id=professor_ids[planned.professor],
+                    subject=planned.subject,
+                    section=planned.section or None,
+                    room=planned.room or None,
+                    description=planned.description or None,
+                    class_code=code,
+                )
+                for planned, code in zip(new, codes.allocate(len(new)))
+            ]
+            try:
+                with transaction.atomic():
+                    Class.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+                break
+            except IntegrityError:
+                # A clash with a code allocated elsewhere; start from a new point
+                if attempt == CLASS_CODE_ATTEMPTS - 1:
+                    raise
+                codes.reseed()
+        # Map back by class code so this works whether or not the backend returns primary keys
+        ids = dict(Class.objects.filter(class_code__in=[obj.class_code for obj in objs]).values_list('class_code', 'id'))
+        for planned, obj in zip(new, objs):
+            planned.existing_id = ids[obj.class_code]
+
+    def _create_slots(self, classes, announce):
+        schedules, extras, announcements = [], [], []
+        for planned in classes:
+            for slot in planned.schedules:
+                schedules.append(Schedule(
+                    class_obj_id=planned.existing_id, day=slot.day, start_time=slot.start, end_time=slot.end,
+                ))
+            for slot in planned.extra_classes:
+                extras.append(ExtraClass(
+                    class_obj_id=planned.existing_id, date=slot.date, start_time=slot.start, end_time=slot.end,
+                    reason=slot.reason,
+                ))
+                if announce:
+                    time_range = f'{format_time_12h(slot.start)} - {format_time_12h(slot.end)}'
+                    announcements.append(Announcement(
+                        class_obj_id=planned.existing_id,
+                        title=f"Extra Class: {slot.date.strftime('%B %d, %Y')} ({time_range})",
+                        content=slot.reason or 'An extra class session has been scheduled.',
+                    ))
+        Schedule.objects.bulk_create(schedules, batch_size=BATCH_SIZE)
+        ExtraClass.objects.bulk_create(extras, batch_size=BATCH_SIZE)
+        Announcement.objects.bulk_create(announcements, batch_size=BATCH_SIZE)
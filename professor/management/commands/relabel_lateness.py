@@ -0,0 +1,22 @@
+"""Re-bucket stored attendance entries after changing the lateness thresholds.
+
+    LATE_AFTER_MINUTES=15 python manage.py relabel_lateness
+
+See ``professor/lateness.py``.
+"""
+from django.core.management.base import BaseCommand
+
+from professor import cache, lateness
+from professor.models import AttendanceEntry, ArchivedAttendanceEntry, Class
+
+
+class Command(BaseCommand):
+    help = 'Recompute the on time / late / very late bucket of every entry from its stored minutes late'
+
+    def handle(self, *args, **options):
+        changed = lateness.relabel(AttendanceEntry.objects.all())
+        changed += lateness.relabel(ArchivedAttendanceEntry.objects.all())
+        if changed:
+            # The attendance tabs show the buckets
+            cache.bump_many('class', Class.all_objects.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'{changed} entries relabeled'))
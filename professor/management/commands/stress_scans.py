@@ -0,0 +1,183 @@
+"""Hammer ``process_qr_scan`` from several processes against the real database.
+
+Used to check a SQLite deployment for "database is locked" errors:
+
+    SQLITE_PRODUCTION=true python manage.py stress_scans --processes 8
+
+A throwaway professor, class (scheduled all day today) and students are
+created, then every process logs in as the professor and scans every student
+``--rounds`` times in its own random order, so most scans race another
+process for the same row. Nothing opens the attendance session beforehand, so
+the first scans also race to create it. The command fails if any scan errors
+or if the class ends up with more than one session or a student marked twice.
+The data is deleted afterwards unless ``--keep`` is given. With ``--async``
+the scans go to the async view of ``async_views.py`` instead (called
+directly, as an ASGI worker routes them with ``ASYNC_VIEWS``).
+
+``professor/tests.py`` runs the same scans against the test database.
+"""
+import logging
+import multiprocessing
+import random
+import secrets
+import time
+from collections import Counter
+from datetime import time as dt_time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.metrics import scan_outcome
+from main.roles import PROFESSOR
+from professor.models import Class, Schedule, AttendanceRecord, AttendanceEntry, StudentClassEnrollment
+
+
+def _async_poster(professor, class_id):
+    from professor import async_views
+
+    view = async_to_sync(async_views.process_qr_scan)
+
+    def post(url, data, content_type):
+        request = RequestFactory().post(url, data, content_type=content_type)
+        # What the auth and role middleware would set
+        request.user = professor
+        request.roles = frozenset([PROFESSOR])
+        return view(request, class_id)
+    return post
+
+
+def _scan_worker(args):
+    professor_id, class_id, names, rounds, seed, use_async = args
+    # Connections inherited over fork must not be shared with the parent
+    connections.close_all()
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    rng = random.Random(seed)
+    outcomes = Counter()
+    errors = []
+    with override_settings(ALLOWED_HOSTS=['*']):
+        professor = User.objects.get(id=professor_id)
+        if use_async:
+            post = _async_poster(professor, class_id)
+        else:
+            client = Client()
+            client.force_login(professor)
+            post = client.post
+        url = reverse('professor:process_qr_scan', args=[class_id])
+        for _ in range(rounds):
+            order = list(names)
+            rng.shuffle(order)
+            for name in order:
+                response = post(url, {'student_name': name}, content_type='application/json')
+                outcome = scan_outcome(response)
+                outcomes[outcome] += 1
+                if outcome == 'error':
+                    errors.append(response.json().get('error', response.status_code))
+    connections.close_all()
+    return outcomes, errors
+
+
+def create_scan_class(tag, count):
+    """A professor and a class scheduled all day today with ``count`` enrolled students"""
+    password = secrets.token_urlsafe(16)
+    professor = User.objects.create_user(f'stress_{tag}_prof', password=password)
+    professor.groups.add(Group.objects.get_or_create(name='professor')[0])
+    class_obj = Class.objects.create(professor=professor, subject=f'Stress test {tag}')
+    today = timezone.localtime(timezone.now(), timezone.get_default_timezone())
+    Schedule.objects.create(
+        class_obj=class_obj, day=today.strftime('%A'),
+        start_time=dt_time(0, 0), end_time=dt_time(23, 59, 59),
+    )
+    student_group = Group.objects.get_or_create(name='student')[0]
+    students = []
+    for i in range(count):
+        student = User.objects.create_user(
+            f'stress_{tag}_s{i}', password=password, first_name='Stress', last_name=f'{tag} {i}',
+        )
+        student.groups.add(student_group)
+        StudentClassEnrollment.objects.create(student=student, class_obj=class_obj)
+        students.append(student)
+    return professor, class_obj, students
+
+
+def run_scans(professor, class_obj, names, processes, rounds, use_async=False):
+    """Scan ``names`` from ``processes`` forked processes; returns ``(outcomes, errors, seconds)``"""
+    connections.close_all()
+    jobs = [(professor.id, class_obj.id, names, rounds, index, use_async) for index in range(processes)]
+    started = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(processes) as pool:
+        results = pool.map(_scan_worker, jobs)
+    elapsed = time.perf_counter() - started
+
+    outcomes = Counter()
+    errors = Counter()
+    for worker_outcomes, worker_errors in results:
+        outcomes.update(worker_outcomes)
+        errors.update(worker_errors)
+    return outcomes, errors, elapsed
+
+
+class Command(BaseCommand):
+    help = 'Check process_qr_scan for lock errors and double marking under multi-process load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8, help='Number of concurrent scanning processes')
+        parser.add_argument('--students', type=int, default=40, help='Students enrolled in the throwaway class')
+        parser.add_argument('--rounds', type=int, default=3, help='Times each process scans every student')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated professor, class and students')
+        parser.add_argument('--async', action='store_true', dest='use_async', help='Scan through the async view')
+
+    def handle(self, *args, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('stress_scans needs the fork start method (Linux or macOS)')
+
+        tag = secrets.token_hex(4)
+        professor, class_obj, students = create_scan_class(tag, options['students'])
+        names = [student.get_full_name() for student in students]
+        try:
+            outcomes, errors, elapsed = run_scans(
+                professor, class_obj, names, options['processes'], options['rounds'], options['use_async'],
+            )
+
+            sessions = AttendanceRecord.objects.filter(class_obj=class_obj).count()
+            entries = AttendanceEntry.objects.filter(attendance_record__class_obj=class_obj)
+            marked = entries.count()
+            double_marked = (
+                entries.values('attendance_record', 'student')
+                .annotate(n=Count('id')).filter(n__gt=1).count()
+            )
+        finally:
+            if not options['keep']:
+                self._cleanup(professor, students)
+
+        total = sum(outcomes.values())
+        self.stdout.write(
+            f'{total} scans from {options["processes"]} processes in {elapsed:.2f}s '
+            f'({total / elapsed:.1f} scans/s)'
+        )
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f'  {outcome:<20} {count}')
+        self.stdout.write(f'sessions opened: {sessions}, students marked: {marked}/{len(names)}, '
+                          f'marked twice: {double_marked}')
+
+        problems = []
+        if errors:
+            for message, count in errors.most_common(5):
+                self.stderr.write(f'  {count}x {message}')
+            problems.append(f'{sum(errors.values())} scans failed')
+        if sessions != 1:
+            problems.append(f'{sessions} attendance sessions opened instead of 1')
+        if marked != len(names) or double_marked:
+            problems.append('attendance entries do not match the roster')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('No lock errors, no duplicate sessions or entries'))
+
+    def _cleanup(self, professor, students):
+        User.objects.filter(id__in=[s.id for s in students] + [professor.id]).delete()
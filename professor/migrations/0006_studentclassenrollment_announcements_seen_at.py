@@ -0,0 +1,24 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_existing_seen(apps, schema_editor):
+    """Start existing enrollments with nothing unread"""
+    StudentClassEnrollment = apps.get_model('professor', 'StudentClassEnrollment')
+    StudentClassEnrollment.objects.update(announcements_seen_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('professor', '0005_add_extraclass_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentclassenrollment',
+            name='announcements_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_seen, migrations.RunPython.noop),
+    ]
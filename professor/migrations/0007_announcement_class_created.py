@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('professor', '0006_studentclassenrollment_announcements_seen_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['class_obj', 'created_at'], name='announcement_class_created'),
+        ),
+    ]
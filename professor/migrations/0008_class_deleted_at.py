@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('professor', '0007_announcement_class_created'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
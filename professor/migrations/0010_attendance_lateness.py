@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+from professor import lateness
+
+BATCH_SIZE = 5000
+
+
+def backfill(apps, schema_editor):
+    """Compute the lateness of existing entries, a batch of ids at a time, one UPDATE per value"""
+    using = schema_editor.connection.alias
+    for model_name in ('AttendanceEntry', 'ArchivedAttendanceEntry'):
+        model = apps.get_model('professor', model_name)
+        rows = model.objects.using(using).order_by('id').values_list(
+            'id', 'time_scanned', 'attendance_record__date', 'attendance_record__schedule_time'
+        )
+        last_id = 0
+        while True:
+            batch = list(rows.filter(id__gt=last_id)[:BATCH_SIZE])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            ids_by_value = {}
+            for entry_id, time_scanned, date, schedule_time in batch:
+                ids_by_value.setdefault(lateness.compute(time_scanned, date, schedule_time), []).append(entry_id)
+            for (minutes, bucket), ids in ids_by_value.items():
+                model.objects.using(using).filter(id__in=ids).update(minutes_late=minutes, lateness=bucket)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('professor', '0009_terms_and_attendance_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedattendanceentry',
+            name='lateness',
+            field=models.CharField(blank=True, choices=[('on_time', 'On time'), ('late', 'Late'), ('very_late', 'Very late')], editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='archivedattendanceentry',
+            name='minutes_late',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendanceentry',
+            name='lateness',
+            field=models.CharField(blank=True, choices=[('on_time', 'On time'), ('late', 'Late'), ('very_late', 'Very late')], editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='attendanceentry',
+            name='minutes_late',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        # Before the indexes, so the updates do not have to maintain them
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='archivedattendanceentry',
+            index=models.Index(fields=['student', 'lateness', 'minutes_late'], name='archived_entry_lateness'),
+        ),
+        migrations.AddIndex(
+            model_name='attendanceentry',
+            index=models.Index(fields=['student', 'lateness', 'minutes_late'], name='entry_student_lateness'),
+        ),
+        migrations.AddIndex(
+            model_name='attendanceentry',
+            index=models.Index(fields=['attendance_record', 'lateness', 'minutes_late'], name='entry_record_lateness'),
+        ),
+    ]
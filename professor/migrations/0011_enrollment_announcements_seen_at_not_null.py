@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def start_at_enrollment(apps, schema_editor):
+    """Enrollments never opened count announcements from when the student enrolled"""
+    StudentClassEnrollment = apps.get_model('professor', 'StudentClassEnrollment')
+    StudentClassEnrollment.objects.filter(announcements_seen_at__isnull=True).update(
+        announcements_seen_at=F('enrolled_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('professor', '0010_attendance_lateness'),
+    ]
+
+    operations = [
+        migrations.RunPython(start_at_enrollment, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='studentclassenrollment',
+            name='announcements_seen_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
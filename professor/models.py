@@ -1,17 +1,26 @@
-from django.db import models
+from contextlib import nullcontext
+import datetime
+
+from django.db import models, transaction, IntegrityError, router
 from django.contrib.auth.models import User
 from django.utils import timezone
-import secrets
-import string
+
+from . import codes, lateness
+
+# Attempts at saving a new class with a fresh code before giving up
+CLASS_CODE_ATTEMPTS = 5
 
 
 def generate_class_code():
-    """Generate a unique 6-character class code"""
-    characters = string.ascii_uppercase + string.digits
-    while True:
-        code = ''.join(secrets.choice(characters) for _ in range(6))
-        if not Class.objects.filter(class_code=code).exists():
-            return code
+    """Generate a 6-character class code (see ``codes.py``)"""
+    return codes.allocate()[0]
+
+
+class ActiveClassManager(models.Manager):
+    """Leaves out classes that were deleted and are waiting to be purged (see ``purge.py``)"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Class(models.Model):
@@ -24,11 +33,31 @@ class Class(models.Model):
     class_code = models.CharField(max_length=6, unique=True, blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the class is deleted; the rows are purged later by a background job
+    deleted_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    objects = ActiveClassManager()
+    all_objects = models.Manager()
 
     def save(self, *args, **kwargs):
-        if not self.class_code:
+        if self.class_code:
+            return super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(Class, instance=self)
+        # A failed INSERT breaks an enclosing transaction, so retry inside a savepoint there
+        connection = transaction.get_connection(using)
+        for attempt in range(CLASS_CODE_ATTEMPTS):
             self.class_code = generate_class_code()
-        super().save(*args, **kwargs)
+            try:
+                with transaction.atomic(using=using) if connection.in_atomic_block else nullcontext():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Only a clash on the code itself is worth another attempt
+                if attempt == CLASS_CODE_ATTEMPTS - 1 or not Class.all_objects.using(using).filter(
+                    class_code=self.class_code
+                ).exists():
+                    self.class_code = None
+                    raise
+                codes.reseed()
 
     class Meta:
         verbose_name_plural = "Classes"
@@ -99,6 +128,10 @@ class Announcement(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves the per-class "newer than" scans of the announcements feed
+            models.Index(fields=['class_obj', 'created_at'], name='announcement_class_created'),
+        ]
 
     def __str__(self):
         return f"{self.class_obj.subject} - {self.title}"
@@ -128,20 +161,52 @@ class AttendanceEntry(models.Model):
     attendance_record = models.ForeignKey(AttendanceRecord, on_delete=models.CASCADE, related_name='entries')
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_entries')
     time_scanned = models.DateTimeField(auto_now_add=True)
+    # After the scheduled start, set on creation (see lateness.py); null if the start is unknown
+    minutes_late = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    lateness = models.CharField(max_length=10, choices=lateness.CHOICES, blank=True, editable=False)
 
     class Meta:
         unique_together = ['attendance_record', 'student']
         ordering = ['time_scanned']
+        indexes = [
+            # Lateness per student, and per class through its sessions
+            models.Index(fields=['student', 'lateness', 'minutes_late'], name='entry_student_lateness'),
+            models.Index(fields=['attendance_record', 'lateness', 'minutes_late'], name='entry_record_lateness'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.attendance_record}"
 
+    def set_lateness(self):
+        """Compute ``minutes_late`` and ``lateness`` from the scan time and the session's start"""
+        record = self.attendance_record
+        self.minutes_late, self.lateness = lateness.compute(
+            self.time_scanned or timezone.now(), record.date, record.schedule_time
+        )
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.lateness:
+            self.set_lateness()
+        super().save(*args, **kwargs)
+
+
+class ActiveEnrollmentManager(models.Manager):
+    """Leaves out enrollments in deleted classes; they are kept until the purge so a deletion can be undone"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(class_obj__deleted_at__isnull=True)
+
 
 class StudentClassEnrollment(models.Model):
     """Tracks which students are enrolled in which classes"""
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrolled_classes')
     class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='enrolled_students')
     enrolled_at = models.DateTimeField(auto_now_add=True)
+    # Announcements posted after this are unread; starts at enrollment
+    announcements_seen_at = models.DateTimeField(default=timezone.now)
+
+    objects = ActiveEnrollmentManager()
+    all_objects = models.Manager()
 
     class Meta:
         unique_together = ['student', 'class_obj']
@@ -149,3 +214,74 @@ class StudentClassEnrollment(models.Model):
 
     def __str__(self):
         return f"{self.student.username} - {self.class_obj.subject}"
+
+
+class Term(models.Model):
+    """An academic term; once it has ended its sessions can be archived (see ``archive.py``)"""
+    name = models.CharField(max_length=100, unique=True)  # e.g., "1st Semester 2025-2026"
+    start_date = models.DateField()
+    end_date = models.DateField()
+    archived_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    class Meta:
+        ordering = ['-start_date']
+
+    def __str__(self):
+        return self.name
+
+    def bounds(self):
+        """The first moment of the term and the first moment after it, in the current time zone"""
+        start = datetime.datetime.combine(self.start_date, datetime.time.min)
+        end = datetime.datetime.combine(self.end_date + datetime.timedelta(days=1), datetime.time.min)
+        return timezone.make_aware(start), timezone.make_aware(end)
+
+
+class ArchivedAttendanceRecord(models.Model):
+    """An attendance session moved out of ``AttendanceRecord`` when its term was archived"""
+    id = models.BigIntegerField(primary_key=True)  # The id it had as an AttendanceRecord
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='archived_attendance_records')
+    term = models.ForeignKey(Term, on_delete=models.CASCADE, related_name='archived_attendance_records')
+    date = models.DateTimeField()
+    schedule_time = models.CharField(max_length=50)
+    canceled = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-date']
+        indexes = [models.Index(fields=['class_obj', 'term'], name='archived_record_class_term')]
+
+    def __str__(self):
+        return f"{self.class_obj.subject} - {self.date.strftime('%Y-%m-%d %H:%M')} ({self.term})"
+
+
+class ArchivedAttendanceEntry(models.Model):
+    """An attendance entry moved out of ``AttendanceEntry`` along with its session"""
+    id = models.BigIntegerField(primary_key=True)  # The id it had as an AttendanceEntry
+    attendance_record = models.ForeignKey(ArchivedAttendanceRecord, on_delete=models.CASCADE, related_name='entries')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_attendance_entries')
+    time_scanned = models.DateTimeField()
+    minutes_late = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    lateness = models.CharField(max_length=10, choices=lateness.CHOICES, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['time_scanned']
+        indexes = [models.Index(fields=['student', 'lateness', 'minutes_late'], name='archived_entry_lateness')]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.attendance_record}"
+
+
+class AttendanceSummary(models.Model):
+    """How many sessions of an archived term a student attended in a class"""
+    term = models.ForeignKey(Term, on_delete=models.CASCADE, related_name='attendance_summaries')
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='attendance_summaries')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_summaries')
+    attended = models.PositiveIntegerField()
+    sessions = models.PositiveIntegerField()  # Sessions held (not canceled) in the class that term
+
+    class Meta:
+        unique_together = ['term', 'class_obj', 'student']
+        ordering = ['-term__start_date']
+        verbose_name_plural = "Attendance summaries"
+
+    def __str__(self):
+        return f"{self.student.username} - {self.class_obj.subject} ({self.term}): {self.attended}/{self.sessions}"
@@ -0,0 +1,138 @@
+"""Deleting classes and users without loading their history.
+
+``Model.delete()`` collects every dependent row in Python first: deleting a
+class with years of sessions loads all its attendance records and entries,
+sends a signal for each and deletes them in one long transaction. Instead:
+
+- ``delete_classes`` / ``delete_users`` *hide* the objects right away.
+  Classes get ``deleted_at`` set, which ``Class.objects`` and
+  ``StudentClassEnrollment.objects`` filter out, so neither the professor
+  nor the students see them; nothing else changes, and clearing
+  ``deleted_at`` before the purge runs brings a class back as it was (the
+  purge only deletes classes that are still deleted). Users are made
+  inactive, so they can no longer log in, and their classes are hidden the
+  same way. A purge job is queued.
+- ``purge_class`` / ``purge_user`` (the jobs, see ``tasks.py``) delete the
+  dependent rows with raw ``DELETE ... WHERE id IN (SELECT id ... LIMIT n)``
+  statements, ``PURGE_BATCH_SIZE`` rows at a time, each batch in its own
+  short transaction. Children are deleted before their parents, following
+  the ``CASCADE`` foreign keys. A purge that is interrupted simply carries on
+  where it stopped when the job is retried. Each batch renews the job's
+  lock (``jobs.queue.touch``), so a long purge is not taken for a dead one.
+
+Raw deletes send no signals, so the purge bumps the caches itself.
+"""
+from django.contrib.auth.models import User
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+from jobs.queue import touch
+from . import cache
+from .models import (
+    Class, AttendanceEntry, ArchivedAttendanceEntry, AttendanceSummary, StudentClassEnrollment,
+)
+
+PURGE_BATCH_SIZE = 1000
+
+
+def _hide_classes(class_ids):
+    students = set(
+        StudentClassEnrollment.objects.filter(class_obj_id__in=class_ids).values_list('student_id', flat=True)
+    )
+    Class.objects.filter(id__in=class_ids).update(deleted_at=timezone.now())
+    cache.bump_many('class', class_ids)
+    # The students' class lists are cached per student
+    cache.bump_many('user', students)
+
+
+def delete_classes(classes, created_by=None):
+    """Hide ``classes`` (a queryset) now and queue their purge"""
+    from . import tasks
+
+    rows = list(classes.values_list('id', 'professor_id'))
+    with transaction.atomic():
+        _hide_classes([class_id for class_id, _ in rows])
+        cache.bump_many('user', {professor_id for _, professor_id in rows})
+        for class_id, _ in rows:
+            tasks.purge_class.enqueue(created_by=created_by, class_id=class_id)
+
+
+def delete_users(users, created_by=None):
+    """Deactivate ``users`` (a queryset), hide their classes and queue their purge"""
+    from . import tasks
+
+    user_ids = list(users.values_list('id', flat=True))
+    with transaction.atomic():
+        # One by one, so that the signals end their cached sessions
+        for user in User.objects.filter(id__in=user_ids):
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+        _hide_classes(list(Class.objects.filter(professor_id__in=user_ids).values_list('id', flat=True)))
+        StudentClassEnrollment.objects.filter(student_id__in=user_ids).delete()
+        cache.bump_many('user', user_ids)
+        for user_id in user_ids:
+            tasks.purge_user.enqueue(created_by=created_by, user_id=user_id)
+
+
+def _delete_in_batches(model, where, params, using):
+    """Delete the rows of ``model`` matching the SQL condition ``where``, dependents first.
+
+    Returns the number of rows deleted.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    pk = quote(model._meta.pk.column)
+    deleted = 0
+    for relation in model._meta.related_objects:
+        if relation.on_delete is models.CASCADE:
+            deleted += _delete_in_batches(
+                relation.related_model,
+                f'{quote(relation.field.column)} IN (SELECT {pk} FROM {table} WHERE {where})',
+                params,
+                using,
+            )
+
+    sql = f'DELETE FROM {table} WHERE {pk} IN (SELECT {pk} FROM {table} WHERE {where} LIMIT %s)'
+    while True:
+        touch()
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(sql, [*params, PURGE_BATCH_SIZE])
+            count = cursor.rowcount
+        deleted += count
+        if count < PURGE_BATCH_SIZE:
+            return deleted
+
+
+def purge_class(class_id):
+    """Delete a hidden class and everything in it; returns the number of rows deleted"""
+    using = router.db_for_write(Class)
+    # Restricting to deleted classes makes every batch check the class is still deleted
+    deleted = _delete_in_batches(Class, 'id = %s AND deleted_at IS NOT NULL', [class_id], using)
+    cache.bump('class', class_id)
+    return deleted
+
+
+def purge_user(user_id):
+    """Delete a deactivated user with their classes and attendance; returns the number of rows deleted"""
+    using = router.db_for_write(User)
+    if User.objects.using(using).filter(id=user_id, is_active=True).exists():
+        # Reactivated since the purge was queued
+        return 0
+    # Classes created between the deletion and now are hidden too
+    Class.objects.using(using).filter(professor_id=user_id).update(deleted_at=timezone.now())
+    deleted = 0
+    for class_id in Class.all_objects.using(using).filter(professor_id=user_id).values_list('id', flat=True):
+        deleted += purge_class(class_id)
+
+    attended = list(
+        AttendanceEntry.objects.using(using).filter(student_id=user_id)
+        .values_list('attendance_record__class_obj_id', flat=True).distinct()
+    )
+    for model in (AttendanceEntry, ArchivedAttendanceEntry, AttendanceSummary, StudentClassEnrollment):
+        deleted += _delete_in_batches(model, 'student_id = %s', [user_id], using)
+    cache.bump_many('class', attended)
+
+    # What is left (sessions, groups, admin log) is small enough for the collector
+    deleted += sum(User.objects.using(using).filter(id=user_id).delete()[1].values())
+    return deleted
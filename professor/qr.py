@@ -0,0 +1,354 @@
+"""QR code encoding and rendering (ISO/IEC 18004) in plain Python.
+
+Student QR codes used to be drawn in the browser by a script from a CDN,
+which is slow on congested campus networks and fails offline. ``encode``
+turns text into a module matrix (byte mode, UTF-8, the smallest version of
+the 40 that fits, the mask with the lowest penalty), and ``to_svg`` /
+``to_png`` render it; PNGs are written with ``zlib`` so nothing outside the
+standard library is needed.
+
+The construction follows the standard step by step: data bits, Reed-Solomon
+error correction per block, interleaving, function patterns, zigzag
+placement, masking and format/version information.
+"""
+import struct
+import zlib
+
+# Error correction levels: (index into the tables below, format bits)
+LOW, MEDIUM, QUARTILE, HIGH = (0, 1), (1, 0), (2, 3), (3, 2)
+
+# Per level and version (index 0 unused): error correction codewords per block
+_ECC_CODEWORDS_PER_BLOCK = (
+    (-1, 7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28,
+     28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26,
+     26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    (-1, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30,
+     28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (-1, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28,
+     30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+)
+# Per level and version: number of error correction blocks
+_NUM_BLOCKS = (
+    (-1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8,
+     8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    (-1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16,
+     17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    (-1, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20,
+     23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    (-1, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25,
+     25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),
+)
+
+_MASKS = (
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+)
+
+# Arithmetic in GF(2^8) modulo x^8 + x^4 + x^3 + x^2 + 1
+_EXP = [0] * 512
+_LOG = [0] * 256
+_value = 1
+for _i in range(255):
+    _EXP[_i] = _value
+    _LOG[_value] = _i
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+
+
+class DataTooLong(ValueError):
+    """The text does not fit in a version 40 QR code at the requested level"""
+
+
+def _multiply(x, y):
+    if x == 0 or y == 0:
+        return 0
+    return _EXP[_LOG[x] + _LOG[y]]
+
+
+def _rs_divisor(degree):
+    """Generator polynomial coefficients, highest power first (leading 1 omitted)"""
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            result[j] = _multiply(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _multiply(root, 2)
+    return result
+
+
+def _rs_remainder(data, divisor):
+    result = [0] * len(divisor)
+    for byte in data:
+        factor = byte ^ result.pop(0)
+        result.append(0)
+        for i, coefficient in enumerate(divisor):
+            result[i] ^= _multiply(coefficient, factor)
+    return result
+
+
+def _raw_data_modules(version):
+    """Modules left for data and error correction once the function patterns are drawn"""
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        alignments = version // 7 + 2
+        result -= (25 * alignments - 10) * alignments - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+
+def _data_codewords(version, level):
+    return (
+        _raw_data_modules(version) // 8
+        - _ECC_CODEWORDS_PER_BLOCK[level[0]][version] * _NUM_BLOCKS[level[0]][version]
+    )
+
+
+def _alignment_positions(version, size):
+    if version == 1:
+        return []
+    alignments = version // 7 + 2
+    step = (version * 8 + alignments * 3 + 5) // (alignments * 4 - 4) * 2
+    return [6] + [size - 7 - i * step for i in reversed(range(alignments - 1))]
+
+
+def _codewords(data, version, level):
+    """Data bits in byte mode, padded, split into blocks with error correction and interleaved"""
+    count_bits = 8 if version <= 9 else 16
+    bits = [0, 1, 0, 0] + [(len(data) >> i) & 1 for i in reversed(range(count_bits))]
+    for byte in data:
+        bits += [(byte >> i) & 1 for i in reversed(range(8))]
+    capacity = _data_codewords(version, level) * 8
+    bits += [0] * min(4, capacity - len(bits))
+    bits += [0] * (-len(bits) % 8)
+    codewords = [int(''.join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8)]
+    pad = 0xEC
+    while len(codewords) < capacity // 8:
+        codewords.append(pad)
+        pad ^= 0xEC ^ 0x11
+
+    num_blocks = _NUM_BLOCKS[level[0]][version]
+    ecc_len = _ECC_CODEWORDS_PER_BLOCK[level[0]][version]
+    raw = _raw_data_modules(version) // 8
+    short_blocks = num_blocks - raw % num_blocks
+    short_len = raw // num_blocks
+    divisor = _rs_divisor(ecc_len)
+    blocks = []
+    k = 0
+    for i in range(num_blocks):
+        block = codewords[k:k + short_len - ecc_len + (0 if i < short_blocks else 1)]
+        k += len(block)
+        ecc = _rs_remainder(block, divisor)
+        if i < short_blocks:
+            block.append(0)  # Placeholder, skipped when interleaving
+        blocks.append(block + ecc)
+
+    result = []
+    for i in range(len(blocks[0])):
+        for j, block in enumerate(blocks):
+            if i != short_len - ecc_len or j >= short_blocks:
+                result.append(block[i])
+    return result
+
+
+class _Matrix:
+    def __init__(self, version):
+        self.version = version
+        self.size = version * 4 + 17
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self.function = [[False] * self.size for _ in range(self.size)]
+
+    def set_function(self, x, y, dark):
+        self.modules[y][x] = dark
+        self.function[y][x] = True
+
+    def draw_function_patterns(self):
+        size = self.size
+        for i in range(size):
+            self.set_function(6, i, i % 2 == 0)
+            self.set_function(i, 6, i % 2 == 0)
+        for cx, cy in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    x, y = cx + dx, cy + dy
+                    if 0 <= x < size and 0 <= y < size:
+                        self.set_function(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+        positions = _alignment_positions(self.version, size)
+        last = len(positions) - 1
+        for i, cx in enumerate(positions):
+            for j, cy in enumerate(positions):
+                # Skip the three corners taken by finder patterns
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        self.set_function(cx + dx, cy + dy, max(abs(dx), abs(dy)) != 1)
+        self.draw_format(LOW, 0)  # Reserves the area; drawn for real once the mask is chosen
+        self.draw_version()
+
+    def draw_format(self, level, mask):
+        data = level[1] << 3 | mask
+        remainder = data
+        for _ in range(10):
+            remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+        bits = (data << 10 | remainder) ^ 0x5412
+        bit = [(bits >> i) & 1 == 1 for i in range(15)]
+        size = self.size
+        for i in range(6):
+            self.set_function(8, i, bit[i])
+        self.set_function(8, 7, bit[6])
+        self.set_function(8, 8, bit[7])
+        self.set_function(7, 8, bit[8])
+        for i in range(9, 15):
+            self.set_function(14 - i, 8, bit[i])
+        for i in range(8):
+            self.set_function(size - 1 - i, 8, bit[i])
+        for i in range(8, 15):
+            self.set_function(8, size - 15 + i, bit[i])
+        self.set_function(8, size - 8, True)
+
+    def draw_version(self):
+        if self.version < 7:
+            return
+        remainder = self.version
+        for _ in range(12):
+            remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+        bits = self.version << 12 | remainder
+        for i in range(18):
+            dark = (bits >> i) & 1 == 1
+            a, b = self.size - 11 + i % 3, i // 3
+            self.set_function(a, b, dark)
+            self.set_function(b, a, dark)
+
+    def draw_codewords(self, codewords):
+        size = self.size
+        i = 0
+        total = len(codewords) * 8
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5  # Skip the vertical timing pattern
+            upward = (right + 1) & 2 == 0
+            for vertical in range(size):
+                y = size - 1 - vertical if upward else vertical
+                for x in (right, right - 1):
+                    if not self.function[y][x] and i < total:
+                        self.modules[y][x] = (codewords[i >> 3] >> (7 - (i & 7))) & 1 == 1
+                        i += 1
+            right -= 2
+
+    def apply_mask(self, mask):
+        test = _MASKS[mask]
+        for y in range(self.size):
+            row, function = self.modules[y], self.function[y]
+            for x in range(self.size):
+                if not function[x] and test(x, y):
+                    row[x] = not row[x]
+
+    def penalty(self):
+        size = self.size
+        rows = [''.join('1' if dark else '0' for dark in row) for row in self.modules]
+        columns = [''.join(row[x] for row in rows) for x in range(size)]
+        score = 0
+        for line in rows + columns:
+            run = 1
+            for a, b in zip(line, line[1:]):
+                if a == b:
+                    run += 1
+                else:
+                    score += run - 2 if run >= 5 else 0
+                    run = 1
+            score += run - 2 if run >= 5 else 0
+            # Patterns looking like a finder (1:1:3:1:1 with 4 light modules on a side)
+            padded = '0000' + line + '0000'
+            for pattern in ('00001011101', '10111010000'):
+                start = padded.find(pattern)
+                while start != -1:
+                    score += 40
+                    start = padded.find(pattern, start + 1)
+        for y in range(size - 1):
+            for x in range(size - 1):
+                if rows[y][x] == rows[y][x + 1] == rows[y + 1][x] == rows[y + 1][x + 1]:
+                    score += 3
+        dark = sum(row.count('1') for row in rows)
+        total = size * size
+        score += ((abs(dark * 20 - total * 10) + total - 1) // total - 1) * 10
+        return score
+
+
+def encode(text, level=MEDIUM):
+    """The QR code of ``text`` as rows of booleans (``True`` is dark), without the quiet zone"""
+    data = text.encode('utf-8') if isinstance(text, str) else bytes(text)
+    for version in range(1, 41):
+        count_bits = 8 if version <= 9 else 16
+        if len(data) < 1 << count_bits and 4 + count_bits + 8 * len(data) <= _data_codewords(version, level) * 8:
+            break
+    else:
+        raise DataTooLong(f'{len(data)} bytes do not fit in a QR code')
+
+    matrix = _Matrix(version)
+    matrix.draw_function_patterns()
+    matrix.draw_codewords(_codewords(data, version, level))
+    best = None
+    for mask in range(8):
+        matrix.apply_mask(mask)
+        matrix.draw_format(level, mask)
+        score = matrix.penalty()
+        if best is None or score < best[0]:
+            best = (score, mask)
+        matrix.apply_mask(mask)  # XOR again to undo
+    matrix.apply_mask(best[1])
+    matrix.draw_format(level, best[1])
+    return matrix.modules
+
+
+def to_svg(modules, border=4):
+    """An SVG document drawing ``modules`` as one path, scaled to fit its container"""
+    size = len(modules) + border * 2
+    path = ''.join(
+        f'M{x + border},{y + border}h1v1h-1z'
+        for y, row in enumerate(modules) for x, dark in enumerate(row) if dark
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+        f'shape-rendering="crispEdges"><rect width="100%" height="100%" fill="#fff"/>'
+        f'<path d="{path}" fill="#000"/></svg>'
+    )
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def to_png(modules, scale=10, border=4):
+    """A 1-bit grayscale PNG of ``modules``, ``scale`` pixels per module"""
+    width = (len(modules) + border * 2) * scale
+    light_row = [1] * (len(modules) + border * 2)
+    raw = bytearray()
+    for row in [light_row] * border + [[1] * border + [0 if dark else 1 for dark in row] + [1] * border
+                                       for row in modules] + [light_row] * border:
+        pixels = [bit for bit in row for _ in range(scale)]
+        pixels += [1] * (-len(pixels) % 8)
+        line = b'\x00' + bytes(
+            int(''.join(map(str, pixels[i:i + 8])), 2) for i in range(0, len(pixels), 8)
+        )
+        raw += line * scale
+    header = struct.pack('>IIBBBBB', width, width, 1, 0, 0, 0, 0)
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + _png_chunk(b'IHDR', header)
+        + _png_chunk(b'IDAT', zlib.compress(bytes(raw), 9))
+        + _png_chunk(b'IEND', b'')
+    )
@@ -0,0 +1,219 @@
+"""Ranked full-text search over announcements and classes.
+
+Announcements are searched by title and content, classes by subject and
+description, always within a given set of classes (the ones the user teaches
+or is enrolled in). How depends on the database:
+
+- SQLite: FTS5 tables (``professor_announcement_fts``, ``professor_class_fts``)
+  kept up to date by triggers on the base tables, so ``bulk_create()`` and
+  ``update()`` are indexed too. The tables are contentless; besides the text
+  they index a ``scope`` token (``c<class id>``) so that the class filter is
+  part of the full-text match and only the user's classes are ranked, however
+  many years of announcements the table holds. Words are stemmed (Porter)
+  and results ranked with BM25, title and subject counting more.
+- PostgreSQL: GIN indexes over ``to_tsvector('english', ...)`` expressions,
+  ranked with ``ts_rank`` over a vector weighting title and subject higher.
+- Anything else, or SQLite without FTS5: ``icontains`` on each search term,
+  newest first.
+
+``install`` creates the tables, triggers and indexes. It runs after every
+``migrate`` (see ``apps.py``) because SQLite drops a table's triggers when a
+migration rebuilds the table; whenever it has to recreate them it also
+rebuilds the FTS table from the base table.
+
+Every word of the query must match, as a prefix, so results narrow down as
+the user types.
+"""
+import re
+
+from django.db import DatabaseError, connections, router
+from django.db.models import Q
+
+from .models import Announcement, Class
+
+SEARCH_LIMIT = 20
+# Words of a query beyond this are ignored
+MAX_TERMS = 8
+
+_WORD = re.compile(r'\w+')
+
+# table -> (base table, indexed expressions, columns whose update re-indexes a row).
+# The last expression is the scope token: announcements belong to their class,
+# classes to themselves.
+_FTS_TABLES = {
+    'professor_announcement_fts': (
+        'professor_announcement',
+        ("{row}.title", "{row}.content", "'c' || {row}.class_obj_id"),
+        'title, content, class_obj_id',
+    ),
+    'professor_class_fts': (
+        'professor_class',
+        ("{row}.subject", "coalesce({row}.description, '')", "'c' || {row}.id"),
+        'subject, description',
+    ),
+}
+
+# BM25 column weights: title or subject, then content or description, then scope
+_FTS_WEIGHTS = '10.0, 1.0, 0.0'
+
+# The WHERE clauses below must use these exact expressions for the GIN indexes to apply
+_PG_VECTORS = {
+    'professor_announcement': "to_tsvector('english', title || ' ' || content)",
+    'professor_class': "to_tsvector('english', subject || ' ' || coalesce(description, ''))",
+}
+_PG_RANK_VECTORS = {
+    'professor_announcement': (
+        "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', content), 'B')"
+    ),
+    'professor_class': (
+        "setweight(to_tsvector('english', subject), 'A') "
+        "|| setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    ),
+}
+
+# (alias, database name) -> whether the FTS5 tables exist
+_fts_available = {}
+
+
+def _fts_sql(table):
+    """Trigger definitions by name, plus the statements rebuilding the FTS table"""
+    base, expressions, update_columns = _FTS_TABLES[table]
+
+    def values(row):
+        return ', '.join([f'{row}.id'] + [expression.format(row=row) for expression in expressions])
+
+    columns = 'rowid, c1, c2, scope'
+    # A contentless table forgets a row only when given the exact values it was indexed with
+    delete = f"INSERT INTO {table}({table}, {columns}) VALUES ('delete', {values('old')});"
+    insert = f'INSERT INTO {table}({columns}) VALUES ({values("new")});'
+    return {
+        f'{table}_ai': f'CREATE TRIGGER {table}_ai AFTER INSERT ON {base} BEGIN {insert} END',
+        f'{table}_ad': f'CREATE TRIGGER {table}_ad AFTER DELETE ON {base} BEGIN {delete} END',
+        f'{table}_au': (
+            f'CREATE TRIGGER {table}_au AFTER UPDATE OF {update_columns} ON {base} '
+            f'BEGIN {delete} {insert} END'
+        ),
+        'rebuild': (
+            f"INSERT INTO {table}({table}) VALUES ('delete-all')",
+            f'INSERT INTO {table}({columns}) SELECT {values(base)} FROM {base}',
+        ),
+    }
+
+
+def _install_sqlite(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        for table in _FTS_TABLES:
+            statements = _fts_sql(table)
+            rebuild = statements.pop('rebuild')
+            missing = [name for name in statements if name not in existing]
+            if table not in existing:
+                try:
+                    cursor.execute(
+                        f"CREATE VIRTUAL TABLE {table} USING fts5(c1, c2, scope, content='', "
+                        f"tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"
+                    )
+                except DatabaseError:
+                    # SQLite built without FTS5: search falls back to icontains
+                    return
+            elif not missing:
+                continue
+            for name in missing:
+                cursor.execute(statements[name])
+            for statement in rebuild:
+                cursor.execute(statement)
+
+
+def _install_postgresql(connection):
+    with connection.cursor() as cursor:
+        for table, vector in _PG_VECTORS.items():
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_search ON {table} USING GIN (({vector}))')
+
+
+def install(using='default', **kwargs):
+    """Create the search tables, triggers and indexes that are missing (``post_migrate`` handler)"""
+    if not router.allow_migrate_model(using, Announcement):
+        # A replica gets them through replication, along with the tables they index
+        return
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        _install_sqlite(connection)
+    elif connection.vendor == 'postgresql':
+        _install_postgresql(connection)
+    _fts_available.pop((using, connection.settings_dict['NAME']), None)
+
+
+def _backend(using):
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        key = (using, connection.settings_dict['NAME'])
+        if key not in _fts_available:
+            _fts_available[key] = set(_FTS_TABLES) <= set(connection.introspection.table_names())
+        if _fts_available[key]:
+            return 'fts5'
+    return None
+
+
+def _ranked_ids(using, backend, table, base, terms, class_ids, limit):
+    with connections[using].cursor() as cursor:
+        if backend == 'fts5':
+            scopes = ' OR '.join(f'c{int(class_id)}' for class_id in class_ids)
+            words = ' '.join(f'"{term}"*' for term in terms)
+            cursor.execute(
+                f'SELECT rowid FROM {table} WHERE {table} MATCH %s '
+                f'ORDER BY bm25({table}, {_FTS_WEIGHTS}) LIMIT %s',
+                [f'scope:({scopes}) AND {{c1 c2}}:({words})', limit],
+            )
+        else:
+            scope_column = 'class_obj_id' if base == 'professor_announcement' else 'id'
+            query = ' & '.join(f'{term}:*' for term in terms)
+            cursor.execute(
+                f"SELECT id FROM {base} WHERE {scope_column} = ANY(%s) "
+                f"AND {_PG_VECTORS[base]} @@ to_tsquery('english', %s) "
+                f"ORDER BY ts_rank({_PG_RANK_VECTORS[base]}, to_tsquery('english', %s)) DESC, id DESC LIMIT %s",
+                [list(class_ids), query, query, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search(model, table, fields, scope_field, query, class_ids, limit):
+    terms = _WORD.findall(query.lower())[:MAX_TERMS]
+    class_ids = list(class_ids)
+    if not terms or not class_ids:
+        return []
+    using = router.db_for_read(model)
+    queryset = model.objects.using(using)
+    if model is Announcement:
+        queryset = queryset.select_related('class_obj')
+
+    backend = _backend(using)
+    if backend is None:
+        for term in terms:
+            match = Q()
+            for field in fields:
+                match |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(match)
+        return list(queryset.filter(**{f'{scope_field}__in': class_ids}).order_by('-created_at')[:limit])
+
+    ids = _ranked_ids(using, backend, table, model._meta.db_table, terms, class_ids, limit)
+    found = queryset.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def search_announcements(query, class_ids, limit=SEARCH_LIMIT):
+    """Announcements of ``class_ids`` matching ``query``, best first"""
+    return _search(
+        Announcement, 'professor_announcement_fts', ('title', 'content'), 'class_obj_id',
+        query, class_ids, limit,
+    )
+
+
+def search_classes(query, class_ids, limit=SEARCH_LIMIT):
+    """Classes among ``class_ids`` whose subject or description match ``query``, best first"""
+    return _search(
+        Class, 'professor_class_fts', ('subject', 'description'), 'id',
+        query, class_ids, limit,
+    )
@@ -0,0 +1,80 @@
+"""Signal handlers for the professor models.
+
+Connected in ``ProfessorConfig.ready()``.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from attendance import metrics
+from . import cache
+from .models import (
+    Class, Schedule, ExtraClass, Announcement, AttendanceRecord, AttendanceEntry, StudentClassEnrollment, Term,
+)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def count_opened_session(sender, instance, created, **kwargs):
+    """Count sessions opened by the scanner (canceled placeholders are not openings)"""
+    if created and not instance.canceled:
+        metrics.inc('attendance_sessions_opened_total')
+
+
+@receiver(post_save, sender=Class)
+@receiver(post_delete, sender=Class)
+def invalidate_class(sender, instance, **kwargs):
+    cache.bump('class', instance.id)
+    cache.bump('user', instance.professor_id)
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_save, sender=ExtraClass)
+@receiver(post_delete, sender=ExtraClass)
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def invalidate_class_data(sender, instance, **kwargs):
+    cache.bump('class', instance.class_obj_id)
+
+
+def _record_class_id(record_id):
+    return AttendanceRecord.objects.filter(id=record_id).values_list('class_obj_id', flat=True).first()
+
+
+@receiver(post_save, sender=AttendanceEntry)
+@receiver(post_delete, sender=AttendanceEntry)
+def invalidate_attendance(sender, instance, **kwargs):
+    if AttendanceEntry.attendance_record.is_cached(instance):
+        class_id = instance.attendance_record.class_obj_id
+    else:
+        # Cascade deletes load entries without their session
+        class_id = _record_class_id(instance.attendance_record_id)
+    if class_id is not None:
+        cache.bump('class', class_id)
+
+
+@receiver(post_save, sender=StudentClassEnrollment)
+@receiver(post_delete, sender=StudentClassEnrollment)
+def invalidate_enrollment(sender, instance, **kwargs):
+    cache.bump('class', instance.class_obj_id)
+    cache.bump('roster', instance.class_obj_id)
+    cache.bump('user', instance.student_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_names(sender, instance, created, update_fields, **kwargs):
+    """Rosters show student names and calendar feeds the user's; logins only touch last_login"""
+    if created or (update_fields and not {'first_name', 'last_name', 'username'} & set(update_fields)):
+        return
+    cache.bump('user', instance.id)
+    cache.bump_many(
+        'roster', StudentClassEnrollment.objects.filter(student=instance).values_list('class_obj_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Term)
+@receiver(post_delete, sender=Term)
+def invalidate_terms(sender, instance, **kwargs):
+    cache.bump(*cache.TERMS)
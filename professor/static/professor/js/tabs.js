@@ -0,0 +1,55 @@
+// Class detail tabs: the page renders the active tab, the others are fetched
+// from the fragment URL on the .tab-content element when their link is
+// clicked. Links keep working as plain ?tab= links if anything fails.
+
+// Tab templates run their setup through this instead of DOMContentLoaded,
+// so it also runs when the tab is inserted after the page has loaded.
+function onTabReady(fn) {
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', fn);
+    } else {
+        fn();
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+    const container = document.querySelector('.tab-content[data-fragment-url]');
+    if (!container || !window.fetch) return;
+    const links = document.querySelectorAll('.tab-trigger[data-tab]');
+
+    function showTab(tab, href, push) {
+        fetch(container.dataset.fragmentUrl.replace('__tab__', tab), {credentials: 'same-origin'})
+            .then(function (response) {
+                if (!response.ok) throw new Error(response.status);
+                return response.text();
+            })
+            .then(function (html) {
+                container.innerHTML = html;
+                // Scripts inserted through innerHTML do not run; replace them with live ones
+                container.querySelectorAll('script').forEach(function (old) {
+                    const script = document.createElement('script');
+                    script.textContent = old.textContent;
+                    old.replaceWith(script);
+                });
+                links.forEach(function (link) {
+                    link.classList.toggle('active', link.dataset.tab === tab);
+                });
+                if (push) history.pushState({tab: tab}, '', href);
+            })
+            .catch(function () {
+                if (href) window.location.href = href;
+            });
+    }
+
+    links.forEach(function (link) {
+        link.addEventListener('click', function (event) {
+            if (event.button !== 0 || event.metaKey || event.ctrlKey || event.shiftKey || event.altKey) return;
+            event.preventDefault();
+            if (!link.classList.contains('active')) showTab(link.dataset.tab, link.href, true);
+        });
+    });
+
+    window.addEventListener('popstate', function () {
+        showTab(new URLSearchParams(window.location.search).get('tab') || 'overview', null, false);
+    });
+});
@@ -0,0 +1,213 @@
+"""Class detail tabs rendered as cached HTML fragments.
+
+``class_detail`` renders only the active tab, and the other tabs are fetched
+from the ``class_tab`` fragment endpoints when clicked (``js/tabs.js``). Each
+tab has its own context builder, so a request only runs the queries of the
+tab it shows.
+
+Rendered fragments are cached (``professor/cache.py``) under the class's data
+version, plus the roster version for tabs showing student names, the date for
+tabs that mark past/today items, and the student for per-student tabs.
+Fragments are rendered with a placeholder in place of the CSRF token, which
+is swapped for the requesting user's token on the way out.
+
+The attendance tabs read the hot tables, listing the class's archived terms
+(see ``archive.py``); with ``?term=<id>`` they show that archived term
+instead, from the archive tables.
+"""
+from datetime import date
+
+from django.db.models import Avg, Count, Prefetch, Q
+from django.middleware.csrf import get_token
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import cache, lateness
+from .models import (
+    AttendanceRecord, AttendanceEntry, ArchivedAttendanceRecord, ArchivedAttendanceEntry, AttendanceSummary, Term,
+)
+
+CSRF_PLACEHOLDER = 'csrf-token-placeholder'
+
+
+def _professor_overview(class_obj):
+    return dict(cache.class_stats(class_obj), schedules=class_obj.schedules.all())
+
+
+def _professor_schedule(class_obj):
+    return {
+        'schedules': class_obj.schedules.all(),
+        'extra_classes': class_obj.extra_classes.all(),
+        'today': date.today(),
+    }
+
+
+def _professor_announcements(class_obj):
+    return {'announcements': class_obj.announcements.all()}
+
+
+def requested_term(request):
+    """The archived term asked for with ``?term=<id>``, or ``None`` for the current records"""
+    term_id = request.GET.get('term', '')
+    if not term_id.isdigit():
+        return None
+    return get_object_or_404(Term, id=term_id, archived_at__isnull=False)
+
+
+def _archived_terms(class_obj):
+    return Term.objects.filter(attendance_summaries__class_obj=class_obj).distinct()
+
+
+_LATE = Q(lateness__in=[lateness.LATE, lateness.VERY_LATE])
+# Aggregates over attendance entries, counted on the lateness indexes
+LATENESS_TOTALS = {
+    'scans': Count('id'),
+    'late': Count('id', filter=_LATE),
+    'very_late': Count('id', filter=Q(lateness=lateness.VERY_LATE)),
+    'average_minutes_late': Avg('minutes_late', filter=_LATE),
+}
+
+# Students listed in the professor's lateness table
+LATE_STUDENTS_SHOWN = 10
+
+
+def _professor_attendance(class_obj, term=None):
+    if term is None:
+        records = class_obj.attendance_records
+        entries = AttendanceEntry.objects
+        class_entries = entries.filter(attendance_record__class_obj=class_obj)
+    else:
+        records = ArchivedAttendanceRecord.objects.filter(class_obj=class_obj, term=term)
+        entries = ArchivedAttendanceEntry.objects
+        class_entries = entries.filter(attendance_record__class_obj=class_obj, attendance_record__term=term)
+    late_students = (
+        class_entries.values('student_id', 'student__first_name', 'student__last_name', 'student__username')
+        .annotate(**LATENESS_TOTALS).filter(late__gt=0).order_by('-late', '-very_late', 'student__username')
+    )
+    return {
+        'attendance_records': records.prefetch_related(
+            Prefetch('entries', queryset=entries.select_related('student'))
+        ),
+        'lateness': class_entries.aggregate(**LATENESS_TOTALS),
+        'late_students': late_students[:LATE_STUDENTS_SHOWN],
+        'archived_terms': _archived_terms(class_obj),
+        'term': term,
+    }
+
+
+def _professor_students(class_obj):
+    return {'enrolled_students': class_obj.enrolled_students.select_related('student')}
+
+
+# tab -> (context builder, depends on student names, depends on today's date)
+PROFESSOR_TABS = {
+    'overview': (_professor_overview, False, False),
+    'schedule': (_professor_schedule, False, True),
+    'announcements': (_professor_announcements, False, False),
+    'attendance': (_professor_attendance, True, False),
+    'students': (_professor_students, True, False),
+}
+
+
+def _student_records(class_obj, student_id, term=None):
+    model = AttendanceRecord if term is None else ArchivedAttendanceRecord
+    records = model.objects.filter(class_obj=class_obj, entries__student_id=student_id)
+    if term is not None:
+        records = records.filter(term=term)
+    return records.distinct().order_by('-date')
+
+
+def _student_overview(class_obj, student_id):
+    attendance_records = list(_student_records(class_obj, student_id).prefetch_related(
+        Prefetch('entries', queryset=AttendanceEntry.objects.filter(student_id=student_id), to_attr='own_entries')
+    ))
+    return {
+        'schedules': class_obj.schedules.all(),
+        'announcements': class_obj.announcements.all(),
+        'attendance_records': attendance_records,
+        'total_attendance': len(attendance_records),
+        'lateness': AttendanceEntry.objects.filter(
+            student_id=student_id, attendance_record__class_obj=class_obj
+        ).aggregate(**LATENESS_TOTALS),
+    }
+
+
+def _student_schedule(class_obj, student_id):
+    return {'schedules': class_obj.schedules.all()}
+
+
+def _student_announcements(class_obj, student_id):
+    return {'announcements': class_obj.announcements.all()}
+
+
+def _student_attendance(class_obj, student_id, term=None):
+    entries = AttendanceEntry if term is None else ArchivedAttendanceEntry
+    return {
+        'attendance_records': _student_records(class_obj, student_id, term).prefetch_related(
+            Prefetch('entries', queryset=entries.objects.filter(student_id=student_id))
+        ),
+        'student_id': student_id,
+        'summaries': AttendanceSummary.objects.filter(
+            class_obj=class_obj, student_id=student_id
+        ).select_related('term'),
+        'term': term,
+    }
+
+
+# tab -> (context builder, differs per student)
+STUDENT_TABS = {
+    'overview': (_student_overview, True),
+    'schedule': (_student_schedule, False),
+    'announcements': (_student_announcements, False),
+    'attendance': (_student_attendance, True),
+}
+
+# Tabs whose builder takes a ``term`` and can show an archived one
+ARCHIVED_TABS = {'attendance'}
+
+
+def _render(request, name, scopes, template_name, build_context):
+    def compute():
+        context = build_context()
+        context['csrf_token'] = CSRF_PLACEHOLDER
+        return render_to_string(template_name, context)
+    html = cache.cached(name, scopes, compute)
+    if CSRF_PLACEHOLDER in html:
+        html = html.replace(CSRF_PLACEHOLDER, get_token(request))
+    return mark_safe(html)
+
+
+def _term_args(tab, term):
+    """Extra builder arguments and cache key suffix for an archived ``term``"""
+    if term is None or tab not in ARCHIVED_TABS:
+        return {}, ''
+    return {'term': term}, f':term{term.id}'
+
+
+def render_professor_tab(request, class_obj, tab, term=None):
+    builder, uses_roster, dated = PROFESSOR_TABS[tab]
+    term_args, suffix = _term_args(tab, term)
+    name = f'tab:professor:{class_obj.id}:{tab}{suffix}'
+    scopes = [('class', class_obj.id)]
+    if uses_roster:
+        scopes.append(('roster', class_obj.id))
+    if dated:
+        name += f':{date.today().isoformat()}'
+    return _render(
+        request, name, scopes, f'professor/tabs/{tab}.html',
+        lambda: dict(builder(class_obj, **term_args), class_obj=class_obj),
+    )
+
+
+def render_student_tab(request, class_obj, tab, term=None):
+    builder, per_student = STUDENT_TABS[tab]
+    student_id = request.user.id
+    term_args, suffix = _term_args(tab, term)
+    name = f'tab:student:{class_obj.id}:{tab}{suffix}'
+    if per_student:
+        name += f':{student_id}'
+    return _render(
+        request, name, [('class', class_obj.id)], f'student/tabs/{tab}.html',
+        lambda: dict(builder(class_obj, student_id, **term_args), class_obj=class_obj),
+    )
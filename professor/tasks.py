@@ -0,0 +1,30 @@
+"""Background jobs of the professor app (see ``jobs/queue.py``)."""
+from jobs.queue import task
+
+from . import archive, purge
+from .models import Announcement, Term
+
+
+@task(priority=10)
+def post_announcement(class_id, title, content):
+    """Post an announcement to a class on behalf of a request that queued it"""
+    Announcement.objects.create(class_obj_id=class_id, title=title, content=content)
+
+
+@task(max_attempts=5, atomic=False)
+def purge_class(class_id):
+    """Delete a class hidden by ``purge.delete_classes``, in batches"""
+    return {'deleted': purge.purge_class(class_id)}
+
+
+@task(max_attempts=5, atomic=False)
+def purge_user(user_id):
+    """Delete a user deactivated by ``purge.delete_users``, in batches"""
+    return {'deleted': purge.purge_user(user_id)}
+
+
+@task(max_attempts=1, atomic=False)
+def archive_term(term_id):
+    """Archive a term's sessions (see ``archive.py``)"""
+    sessions, entries, summaries = archive.archive_term(Term.objects.get(id=term_id))
+    return {'sessions': sessions, 'entries': entries, 'summaries': summaries}
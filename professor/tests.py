@@ -0,0 +1,495 @@
+import io
+import json
+import multiprocessing
+import os
+import struct
+import tempfile
+import unittest
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import grid, ical, qr, timetable
+from .management.commands.stress_scans import create_scan_class, run_scans
+from .models import AttendanceRecord, AttendanceEntry, Class, ExtraClass, Schedule, StudentClassEnrollment, Term
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Checks the SQLite production profile')
+@unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'Needs the fork start method')
+class ConcurrentScanTests(TransactionTestCase):
+    """``process_qr_scan``, sync and async, hammered from several processes on the production SQLite profile"""
+
+    PROCESSES = 6
+    STUDENTS = 15
+    ROUNDS = 2
+
+    def scan(self, use_async):
+        with override_settings(SQLITE_PRAGMAS=settings.SQLITE_PRODUCTION_PRAGMAS, SQLITE_IMMEDIATE_WRITES=True):
+            # Reopen with the profile's pragmas before the processes fork
+            connections.close_all()
+            professor, class_obj, students = create_scan_class('test', self.STUDENTS)
+            names = [student.get_full_name() for student in students]
+            outcomes, errors, _ = run_scans(professor, class_obj, names, self.PROCESSES, self.ROUNDS, use_async)
+            connections.close_all()
+
+        self.assertEqual(errors, Counter())
+        self.assertEqual(sum(outcomes.values()), self.PROCESSES * self.STUDENTS * self.ROUNDS)
+        self.assertEqual(outcomes['marked'], self.STUDENTS)
+        self.assertEqual(AttendanceRecord.objects.filter(class_obj=class_obj).count(), 1)
+        entries = AttendanceEntry.objects.filter(attendance_record__class_obj=class_obj)
+        self.assertEqual(sorted(entries.values_list('student_id', flat=True)), sorted(s.id for s in students))
+
+    def test_concurrent_scans_never_hit_a_locked_database(self):
+        self.scan(use_async=False)
+
+    def test_concurrent_async_scans_never_hit_a_locked_database(self):
+        self.scan(use_async=True)
+
+
+PHYSICS = ('jdoe', 'physics 1', 'a')
+
+
+def _slot(start, end, source='line 2', day='Monday', on=None, class_key=PHYSICS):
+    return timetable.Slot(
+        class_key, day, on, time(*start), time(*end), '', source,
+    )
+
+
+def _planned(schedules=(), extra_classes=()):
+    planned = timetable.PlannedClass('jdoe', 'Physics 1', 'A')
+    planned.schedules = list(schedules)
+    planned.extra_classes = list(extra_classes)
+    return planned
+
+
+class FindConflictsTests(SimpleTestCase):
+    def sources(self, conflicts):
+        return sorted((reason, a.source, b.source) for reason, a, b in conflicts)
+
+    def test_overlapping_weekly_schedules(self):
+        planned = _planned([_slot((9, 0), (10, 30), 'line 2'), _slot((10, 0), (11, 0), 'line 3')])
+        self.assertEqual(
+            self.sources(timetable.find_conflicts([planned])), [('weekly schedules overlap', 'line 2', 'line 3')]
+        )
+
+    def test_adjacent_and_separate_slots_do_not_conflict(self):
+        planned = _planned([
+            _slot((9, 0), (10, 0), 'line 2'),
+            _slot((10, 0), (11, 0), 'line 3'),
+            _slot((9, 0), (10, 0), 'line 4', day='Tuesday'),
+            _slot((9, 0), (10, 0), 'line 5', class_key=('jdoe', 'chemistry', '')),
+        ])
+        self.assertEqual(timetable.find_conflicts([planned]), [])
+
+    def test_existing_slots_only_conflict_with_imported_ones(self):
+        existing = [_slot((8, 0), (12, 0), 'existing schedule #1'), _slot((9, 0), (11, 0), 'existing schedule #2')]
+        self.assertEqual(timetable.find_conflicts([_planned()], existing), [])
+        planned = _planned([_slot((10, 0), (10, 30), 'line 2')])
+        self.assertEqual(
+            self.sources(timetable.find_conflicts([planned], existing)),
+            [('weekly schedules overlap', 'existing schedule #1', 'line 2')],
+        )
+
+    def test_every_conflicting_slot_is_reported(self):
+        slots = [
+            _slot((8, 0), (12, 0), 'line 2'),
+            _slot((9, 0), (10, 0), 'line 3'),
+            _slot((10, 0), (11, 0), 'line 4'),
+            _slot((11, 30), (13, 0), 'line 5'),
+            _slot((12, 30), (14, 0), 'line 6'),
+            _slot((14, 0), (15, 0), 'line 7'),
+        ]
+        reported = {slot.source for _, a, b in timetable.find_conflicts([_planned(slots)]) for slot in (a, b)}
+        self.assertEqual(reported, {'line 2', 'line 3', 'line 4', 'line 5', 'line 6'})
+
+    def test_extra_class_against_the_weekly_schedule_of_its_weekday(self):
+        monday = date(2026, 3, 2)
+        planned = _planned(
+            [_slot((9, 0), (10, 0), 'line 2')],
+            [
+                _slot((9, 30), (10, 30), 'line 3', on=monday),
+                _slot((9, 30), (10, 30), 'line 4', day='Tuesday', on=date(2026, 3, 3)),
+            ],
+        )
+        self.assertEqual(
+            self.sources(timetable.find_conflicts([planned])), [('extra class overlaps', 'line 2', 'line 3')]
+        )
+
+    def test_extra_classes_on_the_same_date(self):
+        monday = date(2026, 3, 2)
+        existing_extras = [_slot((13, 0), (14, 0), 'existing extra class #1', on=monday)]
+        planned = _planned(extra_classes=[
+            _slot((13, 30), (15, 0), 'line 2', on=monday),
+            _slot((13, 30), (15, 0), 'line 3', on=date(2026, 3, 9)),
+        ])
+        self.assertEqual(
+            self.sources(timetable.find_conflicts([planned], (), existing_extras)),
+            [('extra class overlaps', 'existing extra class #1', 'line 2')],
+        )
+
+
+class ParseTimetableTests(SimpleTestCase):
+    def test_csv_without_the_required_columns(self):
+        with self.assertRaisesMessage(timetable.TimetableError, 'missing columns: professor'):
+            timetable.parse_csv(io.StringIO('subject,day\nPhysics,Monday\n'))
+
+    def test_csv_row_errors(self):
+        classes, errors = timetable.parse_csv(io.StringIO(
+            'professor,subject,section,room,day,date,start_time,end_time\n'
+            'jdoe,Physics 1,A,301,Monday,,09:00,10:00\n'
+            'jdoe,Physics 1,A,302,,,,\n'
+            'jdoe,Physics 1,A,,Someday,,09:00,10:00\n'
+            'jdoe,Physics 1,A,,Tuesday,,10:00,09:00\n'
+            'jdoe,Physics 1,A,,,2026-02-30,09:00,10:00\n'
+            ',Chemistry,,,Monday,,09:00,10:00\n'
+        ))
+        self.assertEqual(len(classes), 1)
+        self.assertEqual(len(classes[0].schedules), 1)
+        self.assertEqual([error.split(':')[0] for error in errors], [f'line {n}' for n in range(3, 8)])
+        self.assertIn('room "302" differs from "301"', errors[0])
+        self.assertIn('unknown day "Someday"', errors[1])
+        self.assertIn('start time must be before end time', errors[2])
+        self.assertIn('invalid date or time', errors[3])
+        self.assertIn('professor and subject are required', errors[4])
+
+    def test_json_errors(self):
+        with self.assertRaisesMessage(timetable.TimetableError, 'invalid JSON'):
+            timetable.parse_json(io.StringIO('[{'))
+        with self.assertRaisesMessage(timetable.TimetableError, 'expected a list of classes'):
+            timetable.parse_json(io.StringIO('{}'))
+        classes, errors = timetable.parse_json(io.StringIO(
+            '[1, {"professor": "jdoe", "subject": "Physics 1", '
+            '"schedules": [{"day": "Monday", "start_time": "09:00", "end_time": "10:00"}, "x"], '
+            '"extra_classes": [{"start_time": "13:00", "end_time": "14:00"}]}]'
+        ))
+        self.assertEqual(len(classes[0].schedules), 1)
+        self.assertEqual(errors, [
+            'classes[0]: expected an object',
+            'classes[1].schedules[1]: expected an object',
+            'classes[1].extra_classes[0]: date is required',
+        ])
+
+
+class ImportTimetableCommandTests(TestCase):
+    CSV = (
+        'professor,subject,section,day,date,start_time,end_time,reason\n'
+        'jdoe,Physics 1,A,Monday,,09:00,10:30,\n'
+        'jdoe,Physics 1,A,,2026-03-03,13:00,14:00,Review\n'
+    )
+
+    def setUp(self):
+        professor = User.objects.create_user('jdoe')
+        professor.groups.add(Group.objects.get_or_create(name='professor')[0])
+
+    def import_timetable(self, content, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        call_command('import_timetable', f.name, *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_dry_run_writes_nothing(self):
+        self.import_timetable(self.CSV, '--dry-run')
+        self.assertFalse(Class.all_objects.exists())
+        self.assertFalse(Schedule.objects.exists())
+
+    def test_conflicts_write_nothing(self):
+        with self.assertRaisesMessage(CommandError, '0 invalid rows and 1 conflicts; nothing imported'):
+            self.import_timetable(self.CSV + 'jdoe,Physics 1,A,Monday,,10:00,11:00,\n')
+        self.assertFalse(Class.all_objects.exists())
+
+    def test_import(self):
+        self.import_timetable(self.CSV)
+        class_obj = Class.objects.get(subject='Physics 1', section='A')
+        self.assertEqual(list(class_obj.schedules.values_list('day', 'start_time')), [('Monday', time(9, 0))])
+        self.assertEqual(ExtraClass.objects.get(class_obj=class_obj).reason, 'Review')
+        # Importing again adds to the same class, and conflicts with what is there now
+        with self.assertRaisesMessage(CommandError, '2 conflicts'):
+            self.import_timetable(self.CSV)
+
+
+def _parse_ical(text):
+    """``(name, params, value)`` of each unfolded content line"""
+    lines = []
+    for line in text.replace('\r\n ', '').split('\r\n')[:-1]:
+        head, value = line.split(':', 1)
+        name, *params = head.split(';')
+        lines.append((name, dict(param.split('=', 1) for param in params), value))
+    return lines
+
+
+class IcalFeedTests(TestCase):
+    """``build_feed`` output read back the way a calendar app would"""
+
+    def setUp(self):
+        professor = User.objects.create_user('jdoe')
+        # Long and not ASCII, so the summary is folded inside a UTF-8 sequence
+        self.class_obj = Class.objects.create(professor=professor, subject='Física, ñ; ' * 12, room='Room 101')
+        Class.objects.filter(id=self.class_obj.id).update(created_at=timezone.make_aware(datetime(2026, 1, 2, 8)))
+        Schedule.objects.create(class_obj=self.class_obj, day='Monday', start_time=time(9), end_time=time(10, 30))
+        Term.objects.create(name='2nd Semester', start_date=date(2026, 1, 5), end_date=date(2026, 5, 31))
+        AttendanceRecord.objects.create(
+            class_obj=self.class_obj, date=timezone.make_aware(datetime(2026, 1, 12, 9)),
+            schedule_time='09:00 - 10:30', canceled=True,
+        )
+
+    def feed(self):
+        return ical.build_feed(
+            'Classes', Schedule.objects.select_related('class_obj'), [],
+            AttendanceRecord.objects.filter(canceled=True), Term.objects.order_by('start_date'),
+        )
+
+    def test_lines_are_folded_at_75_octets(self):
+        text = self.feed()
+        self.assertTrue(text.endswith('\r\n'))
+        self.assertLessEqual(max(len(line.encode()) for line in text.split('\r\n')), 75)
+        summary = next(value for name, _, value in _parse_ical(text) if name == 'SUMMARY')
+        unescaped = summary.replace('\\,', ',').replace('\\;', ';')
+        self.assertEqual(unescaped, str(self.class_obj))
+
+    def test_times_round_trip(self):
+        lines = _parse_ical(self.feed())
+        zone = lines[lines.index(('BEGIN', {}, 'VTIMEZONE')):lines.index(('END', {}, 'VTIMEZONE')) + 1]
+        tzid = next(value for name, _, value in zone if name == 'TZID')
+        self.assertEqual(tzid, settings.TIME_ZONE)
+        offsets = {value for name, _, value in zone if name in ('TZOFFSETFROM', 'TZOFFSETTO')}
+        self.assertEqual(offsets, {'+0800'})
+        tz = dt_timezone(timedelta(hours=8))
+
+        fields = {name: (params, value) for name, params, value in lines[lines.index(('BEGIN', {}, 'VEVENT')):]}
+        params, start = fields['DTSTART']
+        self.assertEqual(params, {'TZID': tzid})
+        self.assertEqual(
+            datetime.strptime(start, '%Y%m%dT%H%M%S').replace(tzinfo=tz), datetime(2026, 1, 5, 9, tzinfo=tz)
+        )
+
+        rule = dict(part.split('=') for part in fields['RRULE'][1].split(';'))
+        self.assertEqual((rule['FREQ'], rule['BYDAY']), ('WEEKLY', 'MO'))
+        until = datetime.strptime(rule['UNTIL'], '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+        self.assertEqual(until, datetime(2026, 5, 31, 23, 59, 59, tzinfo=tz))
+
+        params, exdate = fields['EXDATE']
+        self.assertEqual(params, {'TZID': tzid})
+        self.assertEqual(
+            datetime.strptime(exdate, '%Y%m%dT%H%M%S').replace(tzinfo=tz), datetime(2026, 1, 12, 9, tzinfo=tz)
+        )
+
+
+# Format information (level M, mask 0-7) and version information (versions 7-10)
+# as listed in ISO/IEC 18004 Annex C and D
+FORMAT_BITS_M = (0x5412, 0x5125, 0x5E7C, 0x5B4B, 0x45F9, 0x40CE, 0x4F97, 0x4AA0)
+VERSION_BITS = {7: 0x07C94, 8: 0x085BC, 9: 0x09A99, 10: 0x0A4D3}
+
+
+def _format_bits(modules):
+    """Both copies of the format information, most significant bit first"""
+    size = len(modules)
+    first = [modules[8][x] for x in (0, 1, 2, 3, 4, 5, 7, 8)] + [modules[y][8] for y in (7, 5, 4, 3, 2, 1, 0)]
+    second = [modules[y][8] for y in range(size - 1, size - 8, -1)] + [modules[8][x] for x in range(size - 8, size)]
+    return [int(''.join('1' if dark else '0' for dark in bits), 2) for bits in (first, second)]
+
+
+def _version_bits(modules):
+    """Both copies of the version information"""
+    size = len(modules)
+    top_right = sum(modules[i // 3][size - 11 + i % 3] << i for i in range(18))
+    bottom_left = sum(modules[size - 11 + i % 3][i // 3] << i for i in range(18))
+    return [top_right, bottom_left]
+
+
+def _read_version_1(modules, mask):
+    """The codewords of a version 1 symbol, read in placement order and unmasked"""
+    def is_function(x, y):
+        return x == 6 or y == 6 or (x <= 8 and y <= 8) or (x >= 13 and y <= 8) or (x <= 8 and y >= 13)
+
+    bits = []
+    # Column pairs right to left, skipping the timing column, alternately upwards and downwards
+    for pair, right in enumerate([20, 18, 16, 14, 12, 10, 8, 5, 3, 1]):
+        upward = pair % 2 == 0
+        for row in range(21):
+            y = 20 - row if upward else row
+            for x in (right, right - 1):
+                if not is_function(x, y):
+                    bits.append(modules[y][x] ^ qr._MASKS[mask](x, y))
+    return [int(''.join(map(str, map(int, bits[i:i + 8]))), 2) for i in range(0, len(bits) - 7, 8)]
+
+
+class QrEncodeTests(SimpleTestCase):
+    """``qr.encode`` against the values of the standard"""
+
+    def test_error_correction(self):
+        # The worked examples of ISO/IEC 18004 Annex I and of the usual tutorials (version 1-M)
+        divisor = qr._rs_divisor(10)
+        self.assertEqual(
+            qr._rs_remainder([16, 32, 12, 86, 97, 128, 236, 17, 236, 17, 236, 17, 236, 17, 236, 17], divisor),
+            [165, 36, 212, 193, 237, 54, 199, 135, 44, 85],
+        )
+        self.assertEqual(
+            qr._rs_remainder([32, 91, 11, 120, 209, 114, 220, 77, 67, 64, 236, 17, 236, 17, 236, 17], divisor),
+            [196, 35, 39, 119, 235, 215, 231, 226, 93, 23],
+        )
+
+    def test_smallest_version(self):
+        # Byte mode capacities at level M: 14, 26, 122 and 213 bytes for versions 1, 2, 7 and 10
+        for length, version in [(14, 1), (15, 2), (26, 2), (27, 3), (122, 7), (123, 8), (213, 10), (214, 11)]:
+            with self.subTest(length=length):
+                self.assertEqual(len(qr.encode('a' * length)), 17 + 4 * version)
+
+    def test_format_and_version_information(self):
+        for payload in ['Juan Dela Cruz', 'María José Ñañez', 'x' * 130, 'y' * 200]:
+            with self.subTest(payload=payload):
+                modules = qr.encode(payload)
+                first, second = _format_bits(modules)
+                self.assertEqual(first, second)
+                self.assertIn(first, FORMAT_BITS_M)
+                version = (len(modules) - 17) // 4
+                if version >= 7:
+                    self.assertEqual(_version_bits(modules), [VERSION_BITS[version]] * 2)
+                # The dark module
+                self.assertTrue(modules[len(modules) - 8][8])
+
+    def test_version_1_codewords(self):
+        payload = 'Juan Dela Cruz'.encode()
+        modules = qr.encode(payload)
+        mask = FORMAT_BITS_M.index(_format_bits(modules)[0])
+        codewords = _read_version_1(modules, mask)
+        self.assertEqual(len(codewords), 26)
+        data, ecc = codewords[:16], codewords[16:]
+        # Byte mode, 14 bytes, the payload, the terminator
+        bits = ''.join(f'{byte:08b}' for byte in data)
+        self.assertEqual(bits[:12], '010000001110')
+        self.assertEqual(bytes(int(bits[12 + i:20 + i], 2) for i in range(0, 8 * len(payload), 8)), payload)
+        self.assertEqual(bits[12 + 8 * len(payload):], '0000')
+        self.assertEqual(ecc, qr._rs_remainder(data, qr._rs_divisor(10)))
+
+    def test_images(self):
+        modules = qr.encode('Juan Dela Cruz')
+        self.assertIn('viewBox="0 0 29 29"', qr.to_svg(modules))
+        self.assertIn('viewBox="0 0 23 23"', qr.to_svg(modules, border=1))
+        png = qr.to_png(modules, scale=3, border=2)
+        self.assertEqual(png[:8], b'\x89PNG\r\n\x1a\n')
+        self.assertEqual(png[12:16], b'IHDR')
+        self.assertEqual(struct.unpack('>II', png[16:24]), (75, 75))
+
+
+class MyQrImageTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user('jdelacruz', first_name='Juan', last_name='Dela Cruz')
+        self.student.groups.add(Group.objects.get_or_create(name='student')[0])
+        self.client.force_login(self.student)
+
+    def image_url(self, fmt):
+        """The image URL of the student's QR page"""
+        response = self.client.get(reverse('student:my_qr_code'))
+        version = response.context['qr_version']
+        return reverse('student:my_qr_image', kwargs={'version': version, 'fmt': fmt})
+
+    def test_current_version(self):
+        url = self.image_url('png')
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_stale_version_redirects(self):
+        old = self.image_url('svg')
+        self.student.first_name = 'Juana'
+        self.student.save()
+        response = self.client.get(old)
+        current = self.image_url('svg')
+        self.assertNotEqual(current, old)
+        self.assertRedirects(response, current)
+        self.assertEqual(self.client.get(old.replace('.svg', '.gif')).status_code, 404)
+
+
+class AttendanceGridTests(TestCase):
+    """Saving diffs from the attendance grid (``grid.py``)"""
+
+    def setUp(self):
+        professor = User.objects.create_user('jdoe')
+        professor.groups.add(Group.objects.get_or_create(name='professor')[0])
+        self.client.force_login(professor)
+        self.class_obj = Class.objects.create(professor=professor, subject='Physics 1')
+        other_class = Class.objects.create(professor=professor, subject='Physics 2')
+        self.ana, self.ben, self.outsider = [
+            User.objects.create_user(username) for username in ('ana', 'ben', 'outsider')
+        ]
+        for student in (self.ana, self.ben):
+            StudentClassEnrollment.objects.create(student=student, class_obj=self.class_obj)
+        StudentClassEnrollment.objects.create(student=self.ana, class_obj=other_class)
+        self.first, self.second = [
+            AttendanceRecord.objects.create(class_obj=self.class_obj, schedule_time='09:00 - 10:30') for _ in range(2)
+        ]
+        self.canceled = AttendanceRecord.objects.create(
+            class_obj=self.class_obj, schedule_time='09:00 - 10:30', canceled=True,
+        )
+        self.other_session = AttendanceRecord.objects.create(class_obj=other_class, schedule_time='09:00 - 10:30')
+        AttendanceEntry.objects.create(attendance_record=self.other_session, student=self.ana)
+
+    def save(self, body):
+        return self.client.post(
+            reverse('professor:save_attendance_grid', args=[self.class_obj.id]),
+            body if isinstance(body, str) else json.dumps(body), content_type='application/json',
+        )
+
+    def marks(self):
+        response = self.client.get(reverse('professor:attendance_grid_data', args=[self.class_obj.id]))
+        data = response.json()
+        self.assertEqual([session['id'] for session in data['sessions']], [self.first.id, self.second.id])
+        return {student['username']: sorted(student['marks']) for student in data['students']}
+
+    def test_add_and_remove(self):
+        response = self.save({'add': [[self.ana.id, self.first.id], [self.ben.id, self.first.id]]})
+        self.assertEqual(response.json(), {'success': True, 'marked': 2, 'removed': 0})
+        self.assertEqual(self.marks(), {'ana': [self.first.id], 'ben': [self.first.id]})
+
+        # Adding a mark that exists is not an error
+        response = self.save({
+            'add': [[self.ana.id, self.first.id], [self.ana.id, self.second.id]],
+            'remove': [[self.ben.id, self.first.id], [self.ben.id, self.second.id]],
+        })
+        self.assertEqual(response.json(), {'success': True, 'marked': 2, 'removed': 1})
+        self.assertEqual(self.marks(), {'ana': [self.first.id, self.second.id], 'ben': []})
+        # Marks in other classes are left alone
+        self.assertTrue(AttendanceEntry.objects.filter(attendance_record=self.other_session).exists())
+
+    def assertRejected(self, body, error):
+        response = self.save(body)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['success'], False)
+        self.assertIn(error, response.json()['error'])
+        self.assertEqual(AttendanceEntry.objects.count(), 1)
+
+    def test_outside_the_class(self):
+        self.assertRejected({'add': [[self.outsider.id, self.first.id]]}, 'not enrolled')
+        for session in (self.other_session, self.canceled):
+            with self.subTest(session=session.id):
+                self.assertRejected({'remove': [[self.ana.id, session.id]]}, 'not current sessions')
+        # Nothing of a rejected diff is written
+        self.assertRejected(
+            {'add': [[self.ana.id, self.first.id], [self.ana.id, self.other_session.id]]}, 'not current sessions'
+        )
+
+    def test_too_many_changes(self):
+        pairs = [[self.ana.id, session_id] for session_id in range(grid.MAX_CHANGES + 1)]
+        self.assertRejected({'add': pairs}, f'At most {grid.MAX_CHANGES} changes')
+
+    def test_malformed(self):
+        for body, error in [
+            ('{"add": ', 'Expecting value'),
+            ([], 'Expected an object'),
+            ({'add': {}}, '"add" must be a list'),
+            ({'remove': [[self.ana.id]]}, '"remove" must hold'),
+            ({'add': [['ana', self.first.id]]}, '"add" must hold'),
+            ({'add': [[self.ana.id, self.first.id]], 'remove': [[self.ana.id, self.first.id]]}, 'both added'),
+        ]:
+            with self.subTest(body=body):
+                self.assertRejected(body, error)
+        self.assertEqual(
+            self.client.get(reverse('professor:save_attendance_grid', args=[self.class_obj.id])).status_code, 405
+        )
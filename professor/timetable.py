@@ -0,0 +1,230 @@
+"""Parsing and conflict checking for bulk timetable imports.
+
+A timetable lists classes with their weekly schedules and extra classes.
+``parse_csv`` and ``parse_json`` read it into ``PlannedClass`` objects and
+``find_conflicts`` finds the slots that overlap another one (or one already
+in the database) with a sorted sweep per day, instead of the per-slot loops
+of ``add_schedule`` and ``add_extra_class``.
+
+CSV files have one row per slot with the columns ``professor`` (username),
+``subject``, ``section``, ``room``, ``description``, ``day`` (weekly slot) or
+``date`` (extra class, ``YYYY-MM-DD``), ``start_time``, ``end_time`` (``HH:MM``)
+and ``reason``. A row with neither ``day`` nor ``date`` only declares the
+class. JSON files hold a list of classes::
+
+    [{"professor": "jdoe", "subject": "Physics 1", "section": "A", "room": "301",
+      "schedules": [{"day": "Monday", "start_time": "09:00", "end_time": "10:30"}],
+      "extra_classes": [{"date": "2026-03-02", "start_time": "13:00",
+                         "end_time": "14:00", "reason": "Review"}]}]
+
+Rows naming the same professor, subject and section belong to one class. If
+that professor already has such a class, the slots are added to it.
+"""
+import csv
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from .models import Schedule
+from .views import format_time_12h
+
+DAYS = [day for day, _ in Schedule.DAY_CHOICES]
+
+# ``source`` says where the slot came from, for the conflict report
+Slot = namedtuple('Slot', 'class_key day date start end reason source')
+
+
+class TimetableError(ValueError):
+    """The file cannot be read as a timetable"""
+
+
+class PlannedClass:
+    """A class in the timetable, with the slots to create for it"""
+
+    def __init__(self, professor, subject, section, room='', description='', source=''):
+        self.professor = professor
+        self.subject = subject
+        self.section = section
+        self.room = room
+        self.description = description
+        self.source = source
+        self.schedules = []
+        self.extra_classes = []
+        # Set by the importer when the class already exists
+        self.existing_id = None
+
+    @property
+    def key(self):
+        return (self.professor, self.subject.lower(), self.section.lower())
+
+    def __str__(self):
+        if self.section:
+            return f'{self.subject} - Section {self.section} ({self.professor})'
+        return f'{self.subject} ({self.professor})'
+
+
+def describe(slot):
+    when = slot.day if slot.date is None else slot.date.strftime('%B %d, %Y')
+    return f'{when} {format_time_12h(slot.start)} - {format_time_12h(slot.end)} ({slot.source})'
+
+
+def _parse_slot(class_key, fields, source, errors):
+    """A ``Slot`` from raw ``fields``, or ``None`` after adding to ``errors``"""
+    day = (fields.get('day') or '').strip().capitalize()
+    date_str = (fields.get('date') or '').strip()
+    try:
+        start = datetime.strptime((fields.get('start_time') or '').strip(), '%H:%M').time()
+        end = datetime.strptime((fields.get('end_time') or '').strip(), '%H:%M').time()
+        date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else None
+    except ValueError as e:
+        errors.append(f'{source}: invalid date or time: {e}')
+        return None
+    if date is None and day not in DAYS:
+        errors.append(f'{source}: unknown day "{fields.get("day")}"')
+        return None
+    if start >= end:
+        errors.append(f'{source}: start time must be before end time')
+        return None
+    if date is not None:
+        day = DAYS[date.weekday()]
+    return Slot(class_key, day, date, start, end, (fields.get('reason') or '').strip(), source)
+
+
+def _add_class(classes, fields, source, errors):
+    professor = (fields.get('professor') or '').strip()
+    subject = (fields.get('subject') or '').strip()
+    if not professor or not subject:
+        errors.append(f'{source}: professor and subject are required')
+        return None
+    planned = PlannedClass(
+        professor, subject, (fields.get('section') or '').strip(),
+        (fields.get('room') or '').strip(), (fields.get('description') or '').strip(), source,
+    )
+    if planned.key in classes:
+        planned = classes[planned.key]
+        for attr in ('room', 'description'):
+            value = (fields.get(attr) or '').strip()
+            if value and getattr(planned, attr) and value != getattr(planned, attr):
+                errors.append(f'{source}: {attr} "{value}" differs from "{getattr(planned, attr)}" '
+                              f'given for {planned} at {planned.source}')
+            elif value:
+                setattr(planned, attr, value)
+        return planned
+    classes[planned.key] = planned
+    return planned
+
+
+def _add_slot(planned, fields, source, errors):
+    slot = _parse_slot(planned.key, fields, source, errors)
+    if slot is None:
+        return
+    if slot.date is None:
+        planned.schedules.append(slot)
+    else:
+        planned.extra_classes.append(slot)
+
+
+def parse_csv(stream):
+    """``(classes, errors)`` from a CSV timetable"""
+    classes, errors = {}, []
+    reader = csv.DictReader(stream)
+    missing = {'professor', 'subject'} - set(reader.fieldnames or [])
+    if missing:
+        raise TimetableError(f'missing columns: {", ".join(sorted(missing))}')
+    for row in reader:
+        source = f'line {reader.line_num}'
+        planned = _add_class(classes, row, source, errors)
+        if planned is not None and ((row.get('day') or '').strip() or (row.get('date') or '').strip()):
+            _add_slot(planned, row, source, errors)
+    return list(classes.values()), errors
+
+
+def parse_json(stream):
+    """``(classes, errors)`` from a JSON timetable"""
+    try:
+        data = json.load(stream)
+    except ValueError as e:
+        raise TimetableError(f'invalid JSON: {e}')
+    if not isinstance(data, list):
+        raise TimetableError('expected a list of classes')
+    classes, errors = {}, []
+    for i, item in enumerate(data):
+        source = f'classes[{i}]'
+        if not isinstance(item, dict):
+            errors.append(f'{source}: expected an object')
+            continue
+        planned = _add_class(classes, item, source, errors)
+        if planned is None:
+            continue
+        for field in ('schedules', 'extra_classes'):
+            for j, fields in enumerate(item.get(field) or []):
+                if not isinstance(fields, dict):
+                    errors.append(f'{source}.{field}[{j}]: expected an object')
+                    continue
+                if field == 'schedules':
+                    fields = dict(fields, date=None)
+                elif not fields.get('date'):
+                    errors.append(f'{source}.{field}[{j}]: date is required')
+                    continue
+                _add_slot(planned, fields, f'{source}.{field}[{j}]', errors)
+    return list(classes.values()), errors
+
+
+def _sweep(slots, report, wanted=None):
+    """Add overlapping pairs in ``slots`` to ``report``.
+
+    Slots are sorted by start time and each is compared with the one ending
+    last so far, so every slot that overlaps another is reported at least
+    once without comparing every pair. If ``wanted`` is given, only pairs it
+    accepts are reported.
+    """
+    latest = None
+    for slot in sorted(slots, key=lambda s: (s.start, s.end)):
+        if latest is not None and slot.start < latest.end:
+            if wanted is None or wanted(latest, slot):
+                report.append((latest, slot))
+        if latest is None or slot.end > latest.end:
+            latest = slot
+
+
+def _by(slots, key):
+    groups = {}
+    for slot in slots:
+        groups.setdefault(key(slot), []).append(slot)
+    return groups
+
+
+def find_conflicts(classes, existing_schedules=(), existing_extras=()):
+    """Overlapping slots, as ``(reason, slot, slot)`` triples.
+
+    ``existing_*`` are slots already in the database for the classes being
+    imported into. Only pairs involving at least one imported slot are
+    reported. The rules are those of ``add_schedule`` and ``add_extra_class``:
+    weekly schedules of a class may not overlap on the same day, and an extra
+    class may overlap neither the class's weekly schedule for that weekday
+    nor another of its extra classes on the same date.
+    """
+    schedules = list(existing_schedules)
+    extras = list(existing_extras)
+    for planned in classes:
+        schedules.extend(planned.schedules)
+        extras.extend(planned.extra_classes)
+
+    def imported(a, b):
+        return not (a.source.startswith('existing') and b.source.startswith('existing'))
+
+    def involves_extra(a, b):
+        return imported(a, b) and (a.date is not None or b.date is not None)
+
+    conflicts = []
+    pairs = []
+    weekly = _by(schedules, lambda s: (s.class_key, s.day))
+    for group in weekly.values():
+        _sweep(group, pairs, imported)
+    conflicts.extend(('weekly schedules overlap', a, b) for a, b in pairs)
+
+    pairs = []
+    for (class_key, date), group in _by(extras, lambda s: (s.class_key, s.date)).items():
+        _sweep(group + weekly.get((class_key, group[0].day), []), pairs, involves_extra)
+    conflicts.extend(('extra class overlaps', a, b) for a, b in pairs)
+    return conflicts
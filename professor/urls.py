@@ -1,22 +1,33 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# Under ASGI the write-heavy endpoints are served by their async versions
+scan_views = async_views if settings.ASYNC_VIEWS else views
 
 app_name = 'professor'
 
 urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('search/', views.search, name='search'),
+    path('calendar/', scan_views.calendar_data, name='calendar_data'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
     path('class/create/', views.create_class, name='create_class'),
     path('class/<int:class_id>/edit/', views.edit_class, name='edit_class'),
     path('class/<int:class_id>/', views.class_detail, name='class_detail'),
+    path('class/<int:class_id>/tabs/<str:tab>/', views.class_tab, name='class_tab'),
     path('class/<int:class_id>/schedule/add/', views.add_schedule, name='add_schedule'),
     path('class/<int:class_id>/schedule/<int:schedule_id>/delete/', views.delete_schedule, name='delete_schedule'),
     path('class/<int:class_id>/extra-class/add/', views.add_extra_class, name='add_extra_class'),
     path('class/<int:class_id>/extra-class/<int:extra_class_id>/delete/', views.delete_extra_class, name='delete_extra_class'),
     path('class/<int:class_id>/announcement/post/', views.post_announcement, name='post_announcement'),
+    path('class/<int:class_id>/attendance/grid/', views.attendance_grid, name='attendance_grid'),
+    path('class/<int:class_id>/attendance/grid/data/', views.attendance_grid_data, name='attendance_grid_data'),
+    path('class/<int:class_id>/attendance/grid/save/', views.save_attendance_grid, name='save_attendance_grid'),
     path('class/<int:class_id>/qr/activate/', views.activate_qr_scanning, name='activate_qr'),
     path('class/<int:class_id>/qr/scan/', views.scan_student_qr, name='scan_student_qr'),
-    path('class/<int:class_id>/qr/process/', views.process_qr_scan, name='process_qr_scan'),
+    path('class/<int:class_id>/qr/process/', scan_views.process_qr_scan, name='process_qr_scan'),
     path('class/<int:class_id>/student/<int:enrollment_id>/kick/', views.kick_student, name='kick_student'),
     path('cancel-class/', views.cancel_class, name='cancel_class'),
-    path('verify-qr/', views.verify_qr_code, name='verify_qr'),
+    path('verify-qr/', scan_views.verify_qr_code, name='verify_qr'),
 ]
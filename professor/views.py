@@ -1,7 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.utils import timezone
 from django.db.models import Count, Q
 from datetime import datetime, timedelta
@@ -10,6 +9,14 @@ import json
 from django.contrib.auth.models import User
 from .models import Class, Schedule, Announcement, AttendanceRecord, AttendanceEntry, StudentClassEnrollment, ExtraClass
 from .forms import ClassForm, ScheduleForm, AnnouncementForm
+from . import cache, grid, ical, tasks
+from .tabs import PROFESSOR_TABS, render_professor_tab, requested_term
+from .search import search_announcements, search_classes
+from attendance import metrics
+from attendance.routers import replica_reads
+from attendance.sqlite import write_atomic
+from main.decorators import professor_required, student_required
+from main.roles import PROFESSOR
 
 
 def get_active_schedule(class_obj, current_time=None):
@@ -27,141 +34,93 @@ def get_active_schedule(class_obj, current_time=None):
     return None
 
 
-@login_required
+@metrics.observe_latency('attendance_dashboard_duration_seconds', role='professor')
+@professor_required
+@replica_reads
 def dashboard(request):
     """Main dashboard showing all classes for the professor"""
     # Get active tab from query parameter (defaults to 'classes')
     active_tab = request.GET.get('tab', 'classes')
     
-    classes = Class.objects.filter(professor=request.user).annotate(
-        schedule_count=Count('schedules'),
-        announcement_count=Count('announcements'),
-        attendance_count=Count('attendance_records')
-    )
-    
-    # Get all schedules for the calendar view
-    all_schedules = Schedule.objects.filter(class_obj__professor=request.user).select_related('class_obj')
-    
-    # Build a dictionary of day -> list of schedules for JavaScript
-    schedules_by_day = {}
-    for schedule in all_schedules:
-        day = schedule.day
-        if day not in schedules_by_day:
-            schedules_by_day[day] = []
-        schedules_by_day[day].append({
-            'id': schedule.id,
-            'class_id': schedule.class_obj.id,
-            'class_name': schedule.class_obj.subject,
-            'start_time': schedule.start_time.strftime('%H:%M'),
-            'end_time': schedule.end_time.strftime('%H:%M'),
-        })
-    
-    # Get all extra classes for the calendar
-    all_extra_classes = ExtraClass.objects.filter(class_obj__professor=request.user).select_related('class_obj')
-    
-    # Build a dictionary of date -> list of extra classes
-    extra_classes_by_date = {}
-    for extra in all_extra_classes:
-        date_str = extra.date.strftime('%Y-%m-%d')
-        if date_str not in extra_classes_by_date:
-            extra_classes_by_date[date_str] = []
-        extra_classes_by_date[date_str].append({
-            'id': extra.id,
-            'class_id': extra.class_obj.id,
-            'class_name': extra.class_obj.subject,
-            'start_time': extra.start_time.strftime('%H:%M'),
-            'end_time': extra.end_time.strftime('%H:%M'),
-            'reason': extra.reason or '',
-        })
-    
-    # Get all canceled classes for the calendar
-    canceled_records = AttendanceRecord.objects.filter(
-        class_obj__professor=request.user,
-        canceled=True
-    ).select_related('class_obj')
-    
-    # Build a dictionary of date -> list of canceled schedule times
-    canceled_classes = {}
-    for record in canceled_records:
-        # Use date() to ensure we get just the date part, avoiding timezone issues
-        date_str = record.date.date().strftime('%Y-%m-%d')
-        if date_str not in canceled_classes:
-            canceled_classes[date_str] = []
-        canceled_classes[date_str].append({
-            'class_id': record.class_obj.id,
-            'class_name': record.class_obj.subject,
-            'schedule_time': record.schedule_time,
-        })
+    classes = cache.professor_dashboard_classes(request.user.id)
+
+    # Calendar data (weekly schedules, extra classes and cancellations)
+    calendar = cache.professor_calendar(request.user.id)
 
     context = {
         'classes': classes,
         'active_tab': active_tab,
-        'schedules_by_day': json.dumps(schedules_by_day),
-        'extra_classes_by_date': json.dumps(extra_classes_by_date),
-        'canceled_classes': json.dumps(canceled_classes),
+        'schedules_by_day': json.dumps(calendar['schedules_by_day']),
+        'extra_classes_by_date': json.dumps(calendar['extra_classes_by_date']),
+        'canceled_classes': json.dumps(calendar['canceled_classes']),
+        'calendar_feed_url': ical.feed_url(request, request.user, PROFESSOR),
     }
     return render(request, 'professor/dashboard.html', context)
 
 
-@login_required
+@professor_required
+@replica_reads
+def calendar_data(request):
+    """JSON calendar feed for the professor dashboard"""
+    return JsonResponse(cache.professor_calendar(request.user.id))
+
+
+def calendar_feed(request, token):
+    """iCalendar feed of the professor's classes for calendar apps; the token stands in for a login.
+
+    This reads from the primary, like the announcement feed: a lagging
+    replica would be cached under versions that already cover the new rows.
+    """
+    return ical.feed_response(request, token, PROFESSOR)
+
+
+@professor_required
+@replica_reads
 def class_detail(request, class_id):
     """Class detail view with tabs for overview, schedule, announcements, and attendance"""
     class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
     
-    # Get active tab from query parameter
+    # Get active tab from query parameter; only that tab is rendered here,
+    # the others are loaded from class_tab when opened
     active_tab = request.GET.get('tab', 'overview')
-    
-    # Get schedules
-    schedules = class_obj.schedules.all()
-    
-    # Get extra classes (one-time sessions)
-    extra_classes = class_obj.extra_classes.all()
-    
-    # Get announcements
-    announcements = class_obj.announcements.all()
-    
-    # Get attendance records
-    attendance_records = class_obj.attendance_records.all()
-    
-    # Get enrolled students
-    enrolled_students = class_obj.enrolled_students.select_related('student').all()
-    
-    # Calculate stats
-    total_students = class_obj.get_total_students()
-    total_sessions = class_obj.get_total_sessions()
-    
-    # Calculate average attendance rate
-    attendance_rate = 0
-    if total_students > 0 and total_sessions > 0:
-        total_possible = total_students * total_sessions
-        # AttendanceEntry records mean the student was present (scanned QR)
-        total_present = AttendanceEntry.objects.filter(
-            attendance_record__class_obj=class_obj
-        ).count()
-        attendance_rate = round((total_present / total_possible) * 100) if total_possible > 0 else 0
-    
-    # Get today's date for extra class badges
-    from datetime import date
-    today = date.today()
-    
+    if active_tab not in PROFESSOR_TABS:
+        active_tab = 'overview'
+
     context = {
         'class_obj': class_obj,
-        'schedules': schedules,
-        'extra_classes': extra_classes,
-        'announcements': announcements,
-        'attendance_records': attendance_records,
-        'enrolled_students': enrolled_students,
         'active_tab': active_tab,
-        'total_students': total_students,
-        'total_sessions': total_sessions,
-        'attendance_rate': attendance_rate,
-        'today': today,
+        'tab_html': render_professor_tab(request, class_obj, active_tab, requested_term(request)),
     }
     
     return render(request, 'professor/class_detail.html', context)
 
 
-@login_required
+@professor_required
+@replica_reads
+def class_tab(request, class_id, tab):
+    """HTML fragment of one class detail tab"""
+    class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
+    if tab not in PROFESSOR_TABS:
+        raise Http404('Unknown tab')
+    return HttpResponse(render_professor_tab(request, class_obj, tab, requested_term(request)))
+
+
+@professor_required
+@replica_reads
+def search(request):
+    """Search the professor's classes and their announcements"""
+    query = request.GET.get('q', '').strip()
+    class_ids = cache.professor_class_ids(request.user.id)
+    context = {
+        'query': query,
+        'classes': search_classes(query, class_ids),
+        'announcements': search_announcements(query, class_ids),
+        'detail_url': 'professor:class_detail',
+    }
+    return render(request, 'professor/search.html', context)
+
+
+@professor_required
 def create_class(request):
     """Create a new class"""
     if request.method == 'POST':
@@ -178,7 +137,7 @@ def create_class(request):
     return render(request, 'professor/create_class_modal.html', {'form': form})
 
 
-@login_required
+@professor_required
 def edit_class(request, class_id):
     """Edit an existing class (subject, section, room, description)."""
     class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
@@ -214,7 +173,7 @@ def time_to_minutes(t):
     return t.hour * 60 + t.minute
 
 
-@login_required
+@professor_required
 def add_schedule(request, class_id):
     """Add a schedule to a class"""
     class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
@@ -260,7 +219,7 @@ def add_schedule(request, class_id):
     return redirect('professor:class_detail', class_id=class_id)
 
 
-@login_required
+@professor_required
 def delete_schedule(request, class_id, schedule_id):
     """Delete a schedule"""
     class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
@@ -270,7 +229,7 @@ def delete_schedule(request, class_id, schedule_id):
     return redirect('professor:class_detail', class_id=class_id)
 
 
-@login_required
+@professor_required
 def add_extra_class(request, class_id):
     """Add an extra/one-time class session"""
     class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
@@ -345,14 +304,15 @@ def add_extra_class(request, class_id):
                     reason=reason
                 )
                 
-                # Create announcement for this extra class
+                # Queue the announcement for this extra class
                 formatted_date = date_obj.strftime('%B %d, %Y')
                 time_range = f"{format_time_12h(start_time_obj)} - {format_time_12h(end_time_obj)}"
                 announcement_title = f"Extra Class: {formatted_date} ({time_range})"
                 announcement_content = reason if reason else "An extra class session has been scheduled."
                 
-                Announcement.objects.create(
-                    class_obj=class_obj,
+                tasks.post_announcement.enqueue(
+                    created_by=request.user,
+                    class_id=class_obj.id,
                     title=announcement_title,
                     content=announcement_content
                 )
@@ -366,7 +326,7 @@ def add_extra_class(request, class_id):
     return redirect('professor:class_detail', class_id=class_id)
 
 
-@login_required
+@professor_required
 def delete_extra_class(request, class_id, extra_class_id):
     """Delete an extra class"""
     class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
@@ -376,7 +336,7 @@ def delete_extra_class(request, class_id, extra_class_id):
     return redirect('professor:class_detail', class_id=class_id)
 
 
-@login_required
+@professor_required
 def kick_student(request, class_id, enrollment_id):
     """Remove a student from a class"""
     class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
@@ -390,14 +350,16 @@ def kick_student(request, class_id, enrollment_id):
     return redirect('professor:class_detail', class_id=class_id)
 
 
-@login_required
+@professor_required
 def cancel_class(request):
     """Cancel a class for a specific date"""
     if request.method == 'POST':
         schedule_id = request.POST.get('schedule_id')
         cancel_date = request.POST.get('cancel_date')  # Format: YYYY-MM-DD
         
-        schedule = get_object_or_404(Schedule, id=schedule_id, class_obj__professor=request.user)
+        schedule = get_object_or_404(
+            Schedule, id=schedule_id, class_obj__professor=request.user, class_obj__deleted_at__isnull=True
+        )
         
         # Parse the date - use noon to avoid timezone date boundary issues
         from datetime import datetime
@@ -421,11 +383,13 @@ def cancel_class(request):
             # Toggle the canceled status
             existing.canceled = not existing.canceled
             existing.save()
+            metrics.inc('attendance_session_cancellations_total', action='cancel' if existing.canceled else 'restore')
             if existing.canceled:
                 # Create announcement when canceling
                 if announcement_title and announcement_content:
-                    Announcement.objects.create(
-                        class_obj=schedule.class_obj,
+                    tasks.post_announcement.enqueue(
+                        created_by=request.user,
+                        class_id=schedule.class_obj_id,
                         title=announcement_title,
                         content=announcement_content
                     )
@@ -433,8 +397,9 @@ def cancel_class(request):
             else:
                 # Create announcement when uncanceling
                 if announcement_title and announcement_content:
-                    Announcement.objects.create(
-                        class_obj=schedule.class_obj,
+                    tasks.post_announcement.enqueue(
+                        created_by=request.user,
+                        class_id=schedule.class_obj_id,
                         title=announcement_title,
                         content=announcement_content
                     )
@@ -447,10 +412,12 @@ def cancel_class(request):
                 schedule_time=schedule_time_str,
                 canceled=True
             )
+            metrics.inc('attendance_session_cancellations_total', action='cancel')
             # Create announcement when canceling
             if announcement_title and announcement_content:
-                Announcement.objects.create(
-                    class_obj=schedule.class_obj,
+                tasks.post_announcement.enqueue(
+                    created_by=request.user,
+                    class_id=schedule.class_obj_id,
                     title=announcement_title,
                     content=announcement_content
                 )
@@ -460,7 +427,7 @@ def cancel_class(request):
     return redirect(reverse('professor:dashboard') + '?tab=schedules')
 
 
-@login_required
+@professor_required
 def post_announcement(request, class_id):
     """Post a new announcement"""
     class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
@@ -479,7 +446,34 @@ def post_announcement(request, class_id):
     return redirect('professor:class_detail', class_id=class_id)
 
 
-@login_required
+@professor_required
+def attendance_grid(request, class_id):
+    """Students by sessions grid for fixing attendance by hand (see ``grid.py``)"""
+    class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
+    return render(request, 'professor/attendance_grid.html', {'class_obj': class_obj, 'page_size': grid.PAGE_SIZE})
+
+
+@professor_required
+def attendance_grid_data(request, class_id):
+    """One page of the attendance grid as JSON; reads the primary so a reload shows the last save"""
+    class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
+    return JsonResponse(grid.page(class_obj, request.GET.get('page', 1)))
+
+
+@professor_required
+def save_attendance_grid(request, class_id):
+    """Apply a diff of attendance marks from the grid"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
+    try:
+        marked, removed = grid.apply(class_obj, json.loads(request.body or '{}'))
+    except ValueError as e:  # Malformed JSON or grid.InvalidChanges
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, 'marked': marked, 'removed': removed})
+
+
+@professor_required
 def activate_qr_scanning(request, class_id):
     """Activate QR scanning for a class session and open the scanner.
 
@@ -527,7 +521,39 @@ def activate_qr_scanning(request, class_id):
     return redirect('professor:scan_student_qr', class_id=class_obj.id)
 
 
-@login_required
+def mark_verified_student(class_obj, timestamp_str, student):
+    """Mark ``student`` in the session whose QR code has ``timestamp_str``; ``verify_qr_code``'s response.
+
+    Shared with the async view, which calls it with ``sync_to_async``.
+    """
+    with write_atomic():
+        # Find the attendance record
+        attendance_record = AttendanceRecord.objects.filter(
+            class_obj=class_obj,
+            qr_code_data__contains=timestamp_str
+        ).order_by('-date').first()
+
+        if not attendance_record:
+            return JsonResponse({'success': False, 'error': 'Attendance session not found'}, status=404)
+
+        # Check if student already marked attendance
+        if AttendanceEntry.objects.filter(
+            attendance_record=attendance_record,
+            student=student
+        ).exists():
+            return JsonResponse({'success': False, 'error': 'Attendance already marked'}, status=400)
+
+        # Create attendance entry
+        AttendanceEntry.objects.create(
+            attendance_record=attendance_record,
+            student=student
+        )
+
+    return JsonResponse({'success': True, 'message': 'Attendance marked successfully'})
+
+
+@metrics.track_scan
+@student_required
 def verify_qr_code(request):
     """Verify QR code and mark attendance (for students to call)"""
     if request.method == 'POST':
@@ -552,29 +578,7 @@ def verify_qr_code(request):
             # Get class and verify
             class_obj = get_object_or_404(Class, id=class_id)
             
-            # Find the attendance record
-            attendance_record = AttendanceRecord.objects.filter(
-                class_obj=class_obj,
-                qr_code_data__contains=qr_data.get('timestamp', '')
-            ).order_by('-date').first()
-            
-            if not attendance_record:
-                return JsonResponse({'success': False, 'error': 'Attendance session not found'}, status=404)
-            
-            # Check if student already marked attendance
-            if AttendanceEntry.objects.filter(
-                attendance_record=attendance_record,
-                student=request.user
-            ).exists():
-                return JsonResponse({'success': False, 'error': 'Attendance already marked'}, status=400)
-            
-            # Create attendance entry
-            AttendanceEntry.objects.create(
-                attendance_record=attendance_record,
-                student=request.user
-            )
-            
-            return JsonResponse({'success': True, 'message': 'Attendance marked successfully'})
+            return mark_verified_student(class_obj, timestamp_str, request.user)
             
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -582,7 +586,7 @@ def verify_qr_code(request):
     return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
 
 
-@login_required
+@professor_required
 def scan_student_qr(request, class_id):
     """Professor view to scan student QR codes using the camera.
 
@@ -624,38 +628,16 @@ def scan_student_qr(request, class_id):
     return render(request, 'professor/scan_qr.html', context)
 
 
-@login_required
-def process_qr_scan(request, class_id):
-    """Process a scanned student QR code and mark attendance.
+def mark_scanned_student(class_obj, now, schedule_time_str, scanned_name):
+    """Mark the student named ``scanned_name`` in the current session; ``process_qr_scan``'s response.
 
-    The student QR encodes the student's full name (or username fallback).
-    We match that name against enrollments for this class and append an
-    AttendanceEntry to the current session's AttendanceRecord.
+    One transaction for the session lookup, the duplicate check and the
+    insert, so concurrent scans cannot open a second session for the same
+    slot or mark a student twice (with IMMEDIATE transactions on SQLite they
+    queue on the write lock). Shared with the async view, which calls it with
+    ``sync_to_async``.
     """
-    if request.method != 'POST':
-        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
-
-    try:
-        data = json.loads(request.body or '{}')
-        scanned_name = (data.get('student_name') or '').strip()
-
-        if not scanned_name:
-            return JsonResponse({'success': False, 'error': 'No student name provided'}, status=400)
-
-        # Get the class, making sure it belongs to this professor
-        class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
-
-        # Only allow processing during an active schedule window (Asia/Manila local time)
-        now = timezone.localtime(timezone.now(), timezone.get_default_timezone())
-        active_schedule = get_active_schedule(class_obj, now)
-        if not active_schedule:
-            return JsonResponse({
-                'success': False,
-                'error': 'No active class schedule at this time. QR scanning is only allowed during scheduled class hours.'
-            }, status=400)
-
-        schedule_time_str = f"{active_schedule.start_time.strftime('%H:%M')} - {active_schedule.end_time.strftime('%H:%M')}"
-
+    with write_atomic():
         # Get or create the attendance record for the current session
         attendance_record, _ = AttendanceRecord.objects.get_or_create(
             class_obj=class_obj,
@@ -667,30 +649,22 @@ def process_qr_scan(request, class_id):
         )
 
         # Look for a matching enrolled student by full name (or username)
-        enrollments = StudentClassEnrollment.objects.filter(class_obj=class_obj).select_related('student')
-
-        matching_student = None
-        lower_scanned = scanned_name.lower()
-        for enrollment in enrollments:
-            student = enrollment.student
-            student_full_name = (student.get_full_name() or student.username).strip()
-            if student_full_name.lower() == lower_scanned:
-                matching_student = student
-                break
+        match = cache.class_roster(class_obj.id).get(scanned_name.lower())
 
-        if not matching_student:
+        if not match:
             return JsonResponse({
                 'success': False,
                 'error': f'No enrolled student in this class found with name "{scanned_name}"',
                 'student_name': scanned_name,
             }, status=404)
 
+        student_id, display_name = match
+
         # Avoid duplicate attendance entries for this session
         if AttendanceEntry.objects.filter(
             attendance_record=attendance_record,
-            student=matching_student
+            student_id=student_id
         ).exists():
-            display_name = matching_student.get_full_name() or matching_student.username
             return JsonResponse({
                 'success': False,
                 'error': f'Attendance already marked for {display_name}',
@@ -701,15 +675,50 @@ def process_qr_scan(request, class_id):
         # Create attendance entry
         AttendanceEntry.objects.create(
             attendance_record=attendance_record,
-            student=matching_student
+            student_id=student_id
         )
 
-        display_name = matching_student.get_full_name() or matching_student.username
-        return JsonResponse({
-            'success': True,
-            'message': f'Attendance marked for {display_name}',
-            'student_name': display_name,
-        })
+    return JsonResponse({
+        'success': True,
+        'message': f'Attendance marked for {display_name}',
+        'student_name': display_name,
+    })
+
+
+@metrics.track_scan
+@professor_required
+def process_qr_scan(request, class_id):
+    """Process a scanned student QR code and mark attendance.
+
+    The student QR encodes the student's full name (or username fallback).
+    We match that name against enrollments for this class and append an
+    AttendanceEntry to the current session's AttendanceRecord.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = json.loads(request.body or '{}')
+        scanned_name = (data.get('student_name') or '').strip()
+
+        if not scanned_name:
+            return JsonResponse({'success': False, 'error': 'No student name provided'}, status=400)
+
+        # Get the class, making sure it belongs to this professor
+        class_obj = get_object_or_404(Class, id=class_id, professor=request.user)
+
+        # Only allow processing during an active schedule window (Asia/Manila local time)
+        now = timezone.localtime(timezone.now(), timezone.get_default_timezone())
+        active_schedule = get_active_schedule(class_obj, now)
+        if not active_schedule:
+            return JsonResponse({
+                'success': False,
+                'error': 'No active class schedule at this time. QR scanning is only allowed during scheduled class hours.'
+            }, status=400)
+
+        schedule_time_str = f"{active_schedule.start_time.strftime('%H:%M')} - {active_schedule.end_time.strftime('%H:%M')}"
+
+        return mark_scanned_student(class_obj, now, schedule_time_str, scanned_name)
 
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -0,0 +1,18 @@
+"""Async versions of the student calendar feed.
+
+Routed instead of ``views.calendar_data`` when ``settings.ASYNC_VIEWS`` is
+enabled; see ``professor/async_views.py``.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+from professor import cache
+from attendance.routers import replica_reads
+from main.decorators import student_required
+
+
+@student_required
+@replica_reads
+async def calendar_data(request):
+    """JSON calendar feed for the student dashboard"""
+    return JsonResponse(await sync_to_async(cache.student_calendar)(request.user.id))
@@ -1,12 +1,21 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+calendar_views = async_views if settings.ASYNC_VIEWS else views
 
 app_name = 'student'
 
 urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('search/', views.search, name='search'),
+    path('calendar/', calendar_views.calendar_data, name='calendar_data'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('announcements/feed/', views.announcement_feed, name='announcement_feed'),
     path('join/', views.join_class, name='join_class'),
     path('class/<int:class_id>/', views.class_detail, name='class_detail'),
+    path('class/<int:class_id>/tabs/<str:tab>/', views.class_tab, name='class_tab'),
     path('class/<int:class_id>/leave/', views.leave_class, name='leave_class'),
     path('my-qr/', views.my_qr_code, name='my_qr_code'),
+    path('my-qr/<str:version>.<str:fmt>', views.my_qr_image, name='my_qr_image'),
 ]
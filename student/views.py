@@ -1,111 +1,180 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import Count, F, Q
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.utils import timezone
+from django.views.decorators.http import condition
+from datetime import datetime, timezone as dt_timezone
+import hashlib
 import json
 
 from professor.models import Class, StudentClassEnrollment, Announcement, AttendanceRecord, Schedule, ExtraClass
+from professor import cache, ical, qr
+from professor.tabs import STUDENT_TABS, render_student_tab, requested_term
+from professor.search import search_announcements, search_classes
+from attendance import metrics
+from attendance.routers import replica_reads
+from main.decorators import student_required
+from main.roles import STUDENT
 from .forms import JoinClassForm
 
 
-@login_required
+def _unread_filter(prefix=''):
+    return Q(**{f'{prefix}created_at__gt': F('announcements_seen_at')})
+
+
+def unread_announcement_counts(student_id):
+    """``{class id: number of unread announcements}`` for the student's classes, in one query"""
+    return dict(
+        StudentClassEnrollment.objects.filter(student_id=student_id)
+        .values_list('class_obj_id')
+        .annotate(unread=Count(
+            'class_obj__announcements',
+            filter=_unread_filter('class_obj__announcements__'),
+        ))
+    )
+
+
+def mark_announcements_seen(enrollment):
+    """Move the enrollment's watermark to now if anything is unread"""
+    StudentClassEnrollment.objects.filter(pk=enrollment.pk).filter(
+        _unread_filter('class_obj__announcements__')
+    ).update(announcements_seen_at=timezone.now())
+
+
+@metrics.observe_latency('attendance_dashboard_duration_seconds', role='student')
+@student_required
+@replica_reads
 def dashboard(request):
     """Student dashboard showing enrolled classes"""
     # Get active tab from query parameter (defaults to 'classes')
     active_tab = request.GET.get('tab', 'classes')
     
-    # Get all classes the student is enrolled in
-    enrollments = StudentClassEnrollment.objects.filter(student=request.user).select_related('class_obj')
-    enrolled_classes = [enrollment.class_obj for enrollment in enrollments]
-    
-    # Get stats for each class
-    classes_with_stats = []
-    for class_obj in enrolled_classes:
-        # Get upcoming schedules
-        schedules = class_obj.schedules.all()
-        
-        # Get recent announcements
-        announcements = class_obj.announcements.all()[:3]
-        
-        # Get attendance records for this student
-        student_attendance = AttendanceRecord.objects.filter(
-            class_obj=class_obj,
-            entries__student=request.user
-        ).distinct().count()
-        
-        classes_with_stats.append({
-            'class_obj': class_obj,
-            'schedules': schedules,
-            'announcements': announcements,
-            'attendance_count': student_attendance,
-        })
-    
-    # Get all schedules for enrolled classes for the calendar view
-    enrolled_class_ids = [c.id for c in enrolled_classes]
-    all_schedules = Schedule.objects.filter(class_obj__id__in=enrolled_class_ids).select_related('class_obj')
-    
-    # Build a dictionary of day -> list of schedules for JavaScript
-    schedules_by_day = {}
-    for schedule in all_schedules:
-        day = schedule.day
-        if day not in schedules_by_day:
-            schedules_by_day[day] = []
-        schedules_by_day[day].append({
-            'id': schedule.id,
-            'class_id': schedule.class_obj.id,
-            'class_name': schedule.class_obj.subject,
-            'start_time': schedule.start_time.strftime('%H:%M'),
-            'end_time': schedule.end_time.strftime('%H:%M'),
-        })
-    
-    # Get all canceled classes for the calendar
-    canceled_records = AttendanceRecord.objects.filter(
-        class_obj__id__in=enrolled_class_ids,
-        canceled=True
-    ).select_related('class_obj')
-    
-    # Build a dictionary of date -> list of canceled schedule times
-    canceled_classes = {}
-    for record in canceled_records:
-        date_str = record.date.date().strftime('%Y-%m-%d')
-        if date_str not in canceled_classes:
-            canceled_classes[date_str] = []
-        canceled_classes[date_str].append({
-            'class_id': record.class_obj.id,
-            'class_name': record.class_obj.subject,
-            'schedule_time': record.schedule_time,
-        })
-    
-    # Get all extra classes for the calendar
-    all_extra_classes = ExtraClass.objects.filter(class_obj__id__in=enrolled_class_ids).select_related('class_obj')
-    
-    # Build a dictionary of date -> list of extra classes
-    extra_classes_by_date = {}
-    for extra in all_extra_classes:
-        date_str = extra.date.strftime('%Y-%m-%d')
-        if date_str not in extra_classes_by_date:
-            extra_classes_by_date[date_str] = []
-        extra_classes_by_date[date_str].append({
-            'id': extra.id,
-            'class_id': extra.class_obj.id,
-            'class_name': extra.class_obj.subject,
-            'start_time': extra.start_time.strftime('%H:%M'),
-            'end_time': extra.end_time.strftime('%H:%M'),
-            'reason': extra.reason or '',
-        })
-    
+    # Enrolled classes with schedules, recent announcements and attendance count
+    unread = unread_announcement_counts(request.user.id)
+    classes_with_stats = [
+        dict(class_data, unread_announcements=unread.get(class_data['class_obj'].id, 0))
+        for class_data in cache.student_dashboard_classes(request.user.id)
+    ]
+
+    # Calendar data for enrolled classes (weekly schedules, extra classes and cancellations)
+    calendar = cache.student_calendar(request.user.id)
+
     context = {
         'classes': classes_with_stats,
         'active_tab': active_tab,
-        'schedules_by_day': json.dumps(schedules_by_day),
-        'extra_classes_by_date': json.dumps(extra_classes_by_date),
-        'canceled_classes': json.dumps(canceled_classes),
+        'schedules_by_day': json.dumps(calendar['schedules_by_day']),
+        'extra_classes_by_date': json.dumps(calendar['extra_classes_by_date']),
+        'canceled_classes': json.dumps(calendar['canceled_classes']),
+        'calendar_feed_url': ical.feed_url(request, request.user, STUDENT),
     }
     return render(request, 'student/dashboard.html', context)
 
 
-@login_required
+@student_required
+@replica_reads
+def calendar_data(request):
+    """JSON calendar feed for the student dashboard"""
+    return JsonResponse(cache.student_calendar(request.user.id))
+
+
+# Most announcements returned by one call of the announcement feed
+FEED_LIMIT = 50
+
+
+def calendar_feed(request, token):
+    """iCalendar feed of the student's classes for calendar apps; the token stands in for a login"""
+    return ical.feed_response(request, token, STUDENT)
+
+
+def _encode_cursor(announcement):
+    created_at = announcement['created_at']
+    micros = int(created_at.timestamp()) * 1000000 + created_at.microsecond
+    return f"{micros}-{announcement['id']}"
+
+
+def _decode_cursor(cursor):
+    micros, pk = (int(part) for part in cursor.split('-'))
+    seconds, micros = divmod(micros, 1000000)
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc).replace(microsecond=micros), pk
+
+
+def _announcement_feed_etag(request):
+    # Built from cache version tokens only, so a matching poll costs no query
+    tag = f"{cache.student_tag(request.user.id)}:{request.GET.get('since', '')}"
+    return hashlib.blake2b(tag.encode(), digest_size=16).hexdigest()
+
+
+@student_required
+@condition(etag_func=_announcement_feed_etag)
+def announcement_feed(request):
+    """JSON announcements across the student's classes, for polling.
+
+    Without ``since`` this returns the latest announcements; with it, those
+    posted after that cursor, oldest first. Each response carries the cursor
+    of its newest announcement to send as ``since`` next time, and ``more``
+    when further announcements are waiting. A poll with nothing new is
+    answered with 304, from the ETag alone when the classes have not changed
+    since the client's last request.
+
+    This reads from the primary: a lagging replica would return nothing new
+    under an ETag that already covers the new rows.
+    """
+    announcements = Announcement.objects.filter(
+        class_obj_id__in=cache.student_class_ids(request.user.id)
+    ).values('id', 'class_obj_id', 'class_obj__subject', 'title', 'content', 'created_at')
+
+    since = request.GET.get('since')
+    if since:
+        try:
+            created_at, pk = _decode_cursor(since)
+        except (ValueError, OverflowError):
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        page = list(
+            announcements.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by('created_at', 'id')[:FEED_LIMIT + 1]
+        )
+        if not page:
+            return HttpResponseNotModified()
+        more = len(page) > FEED_LIMIT
+        page = page[:FEED_LIMIT]
+    else:
+        page = list(announcements.order_by('-created_at', '-id')[:FEED_LIMIT])[::-1]
+        more = False
+
+    return JsonResponse({
+        'announcements': [
+            {
+                'id': announcement['id'],
+                'class_id': announcement['class_obj_id'],
+                'class_subject': announcement['class_obj__subject'],
+                'title': announcement['title'],
+                'content': announcement['content'],
+                'created_at': announcement['created_at'].isoformat(),
+            }
+            for announcement in page
+        ],
+        'cursor': _encode_cursor(page[-1]) if page else since,
+        'more': more,
+    })
+
+
+@student_required
+@replica_reads
+def search(request):
+    """Search the student's classes and their announcements"""
+    query = request.GET.get('q', '').strip()
+    class_ids = cache.student_class_ids(request.user.id)
+    context = {
+        'query': query,
+        'classes': search_classes(query, class_ids),
+        'announcements': search_announcements(query, class_ids),
+        'detail_url': 'student:class_detail',
+    }
+    return render(request, 'student/search.html', context)
+
+
+@student_required
 def join_class(request):
     """Allow students to join a class using a class code"""
     if request.method == 'POST':
@@ -135,52 +204,52 @@ def join_class(request):
     return render(request, 'student/join_class.html', {'form': form})
 
 
-@login_required
+@student_required
+@replica_reads
 def class_detail(request, class_id):
     """Student view of a class detail"""
     # Check if student is enrolled
     enrollment = get_object_or_404(
-        StudentClassEnrollment,
+        StudentClassEnrollment.objects.select_related('class_obj'),
         student=request.user,
         class_obj_id=class_id
     )
     class_obj = enrollment.class_obj
     
-    # Get active tab from query parameter
+    # Get active tab from query parameter; only that tab is rendered here,
+    # the others are loaded from class_tab when opened
     active_tab = request.GET.get('tab', 'overview')
-    
-    # Get schedules
-    schedules = class_obj.schedules.all()
-    
-    # Get announcements
-    announcements = class_obj.announcements.all()
-    
-    # Get attendance records for this student
-    attendance_records = AttendanceRecord.objects.filter(
-        class_obj=class_obj,
-        entries__student=request.user
-    ).distinct().order_by('-date')
-    
-    # Get total attendance count
-    total_attendance = attendance_records.count()
-    
-    # Get total possible sessions (sessions that have been held)
-    total_sessions = AttendanceRecord.objects.filter(class_obj=class_obj).count()
-    
+    if active_tab not in STUDENT_TABS:
+        active_tab = 'overview'
+    if active_tab == 'announcements':
+        mark_announcements_seen(enrollment)
+
     context = {
         'class_obj': class_obj,
-        'schedules': schedules,
-        'announcements': announcements,
-        'attendance_records': attendance_records,
         'active_tab': active_tab,
-        'total_attendance': total_attendance,
-        'total_sessions': total_sessions,
+        'tab_html': render_student_tab(request, class_obj, active_tab, requested_term(request)),
     }
     
     return render(request, 'student/class_detail.html', context)
 
 
-@login_required
+@student_required
+@replica_reads
+def class_tab(request, class_id, tab):
+    """HTML fragment of one class detail tab"""
+    enrollment = get_object_or_404(
+        StudentClassEnrollment.objects.select_related('class_obj'),
+        student=request.user,
+        class_obj_id=class_id
+    )
+    if tab not in STUDENT_TABS:
+        raise Http404('Unknown tab')
+    if tab == 'announcements':
+        mark_announcements_seen(enrollment)
+    return HttpResponse(render_student_tab(request, enrollment.class_obj, tab, requested_term(request)))
+
+
+@student_required
 def leave_class(request, class_id):
     """Allow students to leave a class"""
     enrollment = get_object_or_404(
@@ -194,7 +263,7 @@ def leave_class(request, class_id):
     return redirect('student:dashboard')
 
 
-@login_required
+@student_required
 def my_qr_code(request):
     """Display student's QR code containing their full name"""
     student_name = request.user.get_full_name() or request.user.username
@@ -202,6 +271,37 @@ def my_qr_code(request):
     context = {
         'student_name': student_name,
         'qr_data': student_name,  # QR code contains the student's name
+        'qr_version': _qr_version(student_name),
     }
     
     return render(request, 'student/my_qr_code.html', context)
+
+
+QR_FORMATS = {
+    'svg': (qr.to_svg, 'image/svg+xml'),
+    'png': (qr.to_png, 'image/png'),
+}
+
+
+def _qr_version(payload):
+    """Short hash of the QR payload; part of the image URL, so a new name means a new URL"""
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+@student_required
+def my_qr_image(request, version, fmt):
+    """The student's QR code rendered on the server, cacheable forever under its versioned URL"""
+    if fmt not in QR_FORMATS:
+        raise Http404('Unknown image format')
+    payload = request.user.get_full_name() or request.user.username
+    current = _qr_version(payload)
+    if version != current:
+        # An old page asking for the code of a name that has since changed
+        return redirect('student:my_qr_image', version=current, fmt=fmt)
+    render_image, content_type = QR_FORMATS[fmt]
+    body = cache.cached(
+        f'qr:{fmt}:{request.user.id}:{version}', [], lambda: render_image(qr.encode(payload)),
+    )
+    response = HttpResponse(body, content_type=content_type)
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response